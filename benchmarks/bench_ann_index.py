@@ -0,0 +1,87 @@
+"""Recall and latency of the IVF job index against brute-force scoring.
+
+Usage:
+    python benchmarks/bench_ann_index.py --jobs 50000 --dim 256 --queries 200 --k 50
+
+Jobs and users are synthetic embeddings clustered around topic centres, as
+real posting embeddings are. Brute force is the exact top-k from
+matching_engine.score_matches. For each n_probe the IVF index reports
+recall@k against it, plus p50/p95 latency per query, along with the build
+time and serialized size.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda'))
+
+from ann_index import IVFIndex  # noqa: E402
+from matching_engine import normalize_embeddings, score_matches  # noqa: E402
+
+
+def clustered_embeddings(n, centers, rng, spread):
+    picks = centers[rng.integers(0, len(centers), size=n)]
+    return picks + spread * rng.standard_normal((n, centers.shape[1]))
+
+
+def percentile_ms(values, q):
+    return float(np.percentile(values, q)) * 1000
+
+
+def brute_force(job_matrix, queries, k):
+    results = []
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        found = sorted(score_matches(query[None, :], job_matrix, threshold=-1.0, top_k=k), key=lambda hit: -hit[2])
+        latencies.append(time.perf_counter() - started)
+        results.append([job_index for _, job_index, _ in found])
+    return results, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--jobs', type=int, default=50000)
+    parser.add_argument('--dim', type=int, default=256)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=50)
+    parser.add_argument('--topics', type=int, default=300)
+    parser.add_argument('--n-probe', type=int, nargs='+', default=[1, 4, 8, 16, 32])
+    parser.add_argument('--seed', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    centers = rng.standard_normal((args.topics, args.dim))
+    job_matrix, _ = normalize_embeddings(clustered_embeddings(args.jobs, centers, rng, 2.0))
+    queries, _ = normalize_embeddings(clustered_embeddings(args.queries, centers, rng, 2.0))
+    job_ids = [f"job-{i}" for i in range(args.jobs)]
+
+    started = time.perf_counter()
+    index = IVFIndex.build(job_matrix, job_ids)
+    build_seconds = time.perf_counter() - started
+    size = index.vectors.nbytes + len(index.metadata_bytes())
+
+    exact, exact_latencies = brute_force(job_matrix, queries, args.k)
+    exact_sets = [set(job_ids[i] for i in hits) for hits in exact]
+
+    print(f"jobs={args.jobs} dim={args.dim} k={args.k} lists={index.n_lists} "
+          f"build={build_seconds:.2f}s size={size / 1e6:.1f}MB")
+    print(f"{'brute force':<14} recall 1.000  p50 {percentile_ms(exact_latencies, 50):7.2f}ms  "
+          f"p95 {percentile_ms(exact_latencies, 95):7.2f}ms")
+    for n_probe in args.n_probe:
+        latencies = []
+        recalls = []
+        for query, truth in zip(queries, exact_sets):
+            started = time.perf_counter()
+            found_ids, _ = index.search(query, k=args.k, n_probe=n_probe)[0]
+            latencies.append(time.perf_counter() - started)
+            recalls.append(len(truth.intersection(found_ids)) / len(truth))
+        print(f"{'ivf n_probe=' + str(n_probe):<14} recall {np.mean(recalls):.3f}  p50 {percentile_ms(latencies, 50):7.2f}ms  "
+              f"p95 {percentile_ms(latencies, 95):7.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
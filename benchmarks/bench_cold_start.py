@@ -0,0 +1,144 @@
+"""Measure handler import time (the Lambda init phase) and which heavy modules it loads.
+
+Usage:
+    python benchmarks/bench_cold_start.py                 # report
+    python benchmarks/bench_cold_start.py --check         # compare with cold_start_baseline.json
+    python benchmarks/bench_cold_start.py --update        # rewrite the baseline
+
+Each handler is imported in a fresh interpreter, as in a cold Lambda
+container, with placeholder environment variables and no network access
+needed (nothing may call AWS at import time). The fastest and median of
+--runs imports are reported together with the heavy third-party packages
+that ended up in sys.modules.
+
+--check fails if a handler now loads a heavy package its baseline did not.
+That part is portable across machines. With --tolerance it also fails when
+the fastest import grew by more than that fraction over the baseline, which
+is only meaningful on the machine that recorded the baseline. Handlers
+whose dependencies are not installed are reported and skipped.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+LAMBDA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda')
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cold_start_baseline.json')
+
+HANDLERS = [
+    'cognito_post_auth', 'fetch_job', 'fetch_job_details', 'fetch_user_matches', 'generate_upload_url',
+    'immediate_user_match', 'match', 'textract_processor', 'upload_handler', 'user_details_extractor',
+    'user_preferences',
+]
+HEAVY_MODULES = ['boto3', 'numpy', 'scipy', 'pandas', 'openai', 'aiohttp', 'requests', 'tiktoken']
+
+PLACEHOLDER_ENV = {
+    'AWS_DEFAULT_REGION': 'us-east-1',
+    'AWS_ACCESS_KEY_ID': 'placeholder',
+    'AWS_SECRET_ACCESS_KEY': 'placeholder',
+    'OPENAI_API_KEY': 'placeholder',
+    'APPLICANT_DETAILS_TABLE': 'applicant-details',
+    'APPLICANT_EMBEDDING_TABLE': 'user-embeddings',
+    'USER_EMBEDDINGS_TABLE': 'user-embeddings',
+    'MATCH_RESULTS_TABLE': 'match-results',
+    'JOB_POSTINGS_TABLE': 'job-postings',
+    'USER_TOPICS_TABLE': 'user-topics',
+    'USER_PREFERENCES_TABLE': 'user-preferences',
+    'MATCH_RUNS_TABLE': 'match-runs',
+    'NOTIFICATION_LOG_TABLE': 'notification-log',
+    'EMBEDDING_CACHE_TABLE': 'embedding-cache',
+    'RESUME_CACHE_TABLE': 'resume-cache',
+    'NOTIFICATION_TOPIC_ARN': 'arn:aws:sns:us-east-1:000000000000:notifications',
+    'USER_MATCH_TOPIC_ARN': 'arn:aws:sns:us-east-1:000000000000:user-match',
+    'OUTPUT_BUCKET': 'output',
+}
+
+CHILD = """
+import importlib, json, sys, time
+start = time.perf_counter()
+importlib.import_module(sys.argv[1])
+seconds = time.perf_counter() - start
+heavy = json.loads(sys.argv[2])
+print(json.dumps({'seconds': seconds, 'modules': [name for name in heavy if name in sys.modules],
+                  'module_count': len(sys.modules)}))
+"""
+
+
+def measure(handler, runs):
+    env = dict(os.environ, **PLACEHOLDER_ENV)
+    env['PYTHONPATH'] = LAMBDA_DIR
+    env['PYTHONDONTWRITEBYTECODE'] = '1'
+    samples = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-c', CHILD, handler, json.dumps(HEAVY_MODULES)],
+                                cwd=LAMBDA_DIR, env=env, capture_output=True, text=True)
+        if result.returncode != 0:
+            return {'error': result.stderr.strip().splitlines()[-1]}
+        samples.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    return {
+        'import_ms': round(min(sample['seconds'] for sample in samples) * 1000, 1),
+        'median_ms': round(statistics.median(sample['seconds'] for sample in samples) * 1000, 1),
+        'modules': samples[-1]['modules'],
+        'module_count': samples[-1]['module_count'],
+    }
+
+
+def check(results, baseline, tolerance):
+    problems = []
+    for handler, result in results.items():
+        expected = baseline.get(handler)
+        if 'error' in result or expected is None:
+            continue
+        added = sorted(set(result['modules']) - set(expected['modules']))
+        if added:
+            problems.append(f"{handler} now imports {', '.join(added)} at init")
+        if tolerance is not None and result['import_ms'] > expected['import_ms'] * (1 + tolerance):
+            problems.append(f"{handler} import {result['import_ms']}ms vs baseline {expected['import_ms']}ms")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark handler cold-start import time')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--handlers', nargs='+', default=HANDLERS)
+    parser.add_argument('--check', action='store_true', help='Fail on regressions against the baseline')
+    parser.add_argument('--update', action='store_true', help='Write the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, help='Also fail when import time grows by more than this fraction')
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+
+    results = {}
+    for handler in args.handlers:
+        results[handler] = result = measure(handler, args.runs)
+        if 'error' in result:
+            print(f"{handler:<24} skipped: {result['error']}")
+            continue
+        previous = baseline.get(handler, {}).get('import_ms')
+        delta = f" (baseline {previous}ms)" if previous is not None else ''
+        print(f"{handler:<24} {result['import_ms']:8.1f}ms (median {result['median_ms']:.1f}ms){delta}  "
+              f"{result['module_count']:5d} modules  "
+              f"heavy: {', '.join(result['modules']) or '-'}")
+
+    if args.update:
+        merged = dict(baseline)
+        merged.update({handler: result for handler, result in results.items() if 'error' not in result})
+        with open(BASELINE_PATH, 'w') as f:
+            json.dump(merged, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Baseline written to {BASELINE_PATH}")
+
+    if args.check:
+        problems = check(results, baseline, args.tolerance)
+        for problem in problems:
+            print(f"REGRESSION: {problem}")
+        sys.exit(1 if problems else 0)
+
+
+if __name__ == '__main__':
+    main()
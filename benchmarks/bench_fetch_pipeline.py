@@ -0,0 +1,93 @@
+"""Benchmark the pipelined job fetcher against the old sequential loop.
+
+Usage:
+    python benchmarks/bench_fetch_pipeline.py --queries 4 --pages 5
+
+Both variants fetch real HTTP pages from the local stub JSearch server
+(benchmarks/stub_jsearch.py). Embedding and DynamoDB writes are simulated
+with fixed latencies so the numbers reflect scheduling, not OpenAI/AWS.
+The sequential variant reproduces the old loop: fetch, embed, write, then
+time.sleep(1). The pipelined variant uses job_pipeline.run_pipeline with a
+TokenBucket at the same request rate.
+"""
+import argparse
+import os
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from job_pipeline import run_pipeline  # noqa: E402
+from rate_limiter import TokenBucket  # noqa: E402
+from stub_jsearch import start_server  # noqa: E402
+
+
+def make_stages(url, session, embed_latency, write_latency):
+    def fetch(task):
+        response = session.get(url, params={'query': task['query'], 'page': str(task['page'])}, timeout=30)
+        response.raise_for_status()
+        return response.json()
+
+    def embed(task, payload):
+        time.sleep(embed_latency)
+        return payload['data']
+
+    def write(task, jobs):
+        time.sleep(write_latency)
+        return len(jobs)
+
+    return fetch, embed, write
+
+
+def run_sequential(tasks, fetch, embed, write, rate):
+    start = time.perf_counter()
+    jobs = 0
+    for task in tasks:
+        jobs += write(task, embed(task, fetch(task)))
+        time.sleep(1.0 / rate)  # The old fixed "rate limit safety" sleep
+    return jobs, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark job fetch pipeline throughput')
+    parser.add_argument('--queries', type=int, default=4)
+    parser.add_argument('--pages', type=int, default=5)
+    parser.add_argument('--http-latency', type=float, default=0.4)
+    parser.add_argument('--embed-latency', type=float, default=0.6)
+    parser.add_argument('--write-latency', type=float, default=0.1)
+    parser.add_argument('--rate', type=float, default=1.0, help='JSearch requests per second')
+    parser.add_argument('--burst', type=int, default=2)
+    parser.add_argument('--fetch-workers', type=int, default=4)
+    parser.add_argument('--embed-workers', type=int, default=2)
+    parser.add_argument('--jobs-per-page', type=int, default=10)
+    args = parser.parse_args()
+
+    server, url = start_server(latency=args.http_latency, jobs_per_page=args.jobs_per_page)
+    session = requests.Session()
+    fetch, embed, write = make_stages(url, session, args.embed_latency, args.write_latency)
+    tasks = [{'query': f"query {q}", 'page': page} for q in range(args.queries) for page in range(1, args.pages + 1)]
+
+    try:
+        seq_jobs, seq_seconds = run_sequential(tasks, fetch, embed, write, args.rate)
+        summary = run_pipeline(
+            tasks, fetch, embed, write,
+            fetch_workers=args.fetch_workers,
+            process_workers=args.embed_workers,
+            limiter=TokenBucket(args.rate, args.burst)
+        )
+    finally:
+        server.shutdown()
+
+    pipe_jobs = sum(summary['results'])
+    print(f"{len(tasks)} pages, {args.jobs_per_page} jobs/page, rate {args.rate}/s (burst {args.burst})")
+    print(f"sequential: {seq_jobs} jobs in {seq_seconds:6.2f}s -> {seq_jobs / seq_seconds:6.1f} jobs/s")
+    print(f"pipelined : {pipe_jobs} jobs in {summary['seconds']:6.2f}s -> {pipe_jobs / summary['seconds']:6.1f} jobs/s "
+          f"({len(summary['failed'])} failed pages)")
+    print(f"speedup: {seq_seconds / summary['seconds']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Benchmark loading recent jobs from the shared snapshot versus rebuilding them per invocation.
+
+Usage:
+    python benchmarks/bench_job_snapshot.py --jobs 5000 --dim 1536 --invocations 20
+
+"rebuild" is what match.py and immediate_user_match.py did on every
+invocation once the items were read: decode each stored embedding and
+normalize the stack. The DynamoDB query itself is not simulated, so the
+real saving is larger. "cold" downloads a snapshot version into a temp
+directory and memory-maps it; "warm" is a later invocation in the same
+container, which only re-reads the LATEST pointer.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda'))
+os.environ['JOB_SNAPSHOT_DIR'] = tempfile.mkdtemp(prefix='bench-snapshot-')
+os.environ['JOB_SNAPSHOT_CHECK_SECONDS'] = '0'  # Every warm invocation re-reads the pointer
+
+import job_snapshot  # noqa: E402
+from embedding_codec import decode_embedding, encode_embedding  # noqa: E402
+from matching_engine import normalize_embeddings  # noqa: E402
+from stub_textract import StubS3  # noqa: E402
+
+BUCKET = 'bench-output'
+
+
+def synthetic_jobs(n, dim, rng, now):
+    return [
+        {
+            'job_id': f"job-{i}",
+            'embedding': encode_embedding(rng.standard_normal(dim).tolist()),
+            'employment_type': 'FULLTIME',
+            'job_title': f"Engineer {i}",
+            'location': 'Remote',
+            'is_remote': True,
+            'posted_at': 'today',
+            'posted_timestamp': now - int(rng.integers(0, 86400)),
+        }
+        for i in range(n)
+    ]
+
+
+def rebuild(jobs):
+    matrix, kept = normalize_embeddings([decode_embedding(job.get('embedding')) for job in jobs])
+    return matrix, [jobs[i] for i in kept]
+
+
+def timed(fn, repeats):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the job embedding snapshot')
+    parser.add_argument('--jobs', type=int, default=5000)
+    parser.add_argument('--dim', type=int, default=1536)
+    parser.add_argument('--invocations', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    now = int(time.time())
+    jobs = synthetic_jobs(args.jobs, args.dim, rng, now)
+    s3 = StubS3()
+
+    start = time.perf_counter()
+    pointer = job_snapshot.publish_snapshot(s3, BUCKET, jobs)
+    publish_seconds = time.perf_counter() - start
+
+    def cold():
+        job_snapshot._state.update(snapshot=None, checked_at=0.0)
+        for name in os.listdir(job_snapshot.LOCAL_DIR):
+            os.remove(os.path.join(job_snapshot.LOCAL_DIR, name))
+        job_snapshot.current_snapshot(s3, BUCKET).since(now - 86400)
+
+    def warm():
+        job_snapshot.current_snapshot(s3, BUCKET).since(now - 86400)
+
+    rebuild_samples = timed(lambda: rebuild(jobs), args.invocations)
+    cold_samples = timed(cold, max(1, args.invocations // 4))
+    warm_samples = timed(warm, args.invocations)
+
+    # Same rows either way
+    expected, _ = rebuild(sorted(jobs, key=lambda job: job['posted_timestamp']))
+    matrix, _ = job_snapshot.current_snapshot(s3, BUCKET).since(0)
+    assert np.allclose(expected, matrix)
+
+    print(f"{args.jobs} jobs, dim {args.dim}; snapshot {pointer['version']} published in {publish_seconds:.2f}s")
+    for label, samples in (('rebuild per invocation', rebuild_samples),
+                           ('snapshot cold load', cold_samples),
+                           ('snapshot warm', warm_samples)):
+        print(f"  {label:<24} p50 {statistics.median(samples) * 1000:8.2f}ms  max {max(samples) * 1000:8.2f}ms")
+    total_old = sum(rebuild_samples)
+    total_new = cold_samples[0] + sum(warm_samples[1:])
+    print(f"  {args.invocations} invocations in one container: {total_old:.2f}s -> {total_new:.2f}s "
+          f"({total_old / total_new:.0f}x less job-loading work)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Benchmark a sharded match run on one machine with the local process-pool executor.
+
+Usage:
+    python benchmarks/bench_match_shards.py --users 20000 --jobs 2000 --shards 1 2 4 8
+
+Users and jobs are written once as .npy files that every worker
+memory-maps, the way shard workers share the job snapshot. Each worker
+scores its users (partitioned by match_shards.shard_for) against all jobs.
+--io-ms-per-user adds a sleep per matched user to stand in for the
+DynamoDB writes and SNS publishes a real worker does, which shards overlap
+even on a single CPU. Every run must find the same number of matches as
+the unsharded one. The slowest shard's time is reported next to the wall
+time; the gap between them is the fan-out overhead.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda'))
+
+from match_shards import LocalShardExecutor, fan_out  # noqa: E402
+from matching_engine import MATCH_THRESHOLD, normalize_embeddings, score_matches  # noqa: E402
+
+
+def synthetic_matrix(n, dim, rng, centers):
+    # Cluster around a few shared centers so a realistic share of pairs clear the threshold
+    picks = centers[rng.integers(0, len(centers), size=n)]
+    matrix, _ = normalize_embeddings(picks + 0.6 * rng.standard_normal((n, dim)))
+    return matrix
+
+
+def score_shard(payload):
+    """Worker: score payload['user_ids'] against every job; module level so the pool can pickle it."""
+    start = time.perf_counter()
+    users = np.load(payload['users_path'], mmap_mode='r')
+    jobs = np.load(payload['jobs_path'], mmap_mode='r')
+    rows = np.array([int(user_id.split('-')[1]) for user_id in payload['user_ids']], dtype=np.int64)
+    user_matrix = np.ascontiguousarray(users[rows])
+    matched_users = set()
+    matches = 0
+    for user_index, _, _ in score_matches(user_matrix, jobs, MATCH_THRESHOLD):
+        matched_users.add(user_index)
+        matches += 1
+    time.sleep(len(matched_users) * payload['io_ms_per_user'] / 1000)
+    return {
+        'shard': payload['shard'],
+        'users': len(rows),
+        'jobs': jobs.shape[0],
+        'pairs_scored': len(rows) * jobs.shape[0],
+        'matches': matches,
+        'notified_users': len(matched_users),
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark sharded match runs with a process pool')
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--jobs', type=int, default=2000)
+    parser.add_argument('--dim', type=int, default=256)
+    parser.add_argument('--shards', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--io-ms-per-user', type=float, default=0.5)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    centers = rng.standard_normal((8, args.dim))
+    user_ids = [f"user-{i}" for i in range(args.users)]
+
+    with tempfile.TemporaryDirectory(prefix='bench-shards-') as work:
+        base_payload = {
+            'users_path': os.path.join(work, 'users.npy'),
+            'jobs_path': os.path.join(work, 'jobs.npy'),
+            'io_ms_per_user': args.io_ms_per_user,
+        }
+        np.save(base_payload['users_path'], synthetic_matrix(args.users, args.dim, rng, centers))
+        np.save(base_payload['jobs_path'], synthetic_matrix(args.jobs, args.dim, rng, centers))
+
+        # Unsharded reference, in this process
+        start = time.perf_counter()
+        reference = score_shard(dict(base_payload, shard=0, user_ids=user_ids))
+        reference_seconds = time.perf_counter() - start
+        print(f"users={args.users} jobs={args.jobs} dim={args.dim} cpus={os.cpu_count()} "
+              f"io_ms_per_user={args.io_ms_per_user}")
+        print(f"  unsharded in-process: {reference_seconds:7.2f}s  {reference['matches']} matches")
+
+        for shard_count in args.shards:
+            executor = LocalShardExecutor(score_shard, max_workers=shard_count)
+            start = time.perf_counter()
+            totals = fan_out(executor, base_payload, user_ids, shard_count)
+            seconds = time.perf_counter() - start
+            assert not totals['failed_shards'], totals['failed_shards']
+            assert totals['matches'] == reference['matches'], (totals['matches'], reference['matches'])
+            assert totals['users'] == args.users
+            balance = totals['slowest_shard_seconds'] / max(seconds, 1e-9)
+            print(f"  {shard_count:>2} shards: {seconds:7.2f}s wall ({reference_seconds / seconds:4.1f}x), "
+                  f"slowest shard {totals['slowest_shard_seconds']:.2f}s ({balance:.0%} of wall), "
+                  f"{totals['matches']} matches")
+
+
+if __name__ == '__main__':
+    main()
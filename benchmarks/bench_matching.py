@@ -0,0 +1,89 @@
+"""Benchmark the vectorized matching engine against the old per-pair loop.
+
+Usage:
+    python benchmarks/bench_matching.py --users 2000 --jobs 500 --dim 1536
+
+The per-pair loop is the scoring code match.py used to run (one
+scipy.spatial.distance.cosine call per user/job pair). It is only timed on a
+sample of pairs so the benchmark finishes quickly; throughput is reported as
+pairs scored per second for both approaches.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda'))
+
+from matching_engine import MATCH_THRESHOLD, normalize_embeddings, score_matches  # noqa: E402
+
+try:
+    from scipy.spatial import distance
+
+    def pair_cosine(a, b):
+        return 1 - distance.cosine(np.ravel(a), np.ravel(b))
+except ImportError:
+    def pair_cosine(a, b):
+        a, b = np.ravel(a), np.ravel(b)
+        return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+
+def synthetic_embeddings(n, dim, rng, centers):
+    # Cluster around a few shared centers so a realistic share of pairs clear the threshold
+    picks = centers[rng.integers(0, len(centers), size=n)]
+    return picks + 0.6 * rng.standard_normal((n, dim))
+
+
+def bench_per_pair(users, jobs, max_pairs):
+    scored = 0
+    found = 0
+    start = time.perf_counter()
+    for job in jobs:
+        for user in users:
+            if pair_cosine(user, job) > MATCH_THRESHOLD:
+                found += 1
+            scored += 1
+            if scored >= max_pairs:
+                return scored, found, time.perf_counter() - start
+    return scored, found, time.perf_counter() - start
+
+
+def bench_engine(users, jobs, top_k):
+    start = time.perf_counter()
+    user_matrix, _ = normalize_embeddings(users)
+    job_matrix, _ = normalize_embeddings(jobs)
+    found = sum(1 for _ in score_matches(user_matrix, job_matrix, MATCH_THRESHOLD, top_k=top_k))
+    return len(users) * len(jobs), found, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--jobs', type=int, default=500)
+    parser.add_argument('--dim', type=int, default=1536)
+    parser.add_argument('--top-k', type=int, default=None)
+    parser.add_argument('--loop-pairs', type=int, default=50000,
+                        help='Number of pairs to time with the per-pair loop')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    centers = rng.standard_normal((8, args.dim))
+    users = [row for row in synthetic_embeddings(args.users, args.dim, rng, centers)]
+    jobs = [row for row in synthetic_embeddings(args.jobs, args.dim, rng, centers)]
+
+    loop_pairs, loop_found, loop_seconds = bench_per_pair(users, jobs, args.loop_pairs)
+    engine_pairs, engine_found, engine_seconds = bench_engine(users, jobs, args.top_k)
+
+    loop_rate = loop_pairs / loop_seconds
+    engine_rate = engine_pairs / engine_seconds
+    print(f"users={args.users} jobs={args.jobs} dim={args.dim} top_k={args.top_k}")
+    print(f"per-pair loop: {loop_pairs:>12,} pairs in {loop_seconds:8.3f}s -> {loop_rate:>14,.0f} pairs/s ({loop_found} matches in sample)")
+    print(f"matrix engine: {engine_pairs:>12,} pairs in {engine_seconds:8.3f}s -> {engine_rate:>14,.0f} pairs/s ({engine_found} matches)")
+    print(f"speedup: {engine_rate / loop_rate:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""Benchmark the preference pre-filter against scoring every job and filtering afterwards.
+
+Usage:
+    python benchmarks/bench_prefilter.py --users 5000 --jobs 5000 --dim 1536
+
+Synthetic jobs get a random employment type, location, remote flag and
+salary. --with-preferences is the share of users that store preferences,
+drawn from --profiles distinct preference sets (users tend to pick the same
+few combinations). The benchmark reports:
+- pairs scored without and with the JobAttributeIndex pre-filter
+- the time of each approach, including building the index
+- whether both find the same matches
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda'))
+
+from job_filters import filtered_groups, job_matches, normalize_preferences  # noqa: E402
+from matching_engine import MATCH_THRESHOLD, normalize_embeddings, score_matches  # noqa: E402
+
+EMPLOYMENT_TYPES = ['FULLTIME', 'PARTTIME', 'CONTRACTOR', 'INTERN']
+LOCATIONS = ['New York', 'San Francisco', 'Austin', 'Seattle', 'Chicago', 'Boston', 'Denver', 'Atlanta']
+
+
+def synthetic_embeddings(n, dim, rng, centers):
+    picks = centers[rng.integers(0, len(centers), size=n)]
+    matrix, _ = normalize_embeddings(picks + 0.6 * rng.standard_normal((n, dim)))
+    return matrix
+
+
+def synthetic_jobs(n, rng):
+    return [
+        {
+            'job_id': f"job-{i}",
+            'employment_type': EMPLOYMENT_TYPES[rng.integers(0, len(EMPLOYMENT_TYPES))],
+            'location': f"{LOCATIONS[rng.integers(0, len(LOCATIONS))]}, US",
+            'is_remote': bool(rng.random() < 0.2),
+            'max_salary': int(rng.integers(40, 200)) * 1000 if rng.random() < 0.7 else 0,
+        }
+        for i in range(n)
+    ]
+
+
+def synthetic_profiles(n, rng):
+    profiles = []
+    for _ in range(n):
+        raw = {'employment_types': list(rng.choice(EMPLOYMENT_TYPES, size=rng.integers(1, 3), replace=False)),
+               'locations': list(rng.choice(LOCATIONS, size=rng.integers(1, 3), replace=False))}
+        if rng.random() < 0.3:
+            raw['remote'] = 'remote_only'
+        if rng.random() < 0.5:
+            raw['min_salary'] = int(rng.integers(60, 150)) * 1000
+        profiles.append(normalize_preferences(raw))
+    return profiles
+
+
+def score_all_then_filter(user_ids, users, job_matrix, jobs, preferences_by_user):
+    return {
+        (user_index, job_index)
+        for user_index, job_index, _ in score_matches(users, job_matrix, MATCH_THRESHOLD)
+        if job_matches(preferences_by_user.get(user_ids[user_index]), jobs[job_index])
+    }
+
+
+def score_prefiltered(user_ids, users, job_matrix, jobs, preferences_by_user, stats):
+    found = set()
+    stats['pairs_scored'] = 0
+    for positions, rows in filtered_groups(user_ids, jobs, preferences_by_user):
+        group_jobs = job_matrix if rows is None else job_matrix[rows]
+        stats['pairs_scored'] += len(positions) * group_jobs.shape[0]
+        for user_index, job_index, _ in score_matches(users[positions], group_jobs, MATCH_THRESHOLD):
+            found.add((positions[user_index], job_index if rows is None else int(rows[job_index])))
+    return found
+
+
+def timed(fn, repeats):
+    samples = []
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return result, statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the preference pre-filter')
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--jobs', type=int, default=5000)
+    parser.add_argument('--dim', type=int, default=1536)
+    parser.add_argument('--with-preferences', type=float, default=0.6)
+    parser.add_argument('--profiles', type=int, default=50)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    centers = rng.standard_normal((32, args.dim))
+    users = synthetic_embeddings(args.users, args.dim, rng, centers)
+    job_matrix = synthetic_embeddings(args.jobs, args.dim, rng, centers)
+    jobs = synthetic_jobs(args.jobs, rng)
+    profiles = synthetic_profiles(args.profiles, rng)
+    user_ids = [f"user-{i}" for i in range(args.users)]
+    preferences_by_user = {
+        user_id: profiles[rng.integers(0, len(profiles))]
+        for user_id in user_ids if rng.random() < args.with_preferences
+    }
+
+    expected, baseline_seconds = timed(
+        lambda: score_all_then_filter(user_ids, users, job_matrix, jobs, preferences_by_user), args.repeats)
+    stats = {}
+    found, filtered_seconds = timed(
+        lambda: score_prefiltered(user_ids, users, job_matrix, jobs, preferences_by_user, stats), args.repeats)
+
+    all_pairs = args.users * args.jobs
+    print(f"users={args.users} jobs={args.jobs} dim={args.dim}: {len(preferences_by_user)} users with preferences "
+          f"from {args.profiles} profiles")
+    print(f"  score all, filter after: {all_pairs} pairs, {baseline_seconds:.3f}s, {len(expected)} matches")
+    print(f"  pre-filter:              {stats['pairs_scored']} pairs ({1 - stats['pairs_scored'] / all_pairs:.1%} fewer), "
+          f"{filtered_seconds:.3f}s ({baseline_seconds / filtered_seconds:.2f}x), {len(found)} matches")
+    print(f"  same matches: {found == expected}")
+
+
+if __name__ == '__main__':
+    main()
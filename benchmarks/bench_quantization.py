@@ -0,0 +1,95 @@
+"""Benchmark int8 two-stage scoring against exact float32 scoring.
+
+Usage:
+    python benchmarks/bench_quantization.py --users 2000 --jobs 20000 --dim 1536
+
+Jobs are quantized with quantization.Int8Quantizer fitted over the
+synthetic job corpus. For the fitted margin and a few fixed ones, the
+benchmark reports:
+- how many pairs the coarse pass sends to exact re-ranking
+- the time against exact scoring (matching_engine.score_matches)
+- recall and precision of the match set against exact scoring
+Memory is the size of the job matrix each scorer keeps resident.
+--noise controls how spread out embeddings are around their cluster
+centers, and so how dense matches above the threshold are.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda'))
+
+from matching_engine import MATCH_THRESHOLD, normalize_embeddings, score_matches  # noqa: E402
+from quantization import Int8Quantizer, score_matches_two_stage  # noqa: E402
+
+
+def synthetic_matrix(n, dim, rng, centers, noise):
+    # Cluster around shared centers so a realistic share of pairs clear the threshold
+    picks = centers[rng.integers(0, len(centers), size=n)]
+    matrix, _ = normalize_embeddings(picks + noise * rng.standard_normal((n, dim)))
+    return matrix
+
+
+def timed(fn, repeats):
+    samples = []
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return result, statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark int8 two-stage scoring')
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--jobs', type=int, default=20000)
+    parser.add_argument('--dim', type=int, default=1536)
+    parser.add_argument('--centers', type=int, default=64)
+    parser.add_argument('--noise', type=float, default=0.66)
+    parser.add_argument('--margins', type=float, nargs='+', default=[0.0, 0.005, 0.01])
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    centers = rng.standard_normal((args.centers, args.dim))
+    users = synthetic_matrix(args.users, args.dim, rng, centers, args.noise)
+    jobs = synthetic_matrix(args.jobs, args.dim, rng, centers, args.noise)
+
+    start = time.perf_counter()
+    quantizer = Int8Quantizer.fit(jobs)
+    codes = quantizer.encode(jobs)
+    fit_seconds = time.perf_counter() - start
+
+    exact, exact_seconds = timed(lambda: {(u, j): s for u, j, s in score_matches(users, jobs, MATCH_THRESHOLD)},
+                                 args.repeats)
+    print(f"users={args.users} jobs={args.jobs} dim={args.dim} noise={args.noise}: "
+          f"{len(exact)} exact matches ({len(exact) / (args.users * args.jobs):.2%} of pairs)")
+    print(f"  job memory: float32 {jobs.nbytes / 1e6:.1f} MB, int8 codes {codes.nbytes / 1e6:.1f} MB "
+          f"({jobs.nbytes / codes.nbytes:.0f}x smaller); fit + encode {fit_seconds:.2f}s")
+    print(f"  exact scoring: {exact_seconds:.3f}s")
+
+    margins = sorted(set(args.margins + [quantizer.margin]))
+    for margin in margins:
+        quantizer.margin = margin
+        stats = {}
+        found, seconds = timed(
+            lambda: {(u, j): s for u, j, s in score_matches_two_stage(users, jobs, codes, quantizer, MATCH_THRESHOLD,
+                                                                      stats=stats)},
+            args.repeats)
+        agreed = len(exact.keys() & found.keys())
+        recall = agreed / len(exact) if exact else 1.0
+        precision = agreed / len(found) if found else 1.0
+        max_error = max((abs(found[pair] - exact[pair]) for pair in exact.keys() & found.keys()), default=0.0)
+        print(f"  two-stage margin {margin:.3f}: {seconds:.3f}s ({exact_seconds / seconds:.2f}x), "
+              f"re-ranked {stats['candidates']} pairs ({stats['candidates'] / stats['coarse_pairs']:.2%}), "
+              f"recall {recall:.4f}, precision {precision:.4f}, max score diff {max_error:.1e}")
+
+
+if __name__ == '__main__':
+    main()
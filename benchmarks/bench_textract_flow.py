@@ -0,0 +1,226 @@
+"""Compare resume-to-match latency and billed Lambda time for Textract flows.
+
+Usage:
+    python benchmarks/bench_textract_flow.py --docs 20 --min-duration 3 --max-duration 20
+
+Three ways of waiting for an asynchronous Textract job are run against
+StubTextract (benchmarks/stub_textract.py). Time is simulated: one stub
+second takes --time-scale real seconds, and results are reported in
+simulated seconds.
+
+  old polling     the previous textract_processor loop (5 s sleep, 10 tries)
+  backoff polling the current fallback path (exponential backoff)
+  event-driven    Textract completion notification invokes the processor
+
+Latency runs from start_document_analysis until the ResumeProcessingTopic
+publish. Billed time is how long the processor Lambda runs.
+
+A second comparison covers a single-page resume from the S3 upload event
+until user_details_extractor starts parsing, through upload_handler:
+
+  async job       start_document_analysis, completion notification, processor,
+                  ResumeProcessingTopic; each SNS delivery costs --hop-latency
+  sync fast path  analyze_document and in-process extraction in upload_handler
+
+Billed time there adds up the upload handler and the processor up to the
+start of extraction (the extraction itself is the same on both paths).
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('OUTPUT_BUCKET', 'bench-output')
+os.environ.setdefault('SNS_TOPIC_ARN', 'arn:aws:sns:us-east-1:000000000000:ResumeProcessingTopic-bench')
+os.environ.setdefault('TEXTRACT_COMPLETION_TOPIC_ARN', 'arn:aws:sns:us-east-1:000000000000:TextractCompletion-bench')
+os.environ.setdefault('TEXTRACT_ROLE_ARN', 'arn:aws:iam::000000000000:role/bench')
+os.environ.setdefault('APPLICANT_DETAILS_TABLE', 'bench-applicant-details')
+os.environ.setdefault('USER_EMBEDDINGS_TABLE', 'bench-user-embeddings')
+os.environ.setdefault('USER_MATCH_TOPIC_ARN', 'arn:aws:sns:us-east-1:000000000000:UserMatch-bench')
+os.environ.setdefault('RESUME_PROCESSING_TOPIC_ARN', os.environ['SNS_TOPIC_ARN'])
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import textract_processor  # noqa: E402
+import upload_handler  # noqa: E402
+import user_details_extractor  # noqa: E402
+from stub_textract import RecordingSNS, StubS3, StubTextract  # noqa: E402
+
+
+class FakeContext:
+    def __init__(self, timeout_seconds, time_scale):
+        self.deadline = time.perf_counter() + timeout_seconds * time_scale
+        self.time_scale = time_scale
+
+    def get_remaining_time_in_millis(self):
+        # Report remaining time in simulated milliseconds
+        return max(0.0, (self.deadline - time.perf_counter()) / self.time_scale * 1000)
+
+
+def sns_event(message):
+    return {'Records': [{'Sns': {'Message': json.dumps(message)}}]}
+
+
+def old_polling_handler(textract, sns, job_id, user_id, time_scale):
+    # The previous textract_processor implementation, with its sleeps scaled
+    max_attempts = 10
+    for attempt in range(max_attempts):
+        response = textract.get_document_analysis(JobId=job_id)
+        status = response['JobStatus']
+        if status in ['SUCCEEDED', 'FAILED']:
+            break
+        time.sleep(5 * time_scale)
+    if status == 'SUCCEEDED':
+        blocks = response['Blocks']
+        while 'NextToken' in response:
+            response = textract.get_document_analysis(JobId=job_id, NextToken=response['NextToken'])
+            blocks.extend(response['Blocks'])
+        sns.publish(TopicArn='resume-processing', Message=json.dumps({'jobId': job_id, 'userId': user_id}))
+    return status
+
+
+def run_polling(durations, time_scale, use_old):
+    latencies, billed, dropped = [], [], 0
+    for number, duration in enumerate(durations):
+        sns = RecordingSNS()
+        textract = StubTextract(duration=duration, time_scale=time_scale)
+        textract_processor.textract, textract_processor.sns = textract, sns
+        started = time.perf_counter()
+        job_id = textract.start_document_analysis(
+            DocumentLocation={'S3Object': {'Bucket': 'bench', 'Name': f"resume-{number}.pdf"}},
+            FeatureTypes=['FORMS'])['JobId']
+        if use_old:
+            old_polling_handler(textract, sns, job_id, 'bench-user', time_scale)
+        else:
+            try:
+                textract_processor.lambda_handler(sns_event({'jobId': job_id, 'userId': 'bench-user'}),
+                                                  FakeContext(180, time_scale))
+            except RuntimeError:
+                pass
+        finished = time.perf_counter()
+        billed.append((finished - started) / time_scale)
+        if sns.published:
+            latencies.append((sns.published[0]['at'] - started) / time_scale)
+        else:
+            dropped += 1
+    return latencies, billed, dropped
+
+
+def run_event_driven(durations, time_scale):
+    latencies, billed = [], []
+    for number, duration in enumerate(durations):
+        sns = RecordingSNS()
+        done = threading.Event()
+        timing = {}
+
+        def on_complete(message):
+            invoked = time.perf_counter()
+            textract_processor.lambda_handler(sns_event(message), FakeContext(180, time_scale))
+            timing['billed'] = (time.perf_counter() - invoked) / time_scale
+            done.set()
+
+        textract = StubTextract(duration=duration, time_scale=time_scale, notify=on_complete)
+        textract_processor.textract, textract_processor.sns = textract, sns
+        started = time.perf_counter()
+        textract.start_document_analysis(
+            DocumentLocation={'S3Object': {'Bucket': 'bench', 'Name': f"resume-{number}.pdf"}},
+            FeatureTypes=['FORMS'], JobTag='bench-user',
+            NotificationChannel={'SNSTopicArn': 'completion', 'RoleArn': 'role'})
+        done.wait()
+        latencies.append((sns.published[0]['at'] - started) / time_scale)
+        billed.append(timing['billed'])
+    return latencies, billed, 0
+
+
+# Smallest PDF with one page object, enough for upload_handler's page count
+SINGLE_PAGE_PDF = (b'%PDF-1.4\n1 0 obj << /Type /Catalog /Pages 2 0 R >> endobj\n'
+                   b'2 0 obj << /Type /Pages /Kids [3 0 R] /Count 1 >> endobj\n'
+                   b'3 0 obj << /Type /Page /Parent 2 0 R >> endobj\n%%EOF\n')
+
+
+def s3_event(bucket, key):
+    return {'Records': [{'s3': {'bucket': {'name': bucket}, 'object': {'key': key}}}]}
+
+
+def run_upload(durations, time_scale, hop_latency, sync_latency, sync):
+    """Upload event to extraction start for single-page resumes, async job or sync fast path."""
+    latencies, billed = [], []
+    s3 = StubS3()
+    upload_handler.s3 = textract_processor.s3 = user_details_extractor.s3 = s3
+    upload_handler.SYNC_MAX_BYTES = 5 * 1024 * 1024 if sync else 0
+    for number, duration in enumerate(durations):
+        key = f"resume-{number}.pdf"
+        s3.put_object(Bucket='bench', Key=key, Body=SINGLE_PAGE_PDF, Metadata={'user-id': 'bench-user'})
+        done = threading.Event()
+        timing = {}
+
+        def extract(job_id, user_id, blocks, *args, **kwargs):
+            timing['extracted'] = time.perf_counter()
+            done.set()
+            return {'statusCode': 200, 'body': '{}'}
+
+        def on_complete(message):
+            time.sleep(hop_latency * time_scale)  # Completion topic delivery
+            invoked = time.perf_counter()
+            textract_processor.lambda_handler(sns_event(message), FakeContext(180, time_scale))
+            timing['processor'] = time.perf_counter() - invoked
+            time.sleep(hop_latency * time_scale)  # ResumeProcessingTopic delivery
+            extract(None, None, None)
+
+        textract = StubTextract(duration=duration, time_scale=time_scale, notify=on_complete,
+                                sync_latency=sync_latency)
+        upload_handler.textract = textract_processor.textract = textract
+        upload_handler.sns = textract_processor.sns = RecordingSNS()
+        user_details_extractor.process_resume = extract
+        started = time.perf_counter()
+        upload_handler.lambda_handler(s3_event('bench', key), None)
+        handler_seconds = time.perf_counter() - started
+        done.wait()
+        latencies.append((timing['extracted'] - started) / time_scale)
+        billed.append((handler_seconds + timing.get('processor', 0.0)) / time_scale)
+    return latencies, billed, 0
+
+
+def summarize(name, latencies, billed, dropped):
+    mean = lambda values: sum(values) / len(values) if values else float('nan')  # noqa: E731
+    print(f"{name:<16} mean latency {mean(latencies):7.2f}s  max latency {max(latencies, default=float('nan')):7.2f}s  "
+          f"mean billed {mean(billed):7.2f}s  total billed {sum(billed):8.2f}s  dropped {dropped}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Textract completion handling')
+    parser.add_argument('--docs', type=int, default=20)
+    parser.add_argument('--min-duration', type=float, default=3.0, help='Simulated Textract job seconds')
+    parser.add_argument('--max-duration', type=float, default=20.0)
+    parser.add_argument('--time-scale', type=float, default=0.01, help='Real seconds per simulated second')
+    parser.add_argument('--seed', type=int, default=11)
+    parser.add_argument('--hop-latency', type=float, default=0.3, help='Simulated seconds per SNS delivery')
+    parser.add_argument('--sync-latency', type=float, default=2.0,
+                        help='Simulated analyze_document seconds for one page')
+    args = parser.parse_args()
+    textract_processor.s3 = StubS3()
+
+    rng = random.Random(args.seed)
+    durations = [rng.uniform(args.min_duration, args.max_duration) for _ in range(args.docs)]
+
+    textract_processor.POLL_INITIAL_DELAY = 1.0 * args.time_scale
+    textract_processor.POLL_MAX_DELAY = 8.0 * args.time_scale
+
+    print(f"{args.docs} documents, Textract job duration {args.min_duration}-{args.max_duration}s (simulated)")
+    summarize('old polling', *run_polling(durations, args.time_scale, use_old=True))
+    summarize('backoff polling', *run_polling(durations, args.time_scale, use_old=False))
+    summarize('event-driven', *run_event_driven(durations, args.time_scale))
+
+    print(f"Single-page resume, upload to extraction start (SNS hop {args.hop_latency}s, "
+          f"analyze_document {args.sync_latency}s, simulated)")
+    summarize('async job', *run_upload(durations, args.time_scale, args.hop_latency, args.sync_latency, sync=False))
+    summarize('sync fast path', *run_upload(durations, args.time_scale, args.hop_latency, args.sync_latency, sync=True))
+
+
+if __name__ == '__main__':
+    main()
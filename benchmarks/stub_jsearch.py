@@ -0,0 +1,82 @@
+"""Local stand-in for the JSearch /search endpoint.
+
+Usage:
+    python benchmarks/stub_jsearch.py --port 8765 --latency 0.4 --jobs-per-page 10
+
+Point fetch_job.py at it with JSEARCH_URL=http://127.0.0.1:8765/search.
+Every request sleeps for --latency seconds and returns --jobs-per-page
+synthetic postings shaped like the real API response.
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def make_handler(latency, jobs_per_page):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            parsed = urlparse(self.path)
+            if parsed.path != '/search':
+                self.send_error(404)
+                return
+            params = parse_qs(parsed.query)
+            query = params.get('query', [''])[0]
+            page = int(params.get('page', ['1'])[0])
+            time.sleep(latency)
+
+            now = int(time.time())
+            data = [
+                {
+                    'job_id': f"stub-{query.replace(' ', '-')}-{page}-{idx}",
+                    'job_title': f"{query.title()} #{idx}",
+                    'employer_name': f"Employer {idx % 7}",
+                    'job_location': 'Remote' if idx % 3 == 0 else 'New York, NY',
+                    'job_description': f"Stub description {idx} for {query} on page {page}. " * 20,
+                    'job_employment_type': 'FULLTIME' if idx % 4 else 'CONTRACTOR',
+                    'job_is_remote': idx % 3 == 0,
+                    'job_posted_at_timestamp': now - idx * 60,
+                    'job_posted_at_datetime_utc': time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime(now - idx * 60)),
+                }
+                for idx in range(1, jobs_per_page + 1)
+            ]
+            body = json.dumps({'status': 'OK', 'parameters': {'query': query, 'page': page}, 'data': data}).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Keep benchmark output readable
+
+    return Handler
+
+
+def start_server(port=0, latency=0.4, jobs_per_page=10):
+    """Start the stub in a background thread and return (server, base_url)."""
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(latency, jobs_per_page))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/search"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stub of the JSearch API')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.4, help='Seconds to wait before each response')
+    parser.add_argument('--jobs-per-page', type=int, default=10)
+    args = parser.parse_args()
+
+    server, url = start_server(args.port, args.latency, args.jobs_per_page)
+    print(f"Stub JSearch listening on {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
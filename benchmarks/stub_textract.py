@@ -0,0 +1,154 @@
+"""In-process stand-in for the Textract document-analysis API.
+
+StubTextract implements the subset of the boto3 Textract client used by the
+Lambdas (start_document_analysis, get_document_analysis, analyze_document)
+with synthetic FORMS blocks. Jobs finish after a configurable duration,
+scaled by `time_scale` so benchmarks can simulate seconds in milliseconds.
+When a job was started with a NotificationChannel, the `notify` callback is
+called with a Textract-style completion message, like the SNS notification
+Textract publishes.
+"""
+import io
+import itertools
+import json
+import threading
+import time
+
+
+def synthetic_blocks(pages=1, fields_per_page=6, words_per_line=8, job_prefix='doc'):
+    """Build LINE/WORD/KEY_VALUE_SET blocks resembling a FORMS analysis."""
+    counter = itertools.count()
+    blocks = []
+    for page in range(1, pages + 1):
+        blocks.append({'BlockType': 'PAGE', 'Id': f"{job_prefix}-page-{page}", 'Page': page})
+        for field in range(fields_per_page):
+            key_words = [{'BlockType': 'WORD', 'Id': f"{job_prefix}-w{next(counter)}", 'Text': name, 'Page': page}
+                         for name in (f"Field{field}",)]
+            value_words = [{'BlockType': 'WORD', 'Id': f"{job_prefix}-w{next(counter)}", 'Text': f"value{field}-{i}", 'Page': page}
+                           for i in range(words_per_line)]
+            value_id = f"{job_prefix}-v{next(counter)}"
+            key_id = f"{job_prefix}-k{next(counter)}"
+            blocks.extend(key_words + value_words)
+            blocks.append({
+                'BlockType': 'KEY_VALUE_SET', 'Id': key_id, 'EntityTypes': ['KEY'], 'Page': page,
+                'Relationships': [{'Type': 'VALUE', 'Ids': [value_id]},
+                                  {'Type': 'CHILD', 'Ids': [w['Id'] for w in key_words]}]
+            })
+            blocks.append({
+                'BlockType': 'KEY_VALUE_SET', 'Id': value_id, 'EntityTypes': ['VALUE'], 'Page': page,
+                'Relationships': [{'Type': 'CHILD', 'Ids': [w['Id'] for w in value_words]}]
+            })
+            blocks.append({'BlockType': 'LINE', 'Id': f"{job_prefix}-l{next(counter)}",
+                           'Text': ' '.join(w['Text'] for w in key_words + value_words), 'Page': page})
+    return blocks
+
+
+class StubTextract:
+    def __init__(self, duration=5.0, pages=1, time_scale=1.0, page_size=1000, notify=None,
+                 sync_latency=1.5):
+        self.duration = duration  # Simulated seconds per job, or callable(job_number) -> seconds
+        self.pages = pages
+        self.time_scale = time_scale
+        self.page_size = page_size
+        self.notify = notify
+        self.sync_latency = sync_latency  # Simulated seconds for analyze_document
+        self.calls = {'start_document_analysis': 0, 'get_document_analysis': 0, 'analyze_document': 0}
+        self._jobs = {}
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _job_duration(self, number):
+        return self.duration(number) if callable(self.duration) else self.duration
+
+    def start_document_analysis(self, DocumentLocation, FeatureTypes, JobTag=None,
+                                NotificationChannel=None, ClientRequestToken=None, **kwargs):
+        with self._lock:
+            self.calls['start_document_analysis'] += 1
+            number = next(self._counter)
+        job_id = f"stub-job-{number}"
+        job = {
+            'status': 'IN_PROGRESS',
+            'blocks': synthetic_blocks(self.pages, job_prefix=job_id),
+            'location': DocumentLocation['S3Object'],
+        }
+        self._jobs[job_id] = job
+
+        def complete():
+            job['status'] = 'SUCCEEDED'
+            if NotificationChannel and self.notify:
+                self.notify({
+                    'JobId': job_id,
+                    'Status': 'SUCCEEDED',
+                    'API': 'StartDocumentAnalysis',
+                    'JobTag': JobTag,
+                    'Timestamp': int(time.time() * 1000),
+                    'DocumentLocation': {'S3ObjectName': job['location']['Name'],
+                                         'S3Bucket': job['location']['Bucket']}
+                })
+
+        threading.Timer(self._job_duration(number) * self.time_scale, complete).start()
+        return {'JobId': job_id}
+
+    def get_document_analysis(self, JobId, MaxResults=None, NextToken=None):
+        with self._lock:
+            self.calls['get_document_analysis'] += 1
+        job = self._jobs[JobId]
+        if job['status'] != 'SUCCEEDED':
+            return {'JobStatus': job['status'], 'Blocks': []}
+        size = min(MaxResults or self.page_size, self.page_size)
+        start = int(NextToken or 0)
+        response = {
+            'JobStatus': 'SUCCEEDED',
+            'DocumentMetadata': {'Pages': self.pages},
+            'Blocks': [dict(block) for block in job['blocks'][start:start + size]],
+        }
+        if start + size < len(job['blocks']):
+            response['NextToken'] = str(start + size)
+        return response
+
+    def analyze_document(self, Document, FeatureTypes, **kwargs):
+        with self._lock:
+            self.calls['analyze_document'] += 1
+        time.sleep(self.sync_latency * self.time_scale)
+        return {
+            'DocumentMetadata': {'Pages': self.pages},
+            'Blocks': synthetic_blocks(self.pages, job_prefix='sync'),
+        }
+
+
+class StubS3:
+    """In-memory S3 client stub covering uploads, head_object, streaming get_object and download_file."""
+
+    def __init__(self):
+        self.objects = {}
+        self.metadata = {}
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, ExtraArgs=None, **kwargs):
+        self.objects[(Bucket, Key)] = Fileobj.read()
+
+    def put_object(self, Bucket, Key, Body, Metadata=None, **kwargs):
+        self.objects[(Bucket, Key)] = Body if isinstance(Body, bytes) else Body.read()
+        self.metadata[(Bucket, Key)] = Metadata or {}
+        return {}
+
+    def head_object(self, Bucket, Key, **kwargs):
+        return {'ContentLength': len(self.objects[(Bucket, Key)]), 'Metadata': self.metadata.get((Bucket, Key), {})}
+
+    def get_object(self, Bucket, Key, **kwargs):
+        data = self.objects[(Bucket, Key)]
+        return {'Body': io.BytesIO(data), 'ContentLength': len(data)}
+
+    def download_file(self, Bucket, Key, Filename, **kwargs):
+        with open(Filename, 'wb') as f:
+            f.write(self.objects[(Bucket, Key)])
+
+
+class RecordingSNS:
+    """Minimal SNS client stub that records publish times and messages."""
+
+    def __init__(self):
+        self.published = []
+
+    def publish(self, TopicArn, Message, **kwargs):
+        self.published.append({'topic': TopicArn, 'message': json.loads(Message), 'at': time.perf_counter()})
+        return {'MessageId': str(len(self.published))}
@@ -0,0 +1,519 @@
+"""Inverted-file (IVF) approximate nearest-neighbour index over job embeddings.
+
+Unit-length job vectors are clustered with spherical k-means. Each job sits
+in the list of its nearest centroid. A query scores all centroids, probes
+the n_probe closest lists and computes exact cosine similarity only for
+the jobs in those lists, so cost grows with n_probe * list size instead of
+the size of the whole posting history.
+
+The stored index is a base plus a delta, located through a small JSON
+pointer at JOB_INDEX_KEY that is written last. The base keeps its vectors
+in a plain .npy under a version prefix, so readers download it once per
+version into /tmp and open it with np.load(mmap_mode='r'), as job_snapshot
+does; ids, lists and centroids go in a small .npz beside it. fetch_job.py
+assigns newly ingested jobs to the base centroids and writes only the delta
+(with the base rows they replace or that expired hidden at search time).
+Once the delta and the hidden rows outgrow COMPACT_FRACTION of the base, or
+the index has grown well past the size its centroids were trained on, they
+are merged (and retrained) into a new base version. immediate_user_match.py
+loads the index to find a user's top-k jobs over the full history.
+"""
+import hashlib
+import io
+import json
+import os
+import posixpath
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+INDEX_FORMAT_VERSION = 2
+JOB_INDEX_BUCKET = os.environ.get('JOB_INDEX_BUCKET')
+JOB_INDEX_KEY = os.environ.get('JOB_INDEX_KEY', 'ann/LATEST.json')  # Pointer to the current base and delta
+DEFAULT_N_PROBE = int(os.environ.get('ANN_N_PROBE', '16'))
+KMEANS_ITERATIONS = 10
+TRAIN_SAMPLE_PER_LIST = 64  # k-means runs on a sample of this many vectors per centroid
+RETRAIN_GROWTH = 4.0  # Retrain once the index holds this many times the vectors it was trained on
+ASSIGN_BLOCK_ROWS = 4096
+# Merge the delta into a new base once it plus the hidden base rows exceed this share of the base
+COMPACT_FRACTION = float(os.environ.get('ANN_COMPACT_FRACTION', '0.2'))
+LOCAL_DIR = os.environ.get('JOB_INDEX_DIR', '/tmp')
+LOCAL_PREFIX = 'job-index-'
+
+
+def default_n_lists(n_vectors):
+    return int(min(max(1, round(np.sqrt(n_vectors))), 4096))
+
+
+def nearest_centroids(matrix, centroids, block_rows=ASSIGN_BLOCK_ROWS):
+    """Index of the most similar centroid for every row, computed in blocks."""
+    assignments = np.empty(matrix.shape[0], dtype=np.int32)
+    for start in range(0, matrix.shape[0], block_rows):
+        assignments[start:start + block_rows] = np.argmax(matrix[start:start + block_rows] @ centroids.T, axis=1)
+    return assignments
+
+
+def train_centroids(matrix, n_lists, iterations=KMEANS_ITERATIONS, seed=0):
+    """Spherical k-means on a sample of the (unit-length) rows of matrix."""
+    rng = np.random.default_rng(seed)
+    n_lists = max(1, min(n_lists, matrix.shape[0]))
+    sample_size = min(matrix.shape[0], n_lists * TRAIN_SAMPLE_PER_LIST)
+    sample = matrix[np.sort(rng.choice(matrix.shape[0], sample_size, replace=False))]
+    centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = nearest_centroids(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, sample)
+        counts = np.bincount(assignments, minlength=n_lists)
+        empty = counts == 0
+        if empty.any():
+            # Re-seed empty clusters with random sample points
+            sums[empty] = sample[rng.choice(sample_size, int(empty.sum()), replace=False)]
+        norms = np.linalg.norm(sums, axis=1)
+        norms[norms == 0] = 1.0
+        centroids = (sums / norms[:, None]).astype(np.float32)
+    return np.ascontiguousarray(centroids, dtype=np.float32)
+
+
+class IVFIndex:
+    def __init__(self, centroids, vectors, ids, lists, expires_at, trained_size):
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.ids = list(ids)
+        self.lists = np.asarray(lists, dtype=np.int32)
+        self.expires_at = np.asarray(expires_at, dtype=np.int64)
+        self.trained_size = int(trained_size)
+        self._reindex()
+
+    @classmethod
+    def build(cls, matrix, ids, expires_at=None, n_lists=None, seed=0):
+        """Train centroids on matrix (rows from normalize_embeddings) and index every row."""
+        matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        expires_at = np.zeros(len(ids), dtype=np.int64) if expires_at is None else expires_at
+        if matrix.shape[0] == 0:
+            return cls(np.empty((0, matrix.shape[1]), np.float32), matrix, [], [], [], 0)
+        centroids = train_centroids(matrix, n_lists or default_n_lists(matrix.shape[0]), seed=seed)
+        return cls(centroids, matrix, ids, nearest_centroids(matrix, centroids), expires_at, matrix.shape[0])
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def dim(self):
+        return self.vectors.shape[1]
+
+    @property
+    def n_lists(self):
+        return self.centroids.shape[0]
+
+    def _reindex(self):
+        # Rows are kept sorted by list, so list l is the contiguous slice
+        # offsets[l]:offsets[l + 1] and a probe scores a view, not a gathered copy
+        order = np.argsort(self.lists, kind='stable')
+        if not np.array_equal(order, np.arange(len(order))):
+            self.vectors = np.ascontiguousarray(self.vectors[order])
+            self.ids = [self.ids[row] for row in order]
+            self.lists = self.lists[order]
+            self.expires_at = self.expires_at[order]
+        self.positions = {job_id: row for row, job_id in enumerate(self.ids)}
+        self.offsets = np.searchsorted(self.lists, np.arange(self.n_lists + 1))
+
+    def add(self, matrix, ids, expires_at=None):
+        """Insert or replace vectors; returns the number of new ids."""
+        matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        expires_at = np.zeros(len(ids), dtype=np.int64) if expires_at is None else np.asarray(expires_at, dtype=np.int64)
+        if self.n_lists == 0:
+            merged = IVFIndex.build(matrix, ids, expires_at)
+            self.__init__(merged.centroids, merged.vectors, merged.ids, merged.lists, merged.expires_at, merged.trained_size)
+            return len(ids)
+
+        assignments = nearest_centroids(matrix, self.centroids)
+        new_rows = []
+        for row, job_id in enumerate(ids):
+            existing = self.positions.get(job_id)
+            if existing is None:
+                new_rows.append(row)
+            else:
+                self.vectors[existing] = matrix[row]
+                self.lists[existing] = assignments[row]
+                self.expires_at[existing] = expires_at[row]
+        if new_rows:
+            self.vectors = np.ascontiguousarray(np.vstack([self.vectors, matrix[new_rows]]))
+            self.ids.extend(ids[row] for row in new_rows)
+            self.lists = np.concatenate([self.lists, assignments[new_rows]])
+            self.expires_at = np.concatenate([self.expires_at, expires_at[new_rows]])
+
+        if len(self) > RETRAIN_GROWTH * max(1, self.trained_size):
+            self.retrain()
+        else:
+            self._reindex()
+        return len(new_rows)
+
+    def remove_expired(self, now=None):
+        """Drop jobs whose expires_at (DynamoDB TTL) has passed; returns how many."""
+        now = int(time.time()) if now is None else now
+        keep = (self.expires_at == 0) | (self.expires_at > now)
+        removed = int((~keep).sum())
+        if removed:
+            self.vectors = np.ascontiguousarray(self.vectors[keep])
+            self.ids = [job_id for job_id, kept in zip(self.ids, keep) if kept]
+            self.lists = self.lists[keep]
+            self.expires_at = self.expires_at[keep]
+            self._reindex()
+        return removed
+
+    def retrain(self, n_lists=None, seed=0):
+        if len(self) == 0:
+            return
+        self.centroids = train_centroids(self.vectors, n_lists or default_n_lists(len(self)), seed=seed)
+        self.lists = nearest_centroids(self.vectors, self.centroids)
+        self.trained_size = len(self)
+        self._reindex()
+
+    def search(self, queries, k=10, n_probe=DEFAULT_N_PROBE, live=None):
+        """Return [(job_ids, scores)] per query row, best first.
+
+        queries must be unit-length rows (normalize_embeddings). Scores are
+        exact cosine similarities of the candidates found in the probed lists.
+        Rows where the optional boolean mask live is False are never returned.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if len(self) == 0:
+            return [([], np.empty(0, dtype=np.float32)) for _ in range(queries.shape[0])]
+        if queries.shape[1] != self.dim:
+            raise ValueError(f"Embedding dimension mismatch: query {queries.shape[1]} vs index {self.dim}")
+
+        n_probe = max(1, min(n_probe, self.n_lists))
+        centroid_scores = queries @ self.centroids.T
+        if n_probe < self.n_lists:
+            probes = np.argpartition(centroid_scores, self.n_lists - n_probe, axis=1)[:, self.n_lists - n_probe:]
+        else:
+            probes = np.tile(np.arange(self.n_lists), (queries.shape[0], 1))
+
+        results = []
+        for query, probe in zip(queries, probes):
+            ranges = [(self.offsets[l], self.offsets[l + 1]) for l in np.sort(probe) if self.offsets[l + 1] > self.offsets[l]]
+            if not ranges:
+                results.append(([], np.empty(0, dtype=np.float32)))
+                continue
+            candidates = np.concatenate([np.arange(start, end) for start, end in ranges])
+            scores = np.concatenate([self.vectors[start:end] @ query for start, end in ranges])
+            if live is not None:
+                scores[~np.concatenate([live[start:end] for start, end in ranges])] = -np.inf
+            if k < candidates.size:
+                top = np.argpartition(scores, candidates.size - k)[candidates.size - k:]
+            else:
+                top = np.arange(candidates.size)
+            top = top[np.argsort(-scores[top])]
+            if live is not None:
+                top = top[np.isfinite(scores[top])]
+            results.append(([self.ids[row] for row in candidates[top]], scores[top]))
+        return results
+
+    def metadata_bytes(self):
+        """Everything but the vectors, which are stored as a separate .npy so readers can memory-map them."""
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            version=np.array(INDEX_FORMAT_VERSION),
+            centroids=self.centroids,
+            lists=self.lists,
+            expires_at=self.expires_at,
+            trained_size=np.array(self.trained_size),
+            ids=_ids_array(self.ids)
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_metadata(cls, vectors, data):
+        with np.load(io.BytesIO(data), allow_pickle=False) as arrays:
+            version = int(arrays['version'])
+            if version != INDEX_FORMAT_VERSION:
+                raise ValueError(f"Unsupported ANN index version {version}")
+            ids = _ids_list(arrays['ids'])
+            if len(ids) != vectors.shape[0]:
+                raise ValueError(f"ANN index has {vectors.shape[0]} vectors but {len(ids)} ids")
+            return cls(arrays['centroids'], vectors, ids, arrays['lists'], arrays['expires_at'],
+                       int(arrays['trained_size']))
+
+
+class JobIndex:
+    """A stored base IVFIndex plus the delta of jobs added since the base was written.
+
+    Delta rows are assigned to the base centroids. Base rows whose job is in
+    the delta, or whose expires_at has passed, are masked out of searches
+    instead of being removed, so the (memory-mapped) base is never modified.
+    """
+
+    def __init__(self, base, delta=None, pointer=None, now=None):
+        self.base = base
+        self.delta = delta if delta is not None else IVFIndex(
+            base.centroids, np.empty((0, base.dim), np.float32), [], [], [], base.trained_size)
+        self.pointer = pointer
+        self.live = np.ones(len(base), dtype=bool)
+        self._hide_replaced(self.delta.ids)
+        self.remove_expired(now)
+
+    def __len__(self):
+        return int(self.live.sum()) + len(self.delta)
+
+    @property
+    def dim(self):
+        return self.base.dim
+
+    @property
+    def hidden(self):
+        """Base rows masked out until the next compaction."""
+        return int((~self.live).sum())
+
+    def _hide_replaced(self, ids):
+        rows = [self.base.positions[job_id] for job_id in ids if job_id in self.base.positions]
+        self.live[rows] = False
+
+    def add(self, matrix, ids, expires_at=None):
+        """Insert or replace vectors in the delta; returns the number of ids not indexed before."""
+        matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        expires_at = np.zeros(len(ids), dtype=np.int64) if expires_at is None else np.asarray(expires_at, dtype=np.int64)
+        added = sum(1 for job_id in ids if job_id not in self.base.positions and job_id not in self.delta.positions)
+        replaced = set(ids)
+        keep = [row for row, job_id in enumerate(self.delta.ids) if job_id not in replaced]
+        self.delta = IVFIndex(
+            self.base.centroids,
+            np.vstack([self.delta.vectors[keep], matrix]),
+            [self.delta.ids[row] for row in keep] + list(ids),
+            np.concatenate([self.delta.lists[keep], nearest_centroids(matrix, self.base.centroids)]),
+            np.concatenate([self.delta.expires_at[keep], expires_at]),
+            self.base.trained_size
+        )
+        self._hide_replaced(ids)
+        return added
+
+    def extend_expiry(self, ids, expires_at):
+        """Raise expires_at of indexed jobs; returns how many were found.
+
+        Base rows are copied into the delta with the new value, as the base is never modified.
+        """
+        expiry_by_id = dict(zip(ids, expires_at))
+        found = 0
+        for job_id, expiry in expiry_by_id.items():
+            row = self.delta.positions.get(job_id)
+            if row is not None:
+                self.delta.expires_at[row] = max(int(self.delta.expires_at[row]), expiry)
+                found += 1
+        base_ids = [job_id for job_id in expiry_by_id if job_id not in self.delta.positions and job_id in self.base.positions]
+        if base_ids:
+            rows = [self.base.positions[job_id] for job_id in base_ids]
+            self.add(np.asarray(self.base.vectors[rows]), base_ids,
+                     [max(int(self.base.expires_at[row]), expiry_by_id[job_id]) for row, job_id in zip(rows, base_ids)])
+        return found + len(base_ids)
+
+    def remove_expired(self, now=None):
+        """Drop expired delta rows and mask expired base rows; returns how many delta rows were dropped."""
+        now = int(time.time()) if now is None else now
+        self.live &= (self.base.expires_at == 0) | (self.base.expires_at > now)
+        return self.delta.remove_expired(now)
+
+    def needs_compaction(self):
+        return (len(self.delta) + self.hidden > COMPACT_FRACTION * max(1, len(self.base))
+                or len(self) > RETRAIN_GROWTH * max(1, self.base.trained_size))
+
+    def compacted(self):
+        """Merge the live base rows and the delta into a new in-memory IVFIndex, retrained if it has grown."""
+        rows = np.flatnonzero(self.live)
+        merged = IVFIndex(
+            self.base.centroids,
+            np.vstack([self.base.vectors[rows], self.delta.vectors]),
+            [self.base.ids[row] for row in rows] + self.delta.ids,
+            np.concatenate([self.base.lists[rows], self.delta.lists]),
+            np.concatenate([self.base.expires_at[rows], self.delta.expires_at]),
+            self.base.trained_size
+        )
+        if len(merged) > RETRAIN_GROWTH * max(1, merged.trained_size):
+            merged.retrain()
+        return merged
+
+    def search(self, queries, k=10, n_probe=DEFAULT_N_PROBE):
+        """IVFIndex.search over the live base rows and the delta together."""
+        base_results = self.base.search(queries, k=k, n_probe=n_probe, live=self.live)
+        if not len(self.delta):
+            return base_results
+        results = []
+        for (base_ids, base_scores), (delta_ids, delta_scores) in zip(
+                base_results, self.delta.search(queries, k=k, n_probe=n_probe)):
+            ids = base_ids + delta_ids
+            scores = np.concatenate([base_scores, delta_scores])
+            top = np.argsort(-scores, kind='stable')[:k]
+            results.append(([ids[row] for row in top], scores[top]))
+        return results
+
+    def delta_bytes(self):
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            vectors=self.delta.vectors,
+            lists=self.delta.lists,
+            expires_at=self.delta.expires_at,
+            ids=_ids_array(self.delta.ids)
+        )
+        return buffer.getvalue()
+
+    @staticmethod
+    def delta_from_bytes(base, data):
+        with np.load(io.BytesIO(data), allow_pickle=False) as arrays:
+            return IVFIndex(base.centroids, arrays['vectors'], _ids_list(arrays['ids']), arrays['lists'],
+                            arrays['expires_at'], base.trained_size)
+
+
+def _ids_array(ids):
+    return np.frombuffer('\n'.join(ids).encode('utf-8'), dtype=np.uint8)
+
+
+def _ids_list(array):
+    raw = array.tobytes().decode('utf-8')
+    return raw.split('\n') if raw else []
+
+
+def _versions_prefix(key):
+    return posixpath.join(posixpath.dirname(key), 'versions') + '/'
+
+
+def _local_path(version):
+    return os.path.join(LOCAL_DIR, f"{LOCAL_PREFIX}{version}.npy")
+
+
+def _remove_other_versions(version):
+    # Older base versions are no longer needed; /tmp is shared by every warm invocation
+    keep = os.path.basename(_local_path(version))
+    for name in os.listdir(LOCAL_DIR):
+        if name.startswith(LOCAL_PREFIX) and name != keep:
+            try:
+                os.remove(os.path.join(LOCAL_DIR, name))
+            except OSError:
+                pass
+
+
+def read_pointer(s3, bucket, key):
+    """Return (pointer, etag), or (None, None) when no index has been stored yet."""
+    try:
+        response = s3.get_object(Bucket=bucket, Key=key)
+    except s3.exceptions.NoSuchKey:
+        return None, None
+    return json.loads(response['Body'].read()), response.get('ETag')
+
+
+# Module-global so warm invocations reuse the mapped base while only the delta changes
+_state = {'base': None, 'version': None}
+
+
+def _load_base(s3, bucket, base):
+    if _state['version'] == base['version']:
+        return _state['base']
+    local_path = _local_path(base['version'])
+    if not os.path.exists(local_path):
+        partial_path = local_path + '.part'
+        s3.download_file(bucket, base['vectors_key'], partial_path)
+        os.replace(partial_path, local_path)
+    _remove_other_versions(base['version'])
+    vectors = np.load(local_path, mmap_mode='r', allow_pickle=False)
+    index = IVFIndex.from_metadata(vectors, s3.get_object(Bucket=bucket, Key=base['meta_key'])['Body'].read())
+    _state.update(base=index, version=base['version'])
+    return index
+
+
+def load_index(s3, bucket, key):
+    """Return (JobIndex, etag of the pointer), or (None, None) when no index has been stored yet."""
+    pointer, etag = read_pointer(s3, bucket, key)
+    if pointer is None:
+        return None, None
+    if pointer.get('format') != INDEX_FORMAT_VERSION:
+        raise ValueError(f"Unsupported ANN index version {pointer.get('format')}")
+    base = _load_base(s3, bucket, pointer['base'])
+    delta = None
+    if pointer.get('delta'):
+        delta = JobIndex.delta_from_bytes(base, s3.get_object(Bucket=bucket, Key=pointer['delta']['key'])['Body'].read())
+    return JobIndex(base, delta, pointer), etag
+
+
+def _version_name(data):
+    created_at = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    return f"{created_at}-{hashlib.sha256(data).hexdigest()[:12]}"
+
+
+def _write_pointer(s3, bucket, key, pointer, previous):
+    s3.put_object(Bucket=bucket, Key=key, Body=json.dumps(pointer).encode('utf-8'),
+                  ContentType='application/json', CacheControl='no-cache')
+    # Objects replaced by the previous update are deleted one update later, so a
+    # reader that had just read the old pointer can still fetch them
+    for retired_key in (previous or {}).get('retired', []):
+        s3.delete_object(Bucket=bucket, Key=retired_key)
+
+
+def _pointer_keys(pointer):
+    if pointer is None:
+        return []
+    keys = [pointer['base']['vectors_key'], pointer['base']['meta_key']]
+    if pointer.get('delta'):
+        keys.append(pointer['delta']['key'])
+    return keys
+
+
+def save_index(s3, bucket, key, index):
+    """Store index (an IVFIndex) as a new base version with an empty delta; returns the bytes written.
+
+    The vectors are written to the local version file first and uploaded from
+    there, which also spares this process the download on its next load.
+    """
+    previous, _ = read_pointer(s3, bucket, key)
+    metadata = index.metadata_bytes()
+    version = _version_name(metadata)
+    prefix = f"{_versions_prefix(key)}{version}/"
+    local_path = _local_path(version)
+    with open(local_path + '.part', 'wb') as f:
+        np.save(f, np.ascontiguousarray(index.vectors, dtype=np.float32), allow_pickle=False)
+    os.replace(local_path + '.part', local_path)
+    pointer = {
+        'format': INDEX_FORMAT_VERSION,
+        'base': {'version': version, 'vectors_key': prefix + 'vectors.npy', 'meta_key': prefix + 'meta.npz',
+                 'count': len(index)},
+        'delta': None,
+        'retired': _pointer_keys(previous)
+    }
+    s3.upload_file(local_path, bucket, pointer['base']['vectors_key'])
+    s3.put_object(Bucket=bucket, Key=pointer['base']['meta_key'], Body=metadata, ContentType='application/octet-stream')
+    _write_pointer(s3, bucket, key, pointer, previous)
+    return os.path.getsize(local_path) + len(metadata)
+
+
+def save_delta(s3, bucket, key, index):
+    """Store the delta of index (a JobIndex from load_index) next to its base; returns the bytes written."""
+    data = index.delta_bytes()
+    base = index.pointer['base']
+    pointer = dict(index.pointer, delta={
+        'key': f"{_versions_prefix(key)}{base['version']}/delta-{_version_name(data)}.npz",
+        'count': len(index.delta)
+    })
+    pointer['retired'] = [index.pointer['delta']['key']] if index.pointer.get('delta') else []
+    s3.put_object(Bucket=bucket, Key=pointer['delta']['key'], Body=data, ContentType='application/octet-stream')
+    _write_pointer(s3, bucket, key, pointer, index.pointer)
+    return len(data)
+
+
+def build_index_from_table(job_table, now=None):
+    """Index every unexpired job with an embedding in the job-postings table."""
+    from data_access import scan_all
+    from embedding_codec import decode_embedding
+    from matching_engine import normalize_embeddings
+
+    now = int(time.time()) if now is None else now
+    items = scan_all(
+        job_table,
+        ProjectionExpression='job_id, embedding, expires_at',
+        FilterExpression='attribute_exists(embedding)'
+    )
+    items = [item for item in items if int(item.get('expires_at') or 0) == 0 or int(item['expires_at']) > now]
+    matrix, kept = normalize_embeddings([decode_embedding(item['embedding']) for item in items])
+    items = [items[i] for i in kept]
+    return IVFIndex.build(matrix, [item['job_id'] for item in items],
+                          np.array([int(item.get('expires_at') or 0) for item in items], dtype=np.int64))
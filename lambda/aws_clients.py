@@ -0,0 +1,64 @@
+"""Lazily created AWS clients and DynamoDB tables shared by the handlers.
+
+Creating a boto3 client or resource loads and parses its service model,
+which is a visible part of every cold start. Handlers declare what they
+use at module level with lazy_client() / lazy_table(), but nothing is
+built until a code path first touches it, so paths that never publish or
+never read S3 do not pay for those clients. Instances are cached for the life of the
+container and shared between modules; creation is serialized because
+boto3's default session is not thread-safe.
+"""
+import threading
+
+import boto3
+
+_lock = threading.RLock()
+_instances = {}
+
+
+def _cached(key, factory):
+    instance = _instances.get(key)
+    if instance is None:
+        with _lock:
+            instance = _instances.get(key)
+            if instance is None:
+                instance = _instances[key] = factory()
+    return instance
+
+
+def get_client(service, config=None):
+    # A botocore Config (timeouts, retries) gets its own client; pass the same object each time
+    return _cached(('client', service, config), lambda: boto3.client(service, config=config))
+
+
+def get_resource(service):
+    return _cached(('resource', service), lambda: boto3.resource(service))
+
+
+def get_table(name):
+    return _cached(('table', name), lambda: get_resource('dynamodb').Table(name))
+
+
+class _Lazy:
+    """Stands in for a client or table and builds it on first attribute access."""
+
+    __slots__ = ('_factory', '_name', '_kwargs')
+
+    def __init__(self, factory, name, **kwargs):
+        self._factory = factory
+        self._name = name
+        self._kwargs = kwargs
+
+    def __getattr__(self, attribute):
+        return getattr(self._factory(self._name, **self._kwargs), attribute)
+
+    def __repr__(self):
+        return f"<lazy {self._factory.__name__}({self._name!r})>"
+
+
+def lazy_client(service, config=None):
+    return _Lazy(get_client, service, config=config)
+
+
+def lazy_table(name):
+    return _Lazy(get_table, name)
@@ -0,0 +1,217 @@
+"""Batched, concurrent DynamoDB writes shared by the Lambdas.
+
+Items are de-duplicated by primary key (last one wins), split into 25-item
+BatchWriteItem requests and sent from a small thread pool through the
+table's thread-safe client. UnprocessedItems and throttling errors are
+retried with exponential backoff. Every call returns a stats dict that
+log_write_stats prints at the end of an invocation.
+
+boto3's Table.batch_writer does the 25-item chunking too, but it resends
+UnprocessedItems straight away without backoff, can only be used from one
+thread, and does not report throttles. That is why this module calls
+BatchWriteItem directly.
+"""
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+
+BATCH_WRITE_SIZE = 25  # DynamoDB BatchWriteItem limit
+MAX_RETRIES = 8
+THROTTLE_ERRORS = ('ProvisionedThroughputExceededException', 'ThrottlingException', 'RequestLimitExceeded')
+
+
+def _backoff(attempt):
+    # Exponential backoff with full jitter, capped at ~5 seconds
+    time.sleep(random.uniform(0, min(5.0, 0.05 * (2 ** attempt))))
+
+
+def _write_batch(client, table_name, requests):
+    stats = {'written': 0, 'throttles': 0, 'retries': 0, 'failed': 0}
+    pending = requests
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            response = client.batch_write_item(RequestItems={table_name: pending})
+        except ClientError as e:
+            if e.response['Error']['Code'] not in THROTTLE_ERRORS or attempt == MAX_RETRIES:
+                raise
+            stats['throttles'] += 1
+            stats['retries'] += 1
+            _backoff(attempt)
+            continue
+
+        unprocessed = response.get('UnprocessedItems', {}).get(table_name, [])
+        stats['written'] += len(pending) - len(unprocessed)
+        if not unprocessed:
+            return stats
+        stats['throttles'] += 1
+        if attempt == MAX_RETRIES:
+            break
+        stats['retries'] += 1
+        pending = unprocessed
+        _backoff(attempt)
+
+    stats['failed'] += len(pending)
+    print(f"Gave up on {len(pending)} unprocessed writes to {table_name}")
+    return stats
+
+
+def dedupe_by_key(items, key_names):
+    """Keep the last item for each primary key, preserving first-seen order."""
+    latest = {}
+    for item in items:
+        latest[tuple(item[name] for name in key_names)] = item
+    return list(latest.values())
+
+
+def _send_batches(table, requests, totals, max_workers):
+    batches = [requests[i:i + BATCH_WRITE_SIZE] for i in range(0, len(requests), BATCH_WRITE_SIZE)]
+    totals['batches'] = len(batches)
+    if batches:
+        client = table.meta.client
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(batches)))) as executor:
+            for batch_stats in executor.map(lambda batch: _write_batch(client, table.name, batch), batches):
+                for key, value in batch_stats.items():
+                    totals[key] += value
+
+
+def _new_totals(unique, items):
+    return {
+        'items': len(unique),
+        'duplicates': len(items) - len(unique),
+        'batches': 0,
+        'written': 0,
+        'throttles': 0,
+        'retries': 0,
+        'failed': 0,
+    }
+
+
+def _finish_totals(totals, start):
+    totals['seconds'] = time.perf_counter() - start
+    totals['items_per_second'] = totals['written'] / totals['seconds'] if totals['seconds'] > 0 else 0.0
+    return totals
+
+
+def write_items(table, items, key_names, max_workers=4):
+    """Write items with BatchWriteItem and return a stats dict.
+
+    key_names are the table's primary key attributes, e.g. ('job_id',) or
+    ('user_id', 'job_id'); they are used to drop duplicate keys, which
+    DynamoDB rejects within a single batch.
+    """
+    start = time.perf_counter()
+    unique = dedupe_by_key(items, key_names)
+    totals = _new_totals(unique, items)
+    _send_batches(table, [{'PutRequest': {'Item': item}} for item in unique], totals, max_workers)
+    return _finish_totals(totals, start)
+
+
+def delete_items(table, keys, key_names, max_workers=4):
+    """Delete items by primary key with BatchWriteItem; same stats as write_items."""
+    start = time.perf_counter()
+    unique = dedupe_by_key(keys, key_names)
+    totals = _new_totals(unique, keys)
+    _send_batches(table, [{'DeleteRequest': {'Key': {name: key[name] for name in key_names}}} for key in unique],
+                  totals, max_workers)
+    return _finish_totals(totals, start)
+
+
+def put_items_if_absent(table, items, key_name, max_workers=8):
+    """Conditionally put each item only if its key does not exist yet.
+
+    BatchWriteItem cannot carry conditions, so this uses concurrent put_item
+    calls with attribute_not_exists. Returns the same stats shape as
+    write_items plus 'inserted', the items that were actually new.
+    """
+    start = time.perf_counter()
+    unique = dedupe_by_key(items, (key_name,))
+    client = table.meta.client
+
+    def put(item):
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                client.put_item(
+                    TableName=table.name,
+                    Item=item,
+                    ConditionExpression='attribute_not_exists(#key)',
+                    ExpressionAttributeNames={'#key': key_name}
+                )
+                return 'written', attempt
+            except ClientError as e:
+                code = e.response['Error']['Code']
+                if code == 'ConditionalCheckFailedException':
+                    return 'exists', attempt
+                if code not in THROTTLE_ERRORS or attempt == MAX_RETRIES:
+                    raise
+                _backoff(attempt)
+
+    totals = dict(_new_totals(unique, items), inserted=[])
+    if unique:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(unique)))) as executor:
+            for item, (outcome, retries) in zip(unique, executor.map(put, unique)):
+                totals['throttles'] += retries
+                totals['retries'] += retries
+                if outcome == 'written':
+                    totals['written'] += 1
+                    totals['inserted'].append(item)
+                else:
+                    totals['duplicates'] += 1
+    return _finish_totals(totals, start)
+
+
+def extend_expiry(table, key_name, items, attribute='expires_at', max_workers=8):
+    """Raise attribute (a TTL timestamp) to each item's value on rows that still exist.
+
+    Concurrent conditional update_item calls: a row deleted in the meantime is
+    not recreated and a later expiry is never shortened. Returns the items
+    whose row was updated.
+    """
+    unique = dedupe_by_key(items, (key_name,))
+    client = table.meta.client
+
+    def update(item):
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                client.update_item(
+                    TableName=table.name,
+                    Key={key_name: item[key_name]},
+                    UpdateExpression='SET #expiry = :expiry',
+                    ConditionExpression='attribute_exists(#key) AND #expiry < :expiry',
+                    ExpressionAttributeNames={'#key': key_name, '#expiry': attribute},
+                    ExpressionAttributeValues={':expiry': item[attribute]}
+                )
+                return True
+            except ClientError as e:
+                code = e.response['Error']['Code']
+                if code == 'ConditionalCheckFailedException':
+                    return False
+                if code not in THROTTLE_ERRORS or attempt == MAX_RETRIES:
+                    raise
+                _backoff(attempt)
+
+    if not unique:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(unique)))) as executor:
+        return [item for item, updated in zip(unique, executor.map(update, unique)) if updated]
+
+
+def combine_write_stats(stats_list):
+    """Sum the stats of several write_items calls (e.g. one per fetched page)."""
+    totals = {'items': 0, 'duplicates': 0, 'batches': 0, 'written': 0,
+              'throttles': 0, 'retries': 0, 'failed': 0, 'seconds': 0.0}
+    for stats in stats_list:
+        for key in totals:
+            totals[key] += stats[key]
+    totals['items_per_second'] = totals['written'] / totals['seconds'] if totals['seconds'] > 0 else 0.0
+    return totals
+
+
+def log_write_stats(label, stats):
+    print(
+        f"{label}: wrote {stats['written']}/{stats['items']} items in {stats['batches']} batches "
+        f"({stats['items_per_second']:.0f} items/s, {stats['seconds']:.2f}s), "
+        f"duplicates dropped {stats['duplicates']}, throttles {stats['throttles']}, "
+        f"retries {stats['retries']}, failed {stats['failed']}"
+    )
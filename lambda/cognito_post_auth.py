@@ -1,12 +1,12 @@
-import boto3
 import json
 import os
 from botocore.exceptions import ClientError
+from aws_clients import lazy_client, lazy_table
 
 # Initialize AWS clients
-sns = boto3.client('sns')
-dynamodb = boto3.resource('dynamodb')
-user_topics_table = dynamodb.Table(os.environ['BOOKING_TABLE'])
+sns = lazy_client('sns')
+user_topics_table = lazy_table(os.environ['USER_TOPICS_TABLE'])
+notification_topic_arn = os.environ['NOTIFICATION_TOPIC_ARN']
 
 def lambda_handler(event, context):
     try:
@@ -23,31 +23,29 @@ def lambda_handler(event, context):
         email = body.get('email')
         print(f"Processing sign-in for user_id: {user_id}, email: {email}")
 
-        # Check if topic exists in DynamoDB
+        # Check if the user is already subscribed
         response = user_topics_table.get_item(Key={'user_id': user_id})
         if 'Item' not in response:
-            # Create a new SNS topic
-            topic_name = f"user-{user_id}"
-            topic_response = sns.create_topic(Name=topic_name)
-            topic_arn = topic_response['TopicArn']
-            print(f"Created new topic: {topic_arn}")
-
-            # Subscribe the user's email to the topic
+            # Subscribe the user's email to the shared notification topic; the filter
+            # policy delivers only digests published with this user's user_id attribute
             subscription_response = sns.subscribe(
-                TopicArn=topic_arn,
+                TopicArn=notification_topic_arn,
                 Protocol='email',
-                Endpoint=email
+                Endpoint=email,
+                Attributes={'FilterPolicy': json.dumps({'user_id': [user_id]})},
+                ReturnSubscriptionArn=True
             )
             print(f"Subscription requested: {subscription_response['SubscriptionArn']}")
 
-            # Store topic ARN in DynamoDB
+            # Store the subscription in DynamoDB
             user_topics_table.put_item(Item={
                 'user_id': user_id,
-                'topic_arn': topic_arn,
+                'topic_arn': notification_topic_arn,
+                'subscription_arn': subscription_response['SubscriptionArn'],
                 'email': email
             })
         else:
-            print(f"Topic already exists for user_id: {user_id}")
+            print(f"Subscription already exists for user_id: {user_id}")
 
         return {
             'statusCode': 200,
@@ -0,0 +1,187 @@
+"""DynamoDB read helpers shared by the Lambdas.
+
+Every helper follows LastEvaluatedKey / UnprocessedKeys, so results are never
+silently truncated at the 1 MB page limit. Work is spread over threads using
+the table's underlying client (boto3 clients are thread-safe, resources are
+not). That client is the one the Table resource itself uses, so requests and
+items use the same Python types as Table.scan / Table.get_item.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+SCAN_SEGMENTS = int(os.environ.get('SCAN_SEGMENTS', '4'))
+BATCH_GET_SIZE = 100  # DynamoDB BatchGetItem limit
+MAX_RETRIES = 8
+
+# GSI on job-postings: partition posted_date (YYYY-MM-DD, UTC), sort posted_timestamp. It
+# projects only the embedding and the attributes a match row and the job snapshot need
+JOB_DATE_INDEX = 'posted_date-v2-index'
+
+
+def _scan_segment(client, table_name, segment, total_segments, scan_kwargs):
+    items = []
+    request = dict(scan_kwargs, TableName=table_name)
+    if total_segments > 1:
+        request.update(Segment=segment, TotalSegments=total_segments)
+    while True:
+        response = client.scan(**request)
+        items.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return items
+        request['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def scan_all(table, total_segments=SCAN_SEGMENTS, **scan_kwargs):
+    """Scan a whole table with a paginated parallel scan and return every item.
+
+    Accepts the same keyword arguments as Table.scan (FilterExpression,
+    ProjectionExpression, ExpressionAttributeValues, ...).
+    """
+    client = table.meta.client
+    total_segments = max(1, total_segments)
+    if total_segments == 1:
+        return _scan_segment(client, table.name, 0, 1, scan_kwargs)
+
+    with ThreadPoolExecutor(max_workers=total_segments) as executor:
+        futures = [
+            executor.submit(_scan_segment, client, table.name, segment, total_segments, scan_kwargs)
+            for segment in range(total_segments)
+        ]
+        items = []
+        for future in futures:
+            items.extend(future.result())
+    return items
+
+
+def query_all(table, **query_kwargs):
+    """Run Table.query to completion, following LastEvaluatedKey."""
+    items = []
+    request = dict(query_kwargs, TableName=table.name)
+    client = table.meta.client
+    while True:
+        response = client.query(**request)
+        items.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return items
+        request['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def posted_date_bucket(timestamp):
+    """Day bucket (UTC date string) a job posted at `timestamp` is filed under."""
+    return datetime.fromtimestamp(int(timestamp), tz=timezone.utc).strftime('%Y-%m-%d')
+
+
+def query_recent_jobs(job_table, since_timestamp, until_timestamp=None, max_workers=4, **query_kwargs):
+    """Return jobs with posted_timestamp >= since_timestamp via the date-bucket GSI.
+
+    Only the day buckets between since_timestamp and until_timestamp (default:
+    now) are queried, in parallel, so the cost does not grow with the total
+    size of the table. Items carry only the attributes projected into the
+    index (see IAC/storage.yaml), not descriptions or apply options.
+    """
+    until_timestamp = int(until_timestamp if until_timestamp is not None else time.time())
+    day = datetime.fromtimestamp(int(since_timestamp), tz=timezone.utc).date()
+    last_day = datetime.fromtimestamp(until_timestamp, tz=timezone.utc).date()
+    buckets = []
+    while day <= last_day:
+        buckets.append(day.strftime('%Y-%m-%d'))
+        day += timedelta(days=1)
+
+    def query_bucket(bucket):
+        return query_all(
+            job_table,
+            IndexName=JOB_DATE_INDEX,
+            KeyConditionExpression='posted_date = :bucket AND posted_timestamp >= :since',
+            ExpressionAttributeValues={':bucket': bucket, ':since': int(since_timestamp)},
+            **query_kwargs
+        )
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(buckets)))) as executor:
+        items = []
+        for bucket_items in executor.map(query_bucket, buckets):
+            items.extend(bucket_items)
+    return items
+
+
+def _batch_get_chunk(client, table_name, keys, projection):
+    request = {'Keys': list(keys)}
+    if projection:
+        request.update(projection)
+    pending = {table_name: request}
+    items = []
+    for attempt in range(MAX_RETRIES):
+        response = client.batch_get_item(RequestItems=pending)
+        items.extend(response.get('Responses', {}).get(table_name, []))
+        pending = response.get('UnprocessedKeys') or {}
+        if not pending:
+            return items
+        time.sleep(min(0.05 * (2 ** attempt), 2.0))  # Exponential backoff on throttling
+    raise RuntimeError(f"batch_get_item on {table_name} left {len(pending[table_name]['Keys'])} keys unprocessed")
+
+
+def batch_get_items(table, keys, projection_expression=None, expression_attribute_names=None, max_workers=4):
+    """Fetch many items by key with BatchGetItem, 100 keys per request.
+
+    Duplicate keys are requested once. Missing items are simply absent from
+    the result; order is not preserved.
+    """
+    unique_keys = []
+    seen = set()
+    for key in keys:
+        marker = tuple(sorted(key.items()))
+        if marker not in seen:
+            seen.add(marker)
+            unique_keys.append(key)
+    if not unique_keys:
+        return []
+
+    projection = {}
+    if projection_expression:
+        projection['ProjectionExpression'] = projection_expression
+    if expression_attribute_names:
+        projection['ExpressionAttributeNames'] = expression_attribute_names
+
+    client = table.meta.client
+    chunks = [unique_keys[i:i + BATCH_GET_SIZE] for i in range(0, len(unique_keys), BATCH_GET_SIZE)]
+    if len(chunks) == 1:
+        return _batch_get_chunk(client, table.name, chunks[0], projection)
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+        futures = [executor.submit(_batch_get_chunk, client, table.name, chunk, projection) for chunk in chunks]
+        items = []
+        for future in futures:
+            items.extend(future.result())
+    return items
+
+
+def _decode_embedding(value):
+    # Imported lazily so handlers that only page or batch-get do not load NumPy
+    from embedding_codec import decode_embedding
+    return decode_embedding(value)
+
+
+def get_user_embedding(embeddings_table, user_id):
+    """Return the decoded embedding for one user, or None."""
+    item = embeddings_table.get_item(Key={'user_id': user_id}).get('Item')
+    if not item or 'embedding' not in item:
+        return None
+    return _decode_embedding(item['embedding'])
+
+
+def load_user_embeddings(embeddings_table, user_ids=None):
+    """Return {user_id: embedding} for every stored user embedding.
+
+    With user_ids, only those users are fetched (BatchGetItem); otherwise the
+    whole table is read with one parallel scan.
+    """
+    if user_ids is not None:
+        items = batch_get_items(embeddings_table, [{'user_id': user_id} for user_id in user_ids])
+    else:
+        items = scan_all(embeddings_table)
+    return {
+        item['user_id']: _decode_embedding(item['embedding'])
+        for item in items
+        if item.get('embedding') is not None
+    }
@@ -0,0 +1,139 @@
+"""Content-addressed cache for embeddings.
+
+Embeddings are keyed by sha256(model + normalized text), so the same job
+description returned by overlapping queries or on consecutive days is only
+sent to the embedding API once. Lookups go to a per-container LRU first,
+then to a DynamoDB table (content_hash -> binary embedding); only the
+remaining misses are embedded.
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+import unicodedata
+
+from batch_writes import write_items
+from data_access import batch_get_items
+from embedding_codec import decode_embedding, encode_embedding
+from lru_cache import LRUCache
+
+CACHE_TTL_DAYS = int(os.environ.get('EMBEDDING_CACHE_TTL_DAYS', '90'))
+MEMORY_CACHE_SIZE = int(os.environ.get('EMBEDDING_MEMORY_CACHE_SIZE', '2048'))
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_text(text):
+    """Canonical form used for hashing: NFC unicode with whitespace collapsed."""
+    return _WHITESPACE.sub(' ', unicodedata.normalize('NFC', text or '')).strip()
+
+
+def content_hash(text, model):
+    return hashlib.sha256(f"{model}\0{normalize_text(text)}".encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, table, model, memory_size=MEMORY_CACHE_SIZE):
+        self.table = table
+        self.model = model
+        self.memory = LRUCache(maxsize=memory_size)
+        self._lock = threading.Lock()
+        self.item_seconds = 0.0  # Running estimate of API latency per embedded text, kept across runs
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = {
+                'requested': 0,
+                'memory_hits': 0,
+                'table_hits': 0,
+                'misses': 0,
+                'embedded': 0,
+                'embed_seconds': 0.0,
+            }
+
+    def _count(self, **increments):
+        with self._lock:
+            for key, value in increments.items():
+                self.stats[key] += value
+            if increments.get('embedded'):
+                observed = increments['embed_seconds'] / increments['embedded']
+                self.item_seconds = observed if not self.item_seconds else 0.8 * self.item_seconds + 0.2 * observed
+
+    def get_embeddings(self, texts, embed_fn):
+        """Return one embedding (or None) per text, embedding only cache misses.
+
+        embed_fn takes a list of texts and returns a list of embeddings of the
+        same length, with None for texts it failed to embed.
+        """
+        hashes = [content_hash(text, self.model) for text in texts]
+        found = {}
+        for digest in set(hashes):
+            embedding = self.memory.get(digest)
+            if embedding is not None:
+                found[digest] = embedding
+        memory_hits = len(found)
+
+        lookup = [digest for digest in set(hashes) if digest not in found]
+        table_hits = 0
+        if lookup and self.table is not None:
+            for item in batch_get_items(self.table, [{'content_hash': digest} for digest in lookup]):
+                if item.get('model') == self.model and item.get('embedding') is not None:
+                    embedding = decode_embedding(item['embedding'])
+                    found[item['content_hash']] = embedding
+                    self.memory.put(item['content_hash'], embedding)
+                    table_hits += 1
+
+        # Embed each distinct missing text once
+        missing = {}
+        for digest, text in zip(hashes, texts):
+            if digest not in found and digest not in missing:
+                missing[digest] = text
+        embedded = 0
+        embed_seconds = 0.0
+        if missing:
+            started = time.perf_counter()
+            embeddings = embed_fn(list(missing.values()))
+            embed_seconds = time.perf_counter() - started
+            now = int(time.time())
+            new_items = []
+            for digest, embedding in zip(missing.keys(), embeddings):
+                if embedding is None:
+                    continue
+                found[digest] = embedding
+                self.memory.put(digest, embedding)
+                embedded += 1
+                new_items.append({
+                    'content_hash': digest,
+                    'model': self.model,
+                    'embedding': encode_embedding(embedding),
+                    'created_at': now,
+                    'expires_at': now + CACHE_TTL_DAYS * 86400
+                })
+            if new_items and self.table is not None:
+                write_items(self.table, new_items, ('content_hash',))
+
+        self._count(
+            requested=len(texts),
+            memory_hits=memory_hits,
+            table_hits=table_hits,
+            misses=len(missing),
+            embedded=embedded,
+            embed_seconds=embed_seconds
+        )
+        return [found.get(digest) for digest in hashes]
+
+    def report(self, label="Embedding cache"):
+        with self._lock:
+            stats = dict(self.stats)
+        lookups = stats['memory_hits'] + stats['table_hits'] + stats['misses']
+        hits = stats['memory_hits'] + stats['table_hits']
+        hit_rate = hits / lookups if lookups else 0.0
+        print(
+            f"{label}: {stats['requested']} texts, {lookups} distinct, hit rate {hit_rate:.1%} "
+            f"(memory {stats['memory_hits']}, table {stats['table_hits']}, misses {stats['misses']}), "
+            f"embedded {stats['embedded']} in {stats['embed_seconds']:.2f}s, "
+            f"estimated API time saved {hits * self.item_seconds:.2f}s"
+        )
+        return stats
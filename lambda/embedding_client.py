@@ -0,0 +1,192 @@
+"""Robust client for the OpenAI embeddings endpoint.
+
+Inputs are truncated to the model's per-input token limit and packed into
+batches under a token and size budget. Batches run concurrently. A batch
+that keeps failing after retries with backoff is bisected, so one bad or
+oversized input only loses its own embedding instead of the whole page.
+"""
+import math
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+EMBEDDING_MODEL = "text-embedding-ada-002"
+MAX_INPUT_TOKENS = 8191  # Per-input limit of the embedding model
+MAX_BATCH_TOKENS = int(os.environ.get('EMBED_MAX_BATCH_TOKENS', '100000'))
+MAX_BATCH_SIZE = int(os.environ.get('EMBED_MAX_BATCH_SIZE', '256'))
+EMBED_CONCURRENCY = int(os.environ.get('EMBED_CONCURRENCY', '4'))
+MAX_RETRIES = int(os.environ.get('EMBED_MAX_RETRIES', '4'))
+
+# Error classes (openai 0.x and 1.x names) worth retrying as-is; anything else is
+# treated as a problem with the batch contents and goes straight to bisection
+TRANSIENT_ERRORS = {
+    'RateLimitError', 'APIError', 'Timeout', 'APITimeoutError', 'APIConnectionError',
+    'ServiceUnavailableError', 'InternalServerError', 'TryAgain',
+}
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    # tiktoken is optional; without it tokens are estimated from character count
+    global _encoding
+    with _encoding_lock:
+        if _encoding is None:
+            try:
+                import tiktoken
+                _encoding = tiktoken.get_encoding('cl100k_base')
+            except Exception:
+                _encoding = False
+    return _encoding or None
+
+
+def count_tokens(text):
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return math.ceil(len(text) / 4)
+
+
+def truncate_text(text, max_tokens=MAX_INPUT_TOKENS):
+    """Cut text down to at most max_tokens tokens."""
+    text = text or ' '
+    encoding = _get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text)
+        return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+    return text[:max_tokens * 4]
+
+
+def pack_batches(token_counts, max_batch_tokens=MAX_BATCH_TOKENS, max_batch_size=MAX_BATCH_SIZE):
+    """Group input positions into batches under the token and size budgets."""
+    batches = []
+    current = []
+    current_tokens = 0
+    for position, tokens in enumerate(token_counts):
+        if current and (current_tokens + tokens > max_batch_tokens or len(current) >= max_batch_size):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append(position)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def openai_module():
+    """Import openai on first use and give it the API key.
+
+    openai (with its aiohttp/pydantic dependencies) is the slowest import in
+    the handlers and many invocations never call it, e.g. when every
+    embedding comes from the cache.
+    """
+    import openai
+    if not openai.api_key:
+        openai.api_key = os.environ.get('OPENAI_API_KEY')
+    return openai
+
+
+def _default_create(model, inputs):
+    return openai_module().Embedding.create(model=model, input=inputs)
+
+
+def _is_transient(error):
+    return type(error).__name__ in TRANSIENT_ERRORS
+
+
+class EmbeddingClient:
+    def __init__(self, model=EMBEDDING_MODEL, create_fn=None, concurrency=EMBED_CONCURRENCY,
+                 max_batch_tokens=MAX_BATCH_TOKENS, max_batch_size=MAX_BATCH_SIZE, max_retries=MAX_RETRIES):
+        self.model = model
+        self.create_fn = create_fn or _default_create
+        self.concurrency = concurrency
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = {'requests': 0, 'retries': 0, 'bisections': 0, 'truncated': 0, 'failed': 0}
+
+    def report(self, label="Embedding client"):
+        with self._lock:
+            stats = dict(self.stats)
+        print(f"{label}: {stats['requests']} requests, {stats['retries']} retries, "
+              f"{stats['bisections']} bisections, {stats['truncated']} truncated inputs, "
+              f"{stats['failed']} inputs failed")
+        return stats
+
+    def _count(self, key, value=1):
+        with self._lock:
+            self.stats[key] += value
+
+    def _request(self, inputs):
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._count('requests')
+                response = self.create_fn(self.model, inputs)
+                data = sorted(response['data'], key=lambda entry: entry.get('index', 0))
+                return [entry['embedding'] for entry in data]
+            except Exception as e:
+                if not _is_transient(e) or attempt == self.max_retries:
+                    raise
+                self._count('retries')
+                time.sleep(random.uniform(0, min(20.0, 0.5 * (2 ** attempt))))
+
+    def _embed_batch(self, inputs):
+        try:
+            return self._request(inputs)
+        except Exception as e:
+            if len(inputs) == 1:
+                print(f"Embedding failed for one input: {e}")
+                self._count('failed')
+                return [None]
+            # Bisect so only the offending input(s) lose their embedding
+            self._count('bisections')
+            middle = len(inputs) // 2
+            return self._embed_batch(inputs[:middle]) + self._embed_batch(inputs[middle:])
+
+    def embed(self, texts):
+        """Return one embedding per text, with None where embedding failed.
+
+        An input that cannot be prepared (e.g. not a string) fails on its own,
+        like an input the API rejects; it never raises.
+        """
+        if not texts:
+            return []
+        positions = []
+        inputs = []
+        token_counts = []
+        for position, text in enumerate(texts):
+            try:
+                truncated = truncate_text(text)
+                tokens = min(count_tokens(truncated), MAX_INPUT_TOKENS)
+            except Exception as e:
+                print(f"Skipping input {position} that cannot be embedded: {e}")
+                self._count('failed')
+                continue
+            if truncated != (text or ' '):
+                self._count('truncated')
+            positions.append(position)
+            inputs.append(truncated)
+            token_counts.append(tokens)
+
+        results = [None] * len(texts)
+        if not inputs:
+            return results
+        batches = pack_batches(token_counts, self.max_batch_tokens, self.max_batch_size)
+
+        def run(batch):
+            return batch, self._embed_batch([inputs[index] for index in batch])
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.concurrency, len(batches)))) as executor:
+            for batch, embeddings in executor.map(run, batches):
+                for index, embedding in zip(batch, embeddings):
+                    results[positions[index]] = embedding
+        return results
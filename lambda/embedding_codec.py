@@ -0,0 +1,75 @@
+"""Compact binary encoding for embeddings stored in DynamoDB.
+
+Embeddings used to be stored as str(list) and parsed back with json.loads.
+The binary form is a 4-byte header followed by little-endian floats and is
+written to a DynamoDB Binary attribute:
+
+    byte 0    format version (currently 1)
+    byte 1    dtype code (1 = float32, 2 = float16)
+    byte 2-3  reserved, keeps the payload 4-byte aligned
+
+decode_embedding accepts both the legacy text form and the binary form so
+readers keep working while existing rows are migrated
+(see scripts/migrate_embeddings.py).
+"""
+import json
+import os
+
+import numpy as np
+
+FORMAT_VERSION = 1
+HEADER_SIZE = 4
+
+DTYPE_CODES = {
+    'float32': 1,
+    'float16': 2,
+}
+CODE_DTYPES = {
+    1: np.dtype('<f4'),
+    2: np.dtype('<f2'),
+}
+
+# Storage precision for newly written embeddings
+DEFAULT_DTYPE = os.environ.get('EMBEDDING_DTYPE', 'float32')
+
+
+def encode_embedding(embedding, dtype=DEFAULT_DTYPE):
+    """Encode a sequence of floats as versioned little-endian bytes."""
+    if dtype not in DTYPE_CODES:
+        raise ValueError(f"Unsupported embedding dtype: {dtype}")
+    code = DTYPE_CODES[dtype]
+    payload = np.asarray(embedding, dtype=CODE_DTYPES[code]).ravel().tobytes()
+    return bytes((FORMAT_VERSION, code, 0, 0)) + payload
+
+
+def decode_embedding(value):
+    """Decode a stored embedding into a 1-D numpy array.
+
+    Accepts the binary format (bytes or a boto3 Binary), the legacy
+    str(list) text form, or a plain list. Returns None for missing values.
+    Binary values are decoded without copying, so the result is read-only.
+    """
+    if value is None:
+        return None
+    if hasattr(value, 'value'):  # boto3.dynamodb.types.Binary
+        value = value.value
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        data = memoryview(value)
+        if len(data) < HEADER_SIZE:
+            raise ValueError("Embedding payload is shorter than its header")
+        version, code = data[0], data[1]
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported embedding format version: {version}")
+        if code not in CODE_DTYPES:
+            raise ValueError(f"Unsupported embedding dtype code: {code}")
+        return np.frombuffer(data, dtype=CODE_DTYPES[code], offset=HEADER_SIZE)
+    if isinstance(value, str):
+        if not value:
+            return None
+        return np.array(json.loads(value), dtype=np.float32)
+    return np.array([float(x) for x in value], dtype=np.float32)
+
+
+def is_legacy_embedding(value):
+    """True if the stored value still uses the str(list) text form."""
+    return isinstance(value, str)
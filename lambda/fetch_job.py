@@ -1,32 +1,236 @@
-import boto3
 import json
 import requests
 import os
+import threading
 import time
 from botocore.exceptions import ClientError
 from decimal import Decimal
-import openai
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from ann_index import JOB_INDEX_BUCKET, JOB_INDEX_KEY, build_index_from_table, load_index, save_delta, save_index
+from aws_clients import lazy_client, lazy_table
+from batch_writes import combine_write_stats, extend_expiry, log_write_stats, put_items_if_absent
+from data_access import batch_get_items, posted_date_bucket, query_recent_jobs
+from embedding_cache import EmbeddingCache
+from embedding_client import EMBEDDING_MODEL, EmbeddingClient
+from embedding_codec import decode_embedding, encode_embedding
+from job_identity import derive_job_id
+from job_pipeline import run_pipeline
+from job_snapshot import SNAPSHOT_BUCKET, SNAPSHOT_FIELDS, SNAPSHOT_WINDOW_HOURS, publish_snapshot
+from matching_engine import normalize_embeddings
+from rate_limiter import TokenBucket
 
 # Initialize AWS clients
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table(os.environ['JOB_POSTINGS_TABLE'])
-sns = boto3.client('sns')
+table = lazy_table(os.environ['JOB_POSTINGS_TABLE'])
+sns = lazy_client('sns')
+s3 = lazy_client('s3')
 
-# Retrieve API key from environment variable
-openai.api_key = os.environ['OPENAI_API_KEY']
+JSEARCH_URL = os.environ.get('JSEARCH_URL', 'https://jsearch.p.rapidapi.com/search')
+JSEARCH_HEADERS = {
+    "X-RapidAPI-Key": os.environ.get('JSEARCH_API_KEY', "730a07317fmsh9e75a7045abb786p14566fjsncc5584ddd7e6"),  # Replace if expired
+    "X-RapidAPI-Host": "jsearch.p.rapidapi.com"
+}
+# Pipeline tuning: JSearch requests per second (token bucket), burst size and stage widths
+JSEARCH_RATE_PER_SECOND = float(os.environ.get('JSEARCH_RATE_PER_SECOND', '1'))
+JSEARCH_BURST = int(os.environ.get('JSEARCH_BURST', '2'))
+FETCH_WORKERS = int(os.environ.get('FETCH_WORKERS', '4'))
+EMBED_WORKERS = int(os.environ.get('EMBED_WORKERS', '2'))
+PIPELINE_QUEUE_SIZE = int(os.environ.get('PIPELINE_QUEUE_SIZE', '4'))
+
+# Pooled HTTP session, reused across pages and warm invocations; retries 429/5xx with backoff
+http = requests.Session()
+http.mount('https://', HTTPAdapter(
+    pool_maxsize=FETCH_WORKERS,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504), allowed_methods=('GET',))
+))
+
+# job_ids already claimed by a page during the current invocation
+seen_job_ids = set()
+seen_lock = threading.Lock()
+
+# Posted jobs expire from the table this many days after ingestion (DynamoDB TTL)
+JOB_TTL_DAYS = int(os.environ.get('JOB_TTL_DAYS', '30'))
+# A stored posting that is still listed gets a fresh TTL once less than this many days are left,
+# so a live listing is rewritten about every JOB_TTL_DAYS - JOB_TTL_REFRESH_DAYS days, not every run
+JOB_TTL_REFRESH_DAYS = int(os.environ.get('JOB_TTL_REFRESH_DAYS', str(JOB_TTL_DAYS // 2)))
+
+# openai itself is imported on the first embedding request (see embedding_client.openai_module)
+embedding_client = EmbeddingClient(EMBEDDING_MODEL)
+
+# Content-addressed embedding cache; the in-memory layer survives warm invocations
+embedding_cache = EmbeddingCache(lazy_table(os.environ['EMBEDDING_CACHE_TABLE']), EMBEDDING_MODEL)
 
 def get_openai_embedding(texts):
-    try:
-        # Batch all texts into a single API call
-        response = openai.Embedding.create(model="text-embedding-ada-002", input=texts)
-        return [data['embedding'] for data in response['data']]
-    except Exception as e:
-        print(f"Error in OpenAI embedding: {e}")
-        return [None] * len(texts)  # Return None embeddings for failed calls
+    # Token-budgeted, concurrent batches; failures are retried and bisected so
+    # only inputs that really cannot be embedded come back as None
+    return embedding_client.embed(texts)
+
+
+def fetch_page(task):
+    query, page = task['query'], task['page']
+    querystring = {
+        "query": f"{query['job_title']} {query['location']}",
+        "page": str(page),
+        "num_pages": "1"  # 1 page at a time
+    }
+    response = http.get(JSEARCH_URL, headers=JSEARCH_HEADERS, params=querystring, timeout=30)
+    response.raise_for_status()
+    job_data = response.json()
+    print(f"API Response - Page {page} for {query['job_title']} in {query['location']}: {len(job_data.get('data', []))} jobs")
+    return job_data
+
+
+def build_job_item(job, query, timestamp):
+    # Deterministic id (upstream job_id or title/employer/location fingerprint), so
+    # the same posting seen by overlapping queries or on later days maps to one row
+    job_id = derive_job_id(job, query['location'])
+    item = {
+        'job_id': job_id,
+        'source_job_id': job.get('job_id', 'Unknown'),
+        'job_title': job.get('job_title', 'Unknown'),
+        'location': job.get('job_location', query['location']),
+        'median_salary': Decimal(str(job.get('salary_median', 0))),
+        'min_salary': Decimal(str(job.get('salary_min', 0))),
+        'max_salary': Decimal(str(job.get('salary_max', 0))),
+        'description': job.get('job_description', f"Job posting for {job.get('job_title', 'Unknown')} in {job.get('job_location', query['location'])}"),
+        'employment_type': job.get('job_employment_type', 'Unknown'),
+        'is_remote': bool(job.get('job_is_remote', False)),
+        'posted_at': job.get('job_posted_at_datetime_utc', 'Unknown'),
+        'benefits': job.get('job_benefits', 'Not specified'),
+        'apply_link': job.get('job_apply_link', 'No apply link available'),
+        'highlights': job.get('job_highlights', {'Qualifications': [], 'Responsibilities': [], 'Benefits': []}),
+        'posted_timestamp': int(job.get('job_posted_at_timestamp') or timestamp),
+        'apply_options': job.get('apply_options', []),
+        'expires_at': timestamp + JOB_TTL_DAYS * 86400
+    }
+    item['posted_date'] = posted_date_bucket(item['posted_timestamp'])  # GSI partition key
+    return item
+
+
+def claim_new_items(job_items):
+    # In-run dedupe: only the first page to see a job_id keeps it
+    fresh = []
+    with seen_lock:
+        for item in job_items:
+            if item['job_id'] not in seen_job_ids:
+                seen_job_ids.add(item['job_id'])
+                fresh.append(item)
+    return fresh
+
+
+def embed_page(task, job_data):
+    timestamp = int(time.time())
+    built = [build_job_item(job, task['query'], timestamp) for job in job_data.get('data', [])]
+    claimed = claim_new_items(built)
+
+    # Cross-run dedupe: skip jobs already stored before paying to embed them
+    existing = {
+        item['job_id']: int(item.get('expires_at') or 0) for item in batch_get_items(
+            table, [{'job_id': item['job_id']} for item in claimed], projection_expression='job_id, expires_at'
+        )
+    }
+    job_items = [item for item in claimed if item['job_id'] not in existing]
+    # Still listed upstream: push out the TTL of stored postings that would otherwise expire
+    # soon (rows without a TTL are left alone)
+    refresh_before = timestamp + JOB_TTL_REFRESH_DAYS * 86400
+    ttl_refresh = [
+        {'job_id': item['job_id'], 'expires_at': item['expires_at']}
+        for item in claimed if 0 < existing.get(item['job_id'], 0) < refresh_before
+    ]
+
+    # Batch embed job descriptions for this page; only cache misses reach the API
+    embeddings = embedding_cache.get_embeddings([item['description'] for item in job_items], get_openai_embedding)
+    for item, embedding in zip(job_items, embeddings):
+        if embedding is not None:
+            item['embedding'] = encode_embedding(embedding)  # Stored as a DynamoDB Binary attribute
+    return {
+        'job_data': job_data,
+        'job_items': job_items,
+        'ttl_refresh': ttl_refresh,
+        'duplicates_in_run': len(built) - len(claimed),
+        'already_stored': len(existing)
+    }
+
+
+def write_page(task, page_result):
+    query, page = task['query'], task['page']
+    # Conditional writes: a job stored concurrently by another run is not overwritten
+    page_stats = put_items_if_absent(table, page_result['job_items'], 'job_id')
+    page_stats['refreshed'] = extend_expiry(table, 'job_id', page_result['ttl_refresh'])
+    inserted_ids = [item['job_id'] for item in page_stats['inserted']]
+    print(f"Inserted {len(inserted_ids)} new jobs for page {page} of {query['job_title']} in {query['location']} "
+          f"(skipped {page_result['duplicates_in_run']} seen earlier in this run, "
+          f"{page_result['already_stored'] + page_stats['duplicates']} already stored, "
+          f"{len(page_stats['refreshed'])} given a fresh TTL)")
+    if not inserted_ids:
+        return {'job_data': page_result['job_data'], 'write_stats': page_stats}
+
+    # Publish to MatchUpdateTopic to trigger match Lambda; the job_ids let it
+    # score only the jobs inserted for this page instead of a full recompute
+    sns.publish(
+        TopicArn=os.environ['MATCH_UPDATE_TOPIC_ARN'],
+        Message=json.dumps({
+            'status': 'jobs_fetched',
+            'page': page,
+            'query': query,
+            'job_ids': inserted_ids
+        })
+    )
+    print(f"Published to MatchUpdateTopic for page {page}")
+    return {'job_data': page_result['job_data'], 'write_stats': page_stats}
+
+
+def update_job_index(inserted_items, refreshed_items):
+    # Keep the ANN index over the full posting history in step with the table. New jobs
+    # only go to the small delta object; the base is rewritten when the delta is compacted
+    started = time.perf_counter()
+    index, _ = load_index(s3, JOB_INDEX_BUCKET, JOB_INDEX_KEY)
+    if index is None or index.base.n_lists == 0:
+        # First run: index everything already stored (includes this run's inserts)
+        base = build_index_from_table(table)
+        size = save_index(s3, JOB_INDEX_BUCKET, JOB_INDEX_KEY, base)
+        print(f"Job index: built {len(base)} jobs in {base.n_lists} lists, {size / 1e6:.1f} MB, "
+              f"in {time.perf_counter() - started:.2f}s")
+        return
+
+    items = [item for item in inserted_items if item.get('embedding') is not None]
+    matrix, kept = normalize_embeddings([decode_embedding(item['embedding']) for item in items])
+    items = [items[i] for i in kept]
+    added = index.add(matrix, [item['job_id'] for item in items],
+                      [int(item.get('expires_at') or 0) for item in items]) if items else 0
+    # Rows keep their own expires_at in the index, so TTLs refreshed in the table are mirrored
+    refreshed = index.extend_expiry([item['job_id'] for item in refreshed_items],
+                                    [int(item['expires_at']) for item in refreshed_items])
+    index.remove_expired()
+    if index.needs_compaction():
+        base = index.compacted()
+        size = save_index(s3, JOB_INDEX_BUCKET, JOB_INDEX_KEY, base)
+        print(f"Job index: added {added}, refreshed {refreshed}, compacted to {len(base)} jobs in {base.n_lists} lists, "
+              f"{size / 1e6:.1f} MB, updated in {time.perf_counter() - started:.2f}s")
+    else:
+        size = save_delta(s3, JOB_INDEX_BUCKET, JOB_INDEX_KEY, index)
+        print(f"Job index: added {added}, refreshed {refreshed}, delta of {len(index.delta)} jobs ({size / 1e6:.1f} MB) over a base of "
+              f"{len(index.base)} ({index.hidden} hidden), updated in {time.perf_counter() - started:.2f}s")
+
+
+def publish_job_snapshot():
+    # One query of the recent window here replaces the same query in every match invocation
+    fields = SNAPSHOT_FIELDS + ['embedding']
+    jobs = query_recent_jobs(
+        table, int(time.time()) - SNAPSHOT_WINDOW_HOURS * 3600,
+        ProjectionExpression=', '.join(f"#{name}" for name in fields),
+        ExpressionAttributeNames={f"#{name}": name for name in fields}
+    )
+    publish_snapshot(s3, SNAPSHOT_BUCKET, jobs)
+
 
 def lambda_handler(event, context):
     try:
         print("Starting API requests at:", time.ctime())
+        embedding_cache.reset_stats()
+        embedding_client.reset_stats()
+        with seen_lock:
+            seen_job_ids.clear()
 
         # Get queries from event or use broad default search
         job_queries = event.get('job_queries')
@@ -35,80 +239,56 @@ def lambda_handler(event, context):
                 {"job_title": "developer", "location": "new york"},
                 {"job_title": "software engineer", "location": "remote"}
             ]
-
-        all_job_data = []
         num_pages = int(event.get('num_pages', 1))  # Default to 1 page for testing
 
-        for query in job_queries:
-            job_descriptions = []
-            job_items = []
-            for page in range(1, num_pages + 1):
-                url = "https://jsearch.p.rapidapi.com/search"
-                querystring = {
-                    "query": f"{query['job_title']} {query['location']}",
-                    "page": str(page),
-                    "num_pages": "1"  # 1 page at a time
-                }
-                headers = {
-                    "X-RapidAPI-Key": "730a07317fmsh9e75a7045abb786p14566fjsncc5584ddd7e6",  # Replace if expired
-                    "X-RapidAPI-Host": "jsearch.p.rapidapi.com"
-                }
-
-                response = requests.get(url, headers=headers, params=querystring)
-                response.raise_for_status()
-                job_data = response.json()
-
-                print(f"API Response - Page {page} for {query['job_title']} in {query['location']}:")
-                print(json.dumps(job_data))
-
-                for idx, job in enumerate(job_data.get('data', []), start=1):
-                    timestamp = int(time.time())
-                    job_id = f"JOB-{page}-{idx}-{timestamp}-{query['job_title'].replace(' ', '-')}"
-                    item = {
-                        'job_id': job_id,
-                        'job_title': job.get('job_title', 'Unknown'),
-                        'location': job.get('job_location', query['location']),
-                        'median_salary': Decimal(str(job.get('salary_median', 0))),
-                        'min_salary': Decimal(str(job.get('salary_min', 0))),
-                        'max_salary': Decimal(str(job.get('salary_max', 0))),
-                        'description': job.get('job_description', f"Job posting for {job.get('job_title', 'Unknown')} in {job.get('job_location', query['location'])}"),
-                        'employment_type': job.get('job_employment_type', 'Unknown'),
-                        'is_remote': bool(job.get('job_is_remote', False)),
-                        'posted_at': job.get('job_posted_at_datetime_utc', 'Unknown'),
-                        'benefits': job.get('job_benefits', 'Not specified'),
-                        'apply_link': job.get('job_apply_link', 'No apply link available'),
-                        'highlights': job.get('job_highlights', {'Qualifications': [], 'Responsibilities': [], 'Benefits': []}),
-                        'posted_timestamp': int(job.get('job_posted_at_timestamp') or timestamp),
-                        'apply_options': job.get('apply_options', [])
-                    }
-                    job_items.append(item)
-                    job_descriptions.append(item['description'])
-                    print(f"Prepared job: {job_id} - {item['job_title']} in {item['location']}")
-
-                # Batch embed job descriptions for this page
-                embeddings = get_openai_embedding(job_descriptions)
-                for item, embedding in zip(job_items, embeddings):
-                    if embedding:
-                        item['embedding'] = str(embedding)  # Store as string for DynamoDB
-                    table.put_item(Item=item)
-                    print(f"Inserted job with embedding: {item['job_id']} - {item['job_title']}")
-
-                all_job_data.append(job_data)
-
-                # Publish to MatchUpdateTopic to trigger match Lambda
-                sns.publish(
-                    TopicArn=os.environ['MATCH_UPDATE_TOPIC_ARN'],
-                    Message=json.dumps({'status': 'jobs_fetched', 'page': page, 'query': query})
-                )
-                print(f"Published to MatchUpdateTopic for page {page}")
-
-                # Rate limit safety
-                time.sleep(1)
+        # Fetch, embed and write pages as overlapping stages; the token bucket
+        # keeps JSearch requests under the API rate limit
+        tasks = [{'query': query, 'page': page} for query in job_queries for page in range(1, num_pages + 1)]
+        summary = run_pipeline(
+            tasks,
+            fetch_page,
+            embed_page,
+            write_page,
+            fetch_workers=FETCH_WORKERS,
+            process_workers=EMBED_WORKERS,
+            queue_size=PIPELINE_QUEUE_SIZE,
+            limiter=TokenBucket(JSEARCH_RATE_PER_SECOND, JSEARCH_BURST)
+        )
+
+        stage_seconds = summary['stage_seconds']
+        print(f"Pipeline processed {len(summary['results'])}/{len(tasks)} pages in {summary['seconds']:.2f}s "
+              f"(busy: fetch {stage_seconds['fetch']:.2f}s, embed {stage_seconds['process']:.2f}s, "
+              f"write {stage_seconds['write']:.2f}s)")
+        log_write_stats("Job postings", combine_write_stats(result['write_stats'] for result in summary['results']))
+        embedding_cache.report()
+        embedding_client.report()
+
+        if JOB_INDEX_BUCKET:
+            try:
+                update_job_index([item for result in summary['results'] for item in result['write_stats']['inserted']],
+                                 [item for result in summary['results'] for item in result['write_stats']['refreshed']])
+            except Exception as e:
+                # Matching falls back to the recent-jobs window until the next successful update
+                print(f"Error updating job index: {e}")
+
+        if SNAPSHOT_BUCKET:
+            try:
+                publish_job_snapshot()
+            except Exception as e:
+                # Matchers keep using the previous version (or DynamoDB) until the next run
+                print(f"Error publishing job snapshot: {e}")
+
+        if tasks and not summary['results']:
+            return {
+                'statusCode': 500,
+                'body': json.dumps(f"Error: all {len(tasks)} pages failed: {summary['failed'][0][1]}")
+            }
 
         return {
             'statusCode': 200,
             'body': json.dumps('Job data stored in DynamoDB successfully'),
-            'job_data': all_job_data
+            'job_data': [result['job_data'] for result in summary['results']],
+            'failed_pages': len(summary['failed'])
         }
 
     except ClientError as e:
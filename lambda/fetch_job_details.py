@@ -1,72 +1,144 @@
-import boto3
+import hashlib
 import json
 import os
 from botocore.exceptions import ClientError
 from decimal import Decimal
+from aws_clients import lazy_table
+from data_access import batch_get_items
+from lru_cache import LRUCache
 
 # Initialize AWS client
-dynamodb = boto3.resource('dynamodb')
-job_table = dynamodb.Table(os.environ['JOB_POSTINGS_TABLE'])
+job_table = lazy_table(os.environ['JOB_POSTINGS_TABLE'])
+
+MAX_BATCH_JOBS = 100
+CACHE_MAX_AGE = int(os.environ.get('JOB_DETAILS_MAX_AGE', '86400'))
+# The fields shown never change once a posting is ingested, so formatted payloads are kept per
+# container and re-read after JOB_CACHE_TTL_SECONDS (1 hour by default); a posting removed by
+# its DynamoDB TTL stops being served within that time
+job_cache = LRUCache(maxsize=int(os.environ.get('JOB_CACHE_SIZE', '512')),
+                     ttl_seconds=int(os.environ.get('JOB_CACHE_TTL_SECONDS', '3600')))
+
+# Everything the detail page shows; the large embedding attribute is never read
+JOB_FIELDS = ['job_id', 'source_job_id', 'job_title', 'location', 'median_salary', 'min_salary', 'max_salary',
+              'description', 'employment_type', 'is_remote', 'posted_at', 'benefits', 'apply_link',
+              'highlights', 'posted_timestamp', 'apply_options', 'posted_date']
+PROJECTION_EXPRESSION = ', '.join(f"#{name}" for name in JOB_FIELDS)
+PROJECTION_NAMES = {f"#{name}": name for name in JOB_FIELDS}
+
+def to_json_value(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, dict):
+        return {key: to_json_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json_value(item) for item in value]
+    return value
+
+def format_job(item):
+    formatted_job = {key: to_json_value(value) for key, value in item.items()}
+    # Use original logic for posted_timestamp
+    formatted_job['posted_timestamp'] = int(item['posted_timestamp']) if 'posted_timestamp' in item else 0
+    return formatted_job
+
+def get_jobs(job_ids):
+    """Return {job_id: formatted job} from the container cache, reading misses in one batch."""
+    jobs = {}
+    missing = []
+    for job_id in job_ids:
+        cached = job_cache.get(job_id)
+        if cached is not None:
+            jobs[job_id] = cached
+        elif job_id not in missing:
+            missing.append(job_id)
+
+    if len(missing) == 1:
+        item = job_table.get_item(
+            Key={'job_id': missing[0]},
+            ProjectionExpression=PROJECTION_EXPRESSION,
+            ExpressionAttributeNames=PROJECTION_NAMES
+        ).get('Item')
+        items = [item] if item else []
+    elif missing:
+        items = batch_get_items(job_table, [{'job_id': job_id} for job_id in missing],
+                                projection_expression=PROJECTION_EXPRESSION,
+                                expression_attribute_names=PROJECTION_NAMES)
+    else:
+        items = []
+
+    for item in items:
+        formatted_job = format_job(item)
+        job_cache.put(item['job_id'], formatted_job)
+        jobs[item['job_id']] = formatted_job
+    print(f"Job details: {len(job_ids) - len(missing)} cached, {len(missing)} read, {len(missing) - len(items)} not found")
+    return jobs
+
+def parse_request(event):
+    """Return (job_ids, is_batch, if_none_match) for API Gateway proxy GETs and the mapped POST body."""
+    headers = {key.lower(): value for key, value in (event.get('headers') or {}).items()}
+    if 'httpMethod' in event:
+        params = event.get('queryStringParameters') or {}
+        if params.get('job_ids'):
+            job_ids = [job_id for job_id in params['job_ids'].split(',') if job_id]
+            return job_ids, True, headers.get('if-none-match')
+        return ([params['job_id']] if params.get('job_id') else []), False, headers.get('if-none-match')
+
+    body = event.get('body', '')
+    if body:
+        body = json.loads(body) if isinstance(body, str) else body
+    else:
+        body = {}
+    if body.get('job_ids') is not None:
+        if not isinstance(body['job_ids'], list):
+            raise ValueError('job_ids must be a list')
+        return [str(job_id) for job_id in body['job_ids']], True, headers.get('if-none-match')
+    return ([body['job_id']] if body.get('job_id') else []), False, headers.get('if-none-match')
+
+def respond(status_code, payload=None, cacheable=False, if_none_match=None):
+    headers = {
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Expose-Headers': 'ETag',
+        'Content-Type': 'application/json',
+        'Cache-Control': 'no-store'
+    }
+    body = json.dumps(payload, sort_keys=True) if payload is not None else ''
+    if cacheable:
+        etag = '"' + hashlib.sha256(body.encode('utf-8')).hexdigest()[:32] + '"'
+        headers['ETag'] = etag
+        # Authenticated content: browsers may keep it, shared caches may not
+        headers['Cache-Control'] = f"private, max-age={CACHE_MAX_AGE}, immutable"
+        if if_none_match and etag in [tag.strip() for tag in if_none_match.split(',')]:
+            return {'statusCode': 304, 'headers': headers, 'body': ''}
+    return {'statusCode': status_code, 'headers': headers, 'body': body}
 
 def lambda_handler(event, context):
     try:
-        # Extract job_id from the request body
-        print(event)
-        body = event.get('body', '')
-        if body:
-            body = json.loads(body) if isinstance(body, str) else body
-        else:
-            body = {}
-        
-        job_id = body.get('job_id')
-        if not job_id:
-            return {
-                'statusCode': 400,
-                'body': json.dumps({'error': 'Missing job_id in request body'})
-            }
-        print(job_id)
-        # Fetch job details from job_postings table
-        response = job_table.get_item(
-            Key={'job_id': job_id}
-        )
-        job = response.get('Item')
+        job_ids, is_batch, if_none_match = parse_request(event)
+        if not job_ids:
+            return respond(400, {'error': 'Missing job_id in request body'})
+        if len(job_ids) > MAX_BATCH_JOBS:
+            return respond(400, {'error': f"At most {MAX_BATCH_JOBS} job_ids per request"})
+        print(f"Job details request: {len(job_ids)} job_ids ({'batch' if is_batch else 'single'}"
+              f"{', conditional' if if_none_match else ''})")
+
+        jobs = get_jobs(job_ids)
+
+        if is_batch:
+            return respond(200, {
+                'jobs': jobs,
+                'missing': [job_id for job_id in job_ids if job_id not in jobs]
+            }, cacheable=True, if_none_match=if_none_match)
 
+        job = jobs.get(job_ids[0])
         if not job:
-            return {
-                'statusCode': 404,
-                'body': json.dumps({'error': 'Job not found'})
-            }
-        print(job)
-        # Pre-convert all Decimal values to float
-        for key, value in job.items():
-            if hasattr(value, 'to_integral_value'):  # Check if value is a Decimal
-                job[key] = float(value)
-
-        # Prepare response with all fields except embedding
-        formatted_job = {key: value for key, value in job.items() if key != 'embedding'}
-        # Use original logic for posted_timestamp
-        formatted_job['posted_timestamp'] = int(job['posted_timestamp']) if 'posted_timestamp' in job else 0
-
-        return {
-            'statusCode': 200,
-            'body': json.dumps({'job': formatted_job})
-        }
+            return respond(404, {'error': 'Job not found'})
+        return respond(200, {'job': job}, cacheable=True, if_none_match=if_none_match)
 
     except ClientError as e:
         print(f"AWS Client Error: {e}")
-        return {
-            'statusCode': 500,
-            'body': json.dumps({'error': 'Internal server error', 'details': str(e)})
-        }
+        return respond(500, {'error': 'Internal server error', 'details': str(e)})
     except json.JSONDecodeError as e:
         print(f"JSON Decode Error: {e}")
-        return {
-            'statusCode': 400,
-            'body': json.dumps({'error': 'Invalid JSON in request body', 'details': str(e)})
-        }
+        return respond(400, {'error': 'Invalid JSON in request body', 'details': str(e)})
     except Exception as e:
         print(f"Error: {e}")
-        return {
-            'statusCode': 400,
-            'body': json.dumps({'error': 'Invalid request', 'details': str(e)})
-        }
\ No newline at end of file
+        return respond(400, {'error': 'Invalid request', 'details': str(e)})
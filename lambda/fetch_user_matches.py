@@ -1,41 +1,146 @@
-import boto3
 import json
 import os
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal, InvalidOperation
+from boto3.dynamodb.conditions import Attr, Key
 from botocore.exceptions import ClientError
+from aws_clients import lazy_table
+from pagination import InvalidCursor, decode_cursor, encode_cursor, query_page
 
 # Initialize AWS client
-dynamodb = boto3.resource('dynamodb')
-match_table = dynamodb.Table(os.environ['MATCH_RESULTS_TABLE'])
+match_table = lazy_table(os.environ['MATCH_RESULTS_TABLE'])
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+HIGH_MATCH_SCORE = Decimal('0.8')
+# Sort option -> local secondary index whose range key orders the results
+SORT_INDEXES = {
+    'score': ('similarity_score-index', 'similarity_score'),
+    'recent': ('match_timestamp-index', 'match_timestamp'),
+}
+MATCH_FIELDS = ['job_id', 'similarity_score', 'match_timestamp', 'employment_type',
+                'job_title', 'location', 'is_remote', 'posted_at']
+
+def parse_request(event):
+    body = event.get('body') or {}
+    if isinstance(body, str):
+        body = json.loads(body) if body.strip() else {}
+
+    limit = int(body.get('limit', DEFAULT_LIMIT))
+    if limit < 1:
+        raise ValueError('limit must be positive')
+    sort = body.get('sort', 'score')
+    if sort not in SORT_INDEXES:
+        raise ValueError(f"sort must be one of {sorted(SORT_INDEXES)}")
+    min_score = body.get('min_score')
+    try:
+        min_score = Decimal(str(min_score)) if min_score is not None else None
+    except InvalidOperation:
+        raise ValueError('min_score must be a number')
+    remote = body.get('remote')
+    if remote is not None and not isinstance(remote, bool):
+        raise ValueError('remote must be true or false')
+    employment_type = body.get('employment_type')
+    return {
+        'limit': min(limit, MAX_LIMIT),
+        'cursor': body.get('cursor'),
+        'sort': sort,
+        'min_score': min_score,
+        'employment_type': employment_type if employment_type not in (None, '', 'All') else None,
+        'remote': remote,
+        'include_counts': bool(body.get('include_counts', False)),
+    }
+
+def build_query(user_id, params):
+    index_name, range_key = SORT_INDEXES[params['sort']]
+    key_condition = Key('user_id').eq(user_id)
+    filters = []
+    if params['min_score'] is not None:
+        if range_key == 'similarity_score':
+            # Pushed into the key condition: lower-scored matches are never read
+            key_condition = key_condition & Key('similarity_score').gte(params['min_score'])
+        else:
+            filters.append(Attr('similarity_score').gte(params['min_score']))
+    if params['employment_type']:
+        filters.append(Attr('employment_type').eq(params['employment_type']))
+    if params['remote'] is not None:
+        filters.append(Attr('is_remote').eq(params['remote']))
+
+    query = {
+        'IndexName': index_name,
+        'KeyConditionExpression': key_condition,
+        'ScanIndexForward': False,  # Highest score / newest first
+        'ProjectionExpression': ', '.join(f"#{name}" for name in MATCH_FIELDS),
+        'ExpressionAttributeNames': {f"#{name}": name for name in MATCH_FIELDS},
+    }
+    if filters:
+        filter_expression = filters[0]
+        for condition in filters[1:]:
+            filter_expression = filter_expression & condition
+        query['FilterExpression'] = filter_expression
+    return query
+
+def count_matches(**query_kwargs):
+    total = 0
+    kwargs = dict(query_kwargs, Select='COUNT')
+    while True:
+        response = match_table.query(**kwargs)
+        total += response['Count']
+        if 'LastEvaluatedKey' not in response:
+            return total
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def match_counts(user_id):
+    # Select=COUNT returns no items, so only the dashboard totals travel back. The counts still
+    # read the user's whole partition, so clients ask for them once per session, not per page
+    queries = {
+        'total': {'KeyConditionExpression': Key('user_id').eq(user_id)},
+        'high_match': {
+            'IndexName': SORT_INDEXES['score'][0],
+            'KeyConditionExpression': Key('user_id').eq(user_id) & Key('similarity_score').gte(HIGH_MATCH_SCORE)
+        },
+        'remote': {'KeyConditionExpression': Key('user_id').eq(user_id), 'FilterExpression': Attr('is_remote').eq(True)},
+    }
+    with ThreadPoolExecutor(max_workers=len(queries)) as executor:
+        futures = {name: executor.submit(count_matches, **query) for name, query in queries.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+def format_match(item):
+    return {
+        'job_id': item['job_id'],
+        'similarity_score': float(item['similarity_score']),
+        'match_timestamp': int(item['match_timestamp']) if 'match_timestamp' in item else 0,
+        'employment_type': item.get('employment_type','N/A'),
+        'job_title': item.get('job_title','N/A'),
+        'location': item.get('location', 'N/A'),
+        'is_remote': item.get('is_remote', False),
+        'posted_at': item.get('posted_at','N/A')
+    }
 
 def lambda_handler(event, context):
     try:
         # Extract user_id from Cognito claims
         user_id = event['claims']['sub']  # Using 'sub' as the unique user identifier from Cognito
+        params = parse_request(event)
 
-        # Query match_results table for the user
-        response = match_table.query(
-            KeyConditionExpression='user_id = :user_id',
-            ExpressionAttributeValues={':user_id': user_id}
-        )
-        print(f"Query response: {response}")
-        # Prepare response with match details
-        matches = response.get('Items', [])
-        formatted_matches = [
-            {
-                'job_id': item['job_id'],
-                'similarity_score': float(item['similarity_score']),
-                'match_timestamp': int(item['match_timestamp']) if 'match_timestamp' in item else 0,
-                'employment_type': item.get('employment_type','N/A'),
-                'job_title': item.get('job_title','N/A'),
-                'location': item.get('location', 'N/A'),
-                'is_remote': item.get('is_remote', False),
-                'posted_at': item.get('posted_at','N/A')
-            } for item in matches
-        ]
+        # The cursor is only valid for the same user, ordering and filters
+        scope = json.dumps([user_id, params['sort'], str(params['min_score']),
+                            params['employment_type'], params['remote']])
+        start_key = decode_cursor(params['cursor'], scope)
+
+        items, last_key = query_page(match_table, params['limit'], start_key, **build_query(user_id, params))
+        print(f"Returned {len(items)} matches for {user_id} (sort={params['sort']}, more={last_key is not None})")
+
+        body = {
+            'matches': [format_match(item) for item in items],
+            'next_cursor': encode_cursor(last_key, scope)
+        }
+        if params['include_counts']:
+            body['counts'] = match_counts(user_id)
 
         return {
             'statusCode': 200,
-            'body': json.dumps({'matches': formatted_matches})
+            'body': json.dumps(body)
         }
 
     except ClientError as e:
@@ -44,9 +149,15 @@ def lambda_handler(event, context):
             'statusCode': 500,
             'body': json.dumps({'error': 'Internal server error', 'details': str(e)})
         }
+    except (InvalidCursor, ValueError) as e:
+        print(f"Invalid request: {e}")
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'error': 'Invalid request', 'details': str(e)})
+        }
     except Exception as e:
         print(f"Error: {e}")
         return {
             'statusCode': 400,
             'body': json.dumps({'error': 'Invalid request', 'details': str(e)})
-        }
\ No newline at end of file
+        }
@@ -1,8 +1,8 @@
-import boto3
 import json
 from botocore.exceptions import ClientError
+from aws_clients import lazy_client
 
-s3 = boto3.client('s3')
+s3 = lazy_client('s3')
 
 def lambda_handler(event, context):
     # Extract user_id from Cognito authorizer claims
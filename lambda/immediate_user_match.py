@@ -1,80 +1,194 @@
-import boto3
 import json
 import os
 import time
+from botocore.exceptions import ClientError
 from datetime import datetime, timezone, timedelta
-import numpy as np
-from scipy.spatial import distance
 from decimal import Decimal
+from ann_index import JOB_INDEX_BUCKET, JOB_INDEX_KEY, load_index
+from aws_clients import lazy_client, lazy_table
+from batch_writes import log_write_stats, write_items
+from data_access import batch_get_items, load_user_embeddings, query_recent_jobs
+from embedding_codec import decode_embedding
+from job_filters import job_matches, preferences_from_item
+from job_snapshot import current_snapshot
+from matching_engine import MATCH_THRESHOLD, normalize_embeddings, score_matches
+from trigger_queue import batch_response, is_sqs_event, trigger_messages
 
 # Initialize AWS clients
-dynamodb = boto3.resource('dynamodb')
-match_table = dynamodb.Table(os.environ['MATCH_RESULTS_TABLE'])
-job_table = dynamodb.Table(os.environ['JOB_POSTINGS_TABLE'])
-applicant_embeddings = dynamodb.Table(os.environ['USER_EMBEDDINGS_TABLE'])
+s3 = lazy_client('s3')
+match_table = lazy_table(os.environ['MATCH_RESULTS_TABLE'])
+job_table = lazy_table(os.environ['JOB_POSTINGS_TABLE'])
+applicant_embeddings = lazy_table(os.environ['USER_EMBEDDINGS_TABLE'])
+preferences_table = lazy_table(os.environ['USER_PREFERENCES_TABLE'])
+
+ANN_TOP_K = int(os.environ.get('ANN_TOP_K', '100'))
+MATCH_ATTRIBUTES = ['job_id', 'employment_type', 'job_title', 'location', 'is_remote', 'posted_at', 'max_salary']
+
+# Job index kept across warm invocations; reloaded only when its pointer changes. The
+# memory-mapped base stays cached in ann_index while only the delta changes
+job_index_state = {'index': None, 'etag': None}
+
+def current_job_index():
+    if not JOB_INDEX_BUCKET:
+        return None
+    try:
+        etag = s3.head_object(Bucket=JOB_INDEX_BUCKET, Key=JOB_INDEX_KEY)['ETag']
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+            return None
+        raise
+    if etag != job_index_state['etag']:
+        started = time.perf_counter()
+        job_index_state['index'], job_index_state['etag'] = load_index(s3, JOB_INDEX_BUCKET, JOB_INDEX_KEY)
+        print(f"Loaded job index with {len(job_index_state['index'])} jobs in {time.perf_counter() - started:.2f}s")
+    return job_index_state['index']
+
+def candidate_jobs_from_index(index, user_matrix):
+    # Top-k over the full posting history for every user in the batch, then fetch only
+    # the attributes a match row needs, once per distinct job
+    started = time.perf_counter()
+    similarities = []
+    for job_ids, scores in index.search(user_matrix, k=ANN_TOP_K):
+        similarities.append({job_id: float(score) for job_id, score in zip(job_ids, scores) if score > MATCH_THRESHOLD})
+    wanted = set().union(*similarities)
+    print(f"Index search for {user_matrix.shape[0]} users returned {len(wanted)} distinct jobs above threshold "
+          f"in {(time.perf_counter() - started) * 1000:.1f}ms")
+    jobs = batch_get_items(
+        job_table, [{'job_id': job_id} for job_id in wanted],
+        projection_expression=', '.join(f"#{name}" for name in MATCH_ATTRIBUTES),
+        expression_attribute_names={f"#{name}": name for name in MATCH_ATTRIBUTES}
+    )
+    # Jobs deleted by TTL since the index was saved are simply not returned
+    jobs_by_id = {job['job_id']: job for job in jobs}
+    return [
+        [(jobs_by_id[job_id], similarity) for job_id, similarity in user_similarities.items() if job_id in jobs_by_id]
+        for user_similarities in similarities
+    ]
+
+def candidate_jobs_from_recent(user_matrix):
+    # Define time window for recent jobs (last 24 hours)
+    threshold_time = int((datetime.now(timezone.utc) - timedelta(hours=24)).timestamp())
 
-def lambda_handler(event, context):
     try:
-        print("Starting immediate user match at:", time.ctime())
+        snapshot = current_snapshot(s3)
+    except Exception as e:
+        print(f"Error loading job snapshot, reading jobs from DynamoDB: {e}")
+        snapshot = None
+    if snapshot is not None:
+        # Normalized, memory-mapped matrix shared by warm invocations
+        job_matrix, jobs = snapshot.since(threshold_time)
+    else:
+        # Fetch recent jobs from the date-bucket index
+        jobs = query_recent_jobs(job_table, threshold_time)
 
-        # Extract user_id from SNS message
-        user_id = json.loads(event['Records'][0]['Sns']['Message'])['user_id']
+        job_vectors = [decode_embedding(job.get('embedding')) for job in jobs]
+        job_matrix, kept_jobs = normalize_embeddings(job_vectors)
+        jobs = [jobs[i] for i in kept_jobs]  # Skip jobs without valid embeddings
+    candidates = [[] for _ in range(user_matrix.shape[0])]
+    for user_index, job_index, similarity in score_matches(user_matrix, job_matrix, MATCH_THRESHOLD):  # Same threshold as match Lambda
+        candidates[user_index].append((jobs[job_index], similarity))
+    return candidates
 
-        # Define time window for recent jobs (last 24 hours)
-        threshold_time = int((datetime.now(timezone.utc) - timedelta(hours=24)).timestamp())
+def merge_candidates(*candidate_lists):
+    # The same job can come from both the recent window and the index; keep it once
+    merged = {}
+    for user_candidates in candidate_lists:
+        for job, similarity in user_candidates:
+            merged.setdefault(job['job_id'], (job, similarity))
+    return list(merged.values())
 
-        # Fetch user embedding
-        embedding_response = applicant_embeddings.scan(
-            FilterExpression='user_id = :user_id',
-            ExpressionAttributeValues={':user_id': user_id}
-        )
-        items = embedding_response['Items']
-        if not items or 'embedding' not in items[0]:
+def load_preferences(user_ids):
+    items = batch_get_items(preferences_table, [{'user_id': user_id} for user_id in user_ids])
+    preferences_by_user = {}
+    for item in items:
+        try:
+            preferences_by_user[item['user_id']] = preferences_from_item(item)
+        except ValueError as e:
+            print(f"Ignoring invalid preferences of {item['user_id']}: {e}")
+    return preferences_by_user
+
+def match_users(user_ids):
+    """Score the given users in one pass; returns {user_id: match_count} for users with an embedding."""
+    user_embeddings = load_user_embeddings(applicant_embeddings, user_ids)
+    for user_id in user_ids:
+        if user_id not in user_embeddings:
             print(f"No embedding found for user_id: {user_id}")
-            return {
-                'statusCode': 200,
-                'body': json.dumps({'status': 'no_embedding'})
-            }
-        user_embedding = np.array(json.loads(items[0]['embedding']))
-
-        # Fetch recent jobs
-        jobs = job_table.scan(
-            FilterExpression='posted_timestamp >= :threshold',
-            ExpressionAttributeValues={':threshold': threshold_time}
-        )['Items']
-
-        matches = []
-        for job in jobs:
-            job_embedding = np.array(json.loads(job['embedding'])) if job.get('embedding') else None
-            if job_embedding is None or len(job_embedding) == 0:
-                continue
-            similarity = 1 - distance.cosine(np.ravel(user_embedding), np.ravel(job_embedding))
-            if similarity > 0.7:  # Same threshold as match Lambda
-                matches.append({
-                    'user_id': user_id,
-                    'job_id': job['job_id'],
-                    'similarity_score': Decimal(str(similarity)),
-                    'match_timestamp': int(time.time()),
-                    'employment_type': job['employment_type'],
-                    'job_title': job.get('job_title','N/A'),
-                    'location': job.get('location', 'N/A'),
-                    'is_remote': job.get('is_remote', False),
-                    'posted_at': job.get('posted_at','N/A')
-                })
-
-        # Store matches in DynamoDB
-        for match in matches:
-            match_table.put_item(Item=match)
-            print(f"Matched {match['user_id']} with {match['job_id']} (Score: {match['similarity_score']})")
+    user_ids = [user_id for user_id in user_ids if user_id in user_embeddings]
+    user_matrix, kept_users = normalize_embeddings(user_embeddings[user_id] for user_id in user_ids)
+    user_ids = [user_ids[i] for i in kept_users]
+    if not user_ids:
+        return {}
 
-        return {
-            'statusCode': 200,
-            'body': json.dumps({'status': 'immediate_match_complete', 'match_count': len(matches)})
-        }
+    # The last 24 hours are always scored exhaustively, so postings the index has not
+    # caught up with (or that sit outside the probed lists) are never dropped
+    candidates = candidate_jobs_from_recent(user_matrix)
+    index = current_job_index()
+    if index is not None and len(index) and index.dim == user_matrix.shape[1]:
+        candidates = [
+            merge_candidates(recent, from_index)
+            for recent, from_index in zip(candidates, candidate_jobs_from_index(index, user_matrix))
+        ]
+
+    # Candidate sets here are small, so preferences are applied per job after scoring
+    preferences_by_user = load_preferences(user_ids)
+    candidates = [
+        [(job, similarity) for job, similarity in user_candidates if job_matches(preferences_by_user.get(user_id), job)]
+        for user_id, user_candidates in zip(user_ids, candidates)
+    ]
+
+    matches = []
+    match_timestamp = int(time.time())
+    for user_id, user_candidates in zip(user_ids, candidates):
+        for job, similarity in user_candidates:
+            matches.append({
+                'user_id': user_id,
+                'job_id': job['job_id'],
+                'similarity_score': Decimal(str(similarity)),
+                'match_timestamp': match_timestamp,
+                'employment_type': job['employment_type'],
+                'job_title': job.get('job_title','N/A'),
+                'location': job.get('location', 'N/A'),
+                'is_remote': job.get('is_remote', False),
+                'posted_at': job.get('posted_at','N/A')
+            })
+
+    # Store matches in DynamoDB with batched, concurrent writes
+    write_stats = write_items(match_table, matches, ('user_id', 'job_id'))
+    log_write_stats("Match results", write_stats)
+    if write_stats['failed']:
+        raise RuntimeError(f"{write_stats['failed']} match results could not be written")
+    return {user_id: len(user_candidates) for user_id, user_candidates in zip(user_ids, candidates)}
+
+def lambda_handler(event, context):
+    print("Starting immediate user match at:", time.ctime())
+
+    # One invocation per SQS batch: every upload in the batch is matched together
+    messages = trigger_messages(event)
+    failed = []
+    message_ids_by_user = {}
+    for message_id, message in messages:
+        if not message or not message.get('user_id') or not isinstance(message['user_id'], str):
+            failed.append(message_id)  # Never matchable; left to the dead-letter queue
+            continue
+        message_ids_by_user.setdefault(message['user_id'], []).append(message_id)
+    print(f"Matching {len(message_ids_by_user)} users from {len(messages)} messages")
 
+    try:
+        match_counts = match_users(sorted(message_ids_by_user))
     except Exception as e:
         print(f"Error in immediate match: {e}")
+        failed.extend(message_id for message_ids in message_ids_by_user.values() for message_id in message_ids)
+        match_counts = None
+
+    if is_sqs_event(event):
+        return batch_response(failed)
+    if match_counts is None:
         return {
             'statusCode': 500,
-            'body': json.dumps(f"Error: {str(e)}")
-        }
\ No newline at end of file
+            'body': json.dumps("Error: immediate match failed")
+        }
+    return {
+        'statusCode': 200,
+        'body': json.dumps({'status': 'immediate_match_complete', 'match_count': sum(match_counts.values()),
+                            'users': len(match_counts)})
+    }
@@ -0,0 +1,187 @@
+"""User job preferences and the job attribute index used to pre-filter matching.
+
+Preferences are stored per user in the user-preferences table (see
+user_preferences.py) and only narrow the jobs a user is scored against:
+
+    employment_types  job employment_type is one of these (e.g. FULLTIME, CONTRACTOR)
+    remote            'remote_only', 'onsite_only' or 'any'
+    locations         city names; only non-remote jobs are held to them
+    min_salary        the job's max_salary reaches it; jobs without salary data pass
+
+Missing or empty fields do not filter. JobAttributeIndex keeps a boolean
+bitmap per employment type and location over one job list, so the jobs for
+a set of preferences are a few vectorized ANDs instead of a pass over the
+jobs. filtered_groups() pairs every group of users sharing preferences with
+the job rows they should be scored against; job_matches() applies the same
+rules to a single job.
+"""
+REMOTE_CHOICES = ('any', 'remote_only', 'onsite_only')
+MAX_LIST_VALUES = 20
+
+
+def normalize_location(value):
+    # "New York, NY" and "new york" both index as "new york"
+    return str(value or '').split(',')[0].strip().lower()
+
+
+def normalize_employment_type(value):
+    return str(value or '').strip().upper()
+
+
+def _employment_types(job):
+    # JSearch may join several types with commas ("FULLTIME, PARTTIME")
+    return {normalize_employment_type(part) for part in str(job.get('employment_type') or '').split(',')} - {''}
+
+
+def _salary(value):
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def normalize_preferences(raw):
+    """Validate stored or submitted preferences; returns a canonical dict (empty means no filtering)."""
+    if not raw:
+        return {}
+    if not isinstance(raw, dict):
+        raise ValueError('preferences must be an object')
+    preferences = {}
+
+    employment_types = raw.get('employment_types') or []
+    locations = raw.get('locations') or []
+    for name, values in (('employment_types', employment_types), ('locations', locations)):
+        if not isinstance(values, (list, tuple, set)) or len(values) > MAX_LIST_VALUES:
+            raise ValueError(f"{name} must be a list of at most {MAX_LIST_VALUES} values")
+    employment_types = sorted({normalize_employment_type(value) for value in employment_types} - {''})
+    locations = sorted({normalize_location(value) for value in locations} - {''})
+    if employment_types:
+        preferences['employment_types'] = employment_types
+    if locations:
+        preferences['locations'] = locations
+
+    remote = raw.get('remote') or 'any'
+    if remote not in REMOTE_CHOICES:
+        raise ValueError(f"remote must be one of {list(REMOTE_CHOICES)}")
+    if remote != 'any':
+        preferences['remote'] = remote
+
+    min_salary = raw.get('min_salary')
+    if min_salary not in (None, ''):
+        try:
+            min_salary = float(min_salary)
+        except (TypeError, ValueError):
+            raise ValueError('min_salary must be a number')
+        if min_salary < 0:
+            raise ValueError('min_salary must not be negative')
+        if min_salary > 0:
+            preferences['min_salary'] = min_salary
+    return preferences
+
+
+def preferences_from_item(item):
+    """Preferences stored as a user-preferences table item (DynamoDB numbers are Decimal)."""
+    return normalize_preferences({name: value for name, value in (item or {}).items()
+                                  if name not in ('user_id', 'updated_at')})
+
+
+def preference_key(preferences):
+    return (
+        tuple(preferences.get('employment_types', ())),
+        preferences.get('remote', 'any'),
+        tuple(preferences.get('locations', ())),
+        preferences.get('min_salary', 0.0),
+    )
+
+
+def group_by_preferences(user_ids, preferences_by_user):
+    """[(preferences, [positions in user_ids])], one group per distinct set of preferences."""
+    groups = {}
+    for position, user_id in enumerate(user_ids):
+        preferences = preferences_by_user.get(user_id) or {}
+        groups.setdefault(preference_key(preferences), (preferences, []))[1].append(position)
+    return list(groups.values())
+
+
+def job_matches(preferences, job):
+    if not preferences:
+        return True
+    is_remote = bool(job.get('is_remote', False))
+    if preferences.get('remote') == 'remote_only' and not is_remote:
+        return False
+    if preferences.get('remote') == 'onsite_only' and is_remote:
+        return False
+    if 'employment_types' in preferences and not _employment_types(job) & set(preferences['employment_types']):
+        return False
+    if 'locations' in preferences and not is_remote and normalize_location(job.get('location')) not in preferences['locations']:
+        return False
+    if 'min_salary' in preferences:
+        max_salary = _salary(job.get('max_salary'))
+        if max_salary > 0 and max_salary < preferences['min_salary']:
+            return False
+    return True
+
+
+class JobAttributeIndex:
+    """Bitmaps over a job list, in the same row order as its embedding matrix."""
+
+    def __init__(self, jobs):
+        # Imported here so user_preferences.py can validate preferences without NumPy
+        import numpy as np
+
+        self._np = np
+        self.size = len(jobs)
+        self.remote = np.zeros(self.size, dtype=bool)
+        self.max_salary = np.zeros(self.size, dtype=np.float64)
+        self.employment_types = {}
+        self.locations = {}
+        for row, job in enumerate(jobs):
+            self.remote[row] = bool(job.get('is_remote', False))
+            self.max_salary[row] = _salary(job.get('max_salary'))
+            for employment_type in _employment_types(job):
+                self._bitmap(self.employment_types, employment_type)[row] = True
+            self._bitmap(self.locations, normalize_location(job.get('location')))[row] = True
+
+    def _bitmap(self, bitmaps, value):
+        bitmap = bitmaps.get(value)
+        if bitmap is None:
+            bitmap = bitmaps[value] = self._np.zeros(self.size, dtype=bool)
+        return bitmap
+
+    def _any_of(self, bitmaps, values):
+        mask = self._np.zeros(self.size, dtype=bool)
+        for value in values:
+            if value in bitmaps:
+                mask |= bitmaps[value]
+        return mask
+
+    def rows_for(self, preferences):
+        """Row indices of the jobs that satisfy preferences, or None when nothing is filtered."""
+        if not preferences:
+            return None
+        np = self._np
+        mask = np.ones(self.size, dtype=bool)
+        if preferences.get('remote') == 'remote_only':
+            mask &= self.remote
+        elif preferences.get('remote') == 'onsite_only':
+            mask &= ~self.remote
+        if 'employment_types' in preferences:
+            mask &= self._any_of(self.employment_types, preferences['employment_types'])
+        if 'locations' in preferences:
+            mask &= self.remote | self._any_of(self.locations, preferences['locations'])
+        if 'min_salary' in preferences:
+            mask &= (self.max_salary <= 0) | (self.max_salary >= preferences['min_salary'])
+        return np.flatnonzero(mask)
+
+
+def filtered_groups(user_ids, jobs, preferences_by_user):
+    """Yield (positions, rows): user positions sharing preferences and their job rows (None means all jobs).
+
+    Groups whose preferences exclude every job are skipped.
+    """
+    groups = group_by_preferences(user_ids, preferences_by_user)
+    index = JobAttributeIndex(jobs) if preferences_by_user else None
+    for preferences, positions in groups:
+        rows = index.rows_for(preferences) if index is not None else None
+        if rows is None or rows.size:
+            yield positions, rows
@@ -0,0 +1,36 @@
+"""Stable identity for ingested job postings.
+
+The same JSearch posting shows up across overlapping queries and on
+consecutive days. Its job_id is derived from the upstream id when JSearch
+provides one, otherwise from a fingerprint of title, employer and location,
+so every sighting maps to the same row in job-postings.
+"""
+import hashlib
+import re
+
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+
+
+def _normalize(value):
+    return _NON_WORD.sub(' ', str(value or '').lower()).strip()
+
+
+def job_fingerprint(title, employer, location):
+    """Hash of the normalized title|employer|location triple."""
+    canonical = '|'.join(_normalize(part) for part in (title, employer, location))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:32]
+
+
+def derive_job_id(job, default_location=''):
+    """Deterministic job_id for a raw JSearch job dict."""
+    upstream_id = job.get('job_id')
+    if upstream_id:
+        # Upstream ids are base64-like and may contain '/' or '+', which break the
+        # /job-detail/<job_id> route in the UI, so hash them to a URL-safe id
+        return f"JSEARCH-{hashlib.sha256(str(upstream_id).encode('utf-8')).hexdigest()[:32]}"
+    fingerprint = job_fingerprint(
+        job.get('job_title'),
+        job.get('employer_name'),
+        job.get('job_location') or default_location
+    )
+    return f"FP-{fingerprint}"
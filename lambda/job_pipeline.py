@@ -0,0 +1,116 @@
+"""Pipelined fetch -> embed -> write stages for job ingestion.
+
+Pages flow through three stages connected by bounded queues so that HTTP
+fetches, embedding calls and DynamoDB writes for different pages overlap:
+
+    fetch    fetch_workers threads call fetch_page(task), paced by a TokenBucket
+    process  process_workers threads call process_page(task, payload)
+             (build items and embed their descriptions)
+    write    one thread calls write_page(task, processed) in completion order
+
+The bounded queues apply back-pressure: fetchers stop when the embed stage
+falls behind instead of buffering every page in memory. A failure in any
+stage only drops that page; it is reported in the result.
+"""
+import queue
+import threading
+import time
+
+_DONE = object()
+
+
+def run_pipeline(tasks, fetch_page, process_page, write_page, fetch_workers=4,
+                 process_workers=2, queue_size=4, limiter=None):
+    """Run every task through the three stages and return a summary dict.
+
+    The summary holds the write_page return values ('results'), the failed
+    tasks with their errors ('failed'), wall time ('seconds') and the time
+    each stage spent busy ('stage_seconds').
+    """
+    start = time.perf_counter()
+    fetch_workers = max(1, fetch_workers)
+    process_workers = max(1, process_workers)
+    lock = threading.Lock()
+    results = []
+    failed = []
+    stage_seconds = {'fetch': 0.0, 'process': 0.0, 'write': 0.0}
+
+    task_queue = queue.Queue()
+    fetched = queue.Queue(maxsize=queue_size)
+    processed = queue.Queue(maxsize=queue_size)
+    for task in tasks:
+        task_queue.put(task)
+    for _ in range(fetch_workers):
+        task_queue.put(_DONE)
+
+    def timed(stage, func, *args):
+        began = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            with lock:
+                stage_seconds[stage] += time.perf_counter() - began
+
+    def record_failure(stage, task, error):
+        print(f"Pipeline {stage} stage failed for {task}: {error}")
+        with lock:
+            failed.append((task, f"{stage}: {error}"))
+
+    def fetch_worker():
+        while True:
+            task = task_queue.get()
+            if task is _DONE:
+                return
+            try:
+                if limiter is not None:
+                    limiter.acquire()
+                fetched.put((task, timed('fetch', fetch_page, task)))
+            except Exception as e:
+                record_failure('fetch', task, e)
+
+    def process_worker():
+        while True:
+            entry = fetched.get()
+            if entry is _DONE:
+                return
+            task, payload = entry
+            try:
+                processed.put((task, timed('process', process_page, task, payload)))
+            except Exception as e:
+                record_failure('process', task, e)
+
+    def write_worker():
+        while True:
+            entry = processed.get()
+            if entry is _DONE:
+                return
+            task, page = entry
+            try:
+                result = timed('write', write_page, task, page)
+                with lock:
+                    results.append(result)
+            except Exception as e:
+                record_failure('write', task, e)
+
+    fetchers = [threading.Thread(target=fetch_worker, daemon=True) for _ in range(fetch_workers)]
+    processors = [threading.Thread(target=process_worker, daemon=True) for _ in range(process_workers)]
+    writer = threading.Thread(target=write_worker, daemon=True)
+    for thread in fetchers + processors + [writer]:
+        thread.start()
+
+    # Shut the stages down in order: each one drains before the next gets its sentinels
+    for thread in fetchers:
+        thread.join()
+    for _ in processors:
+        fetched.put(_DONE)
+    for thread in processors:
+        thread.join()
+    processed.put(_DONE)
+    writer.join()
+
+    return {
+        'results': results,
+        'failed': failed,
+        'seconds': time.perf_counter() - start,
+        'stage_seconds': stage_seconds,
+    }
@@ -0,0 +1,188 @@
+"""Versioned snapshot of recent job embeddings, shared by the match Lambdas.
+
+fetch_job.py publishes, after each run, the jobs posted in the last
+SNAPSHOT_WINDOW_HOURS as two objects under a new version prefix: the
+normalized float32 embedding matrix (.npy) and a JSON sidecar with the
+job ids and the attributes a match row needs, in the same row order
+(oldest first). Next to them go the int8 codes of the same rows, with the
+quantizer's scales in the sidecar (see quantization.py). A small LATEST
+pointer is written last, so readers never see a half-written version.
+
+Matchers download a version once into /tmp, open the matrix with
+np.load(mmap_mode='r') and keep it in module-global state, so warm
+invocations skip the DynamoDB query, per-item decoding and normalization
+entirely and only re-read the pointer to notice a new version.
+"""
+import hashlib
+import io
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+SNAPSHOT_BUCKET = os.environ.get('JOB_SNAPSHOT_BUCKET')
+SNAPSHOT_PREFIX = 'snapshots/jobs/'
+LATEST_KEY = SNAPSHOT_PREFIX + 'LATEST.json'
+VERSIONS_PREFIX = SNAPSHOT_PREFIX + 'versions/'
+SNAPSHOT_WINDOW_HOURS = int(os.environ.get('JOB_SNAPSHOT_WINDOW_HOURS', '24'))
+# A burst of invocations shares one pointer read per interval
+CHECK_INTERVAL_SECONDS = int(os.environ.get('JOB_SNAPSHOT_CHECK_SECONDS', '30'))
+LOCAL_DIR = os.environ.get('JOB_SNAPSHOT_DIR', '/tmp')
+LOCAL_PREFIX = 'job-snapshot-'
+# Readers fetch the int8 codes only when they score with them (MATCH_SCORING=int8)
+QUANTIZED_SCORING = os.environ.get('MATCH_SCORING', 'exact') == 'int8'
+
+SNAPSHOT_FIELDS = ['job_id', 'employment_type', 'job_title', 'location', 'is_remote', 'posted_at', 'posted_timestamp',
+                   'min_salary', 'max_salary']  # Salaries feed the preference pre-filter (job_filters.py)
+
+
+class JobSnapshot:
+    def __init__(self, version, matrix, jobs, codes=None, quantizer=None):
+        self.version = version
+        self.matrix = matrix
+        self.jobs = jobs
+        self.codes = codes
+        self.quantizer = quantizer
+        self.timestamps = np.array([int(job.get('posted_timestamp') or 0) for job in jobs], dtype=np.int64)
+
+    def __len__(self):
+        return len(self.jobs)
+
+    def since(self, timestamp):
+        """(matrix, jobs) for jobs posted at or after timestamp.
+
+        Rows are sorted by posted_timestamp, so this is a slice and the
+        matrix stays a view onto the memory-mapped file.
+        """
+        start = int(np.searchsorted(self.timestamps, timestamp, side='left'))
+        return self.matrix[start:], self.jobs[start:]
+
+    def codes_since(self, timestamp):
+        """Int8 codes of the rows since() returns, or None for snapshots published without them."""
+        if self.codes is None:
+            return None
+        return self.codes[int(np.searchsorted(self.timestamps, timestamp, side='left')):]
+
+
+def _to_plain(value):
+    # DynamoDB numbers come back as Decimal
+    if hasattr(value, 'to_integral_value'):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return value
+
+
+def build_snapshot_arrays(jobs):
+    """Return (matrix, job_records) sorted oldest first, dropping jobs without a usable embedding."""
+    from embedding_codec import decode_embedding
+    from matching_engine import normalize_embeddings
+
+    jobs = sorted(jobs, key=lambda job: int(job.get('posted_timestamp') or 0))
+    matrix, kept = normalize_embeddings([decode_embedding(job.get('embedding')) for job in jobs])
+    records = [
+        {field: _to_plain(jobs[i][field]) for field in SNAPSHOT_FIELDS if field in jobs[i]}
+        for i in kept
+    ]
+    return matrix, records
+
+
+def publish_snapshot(s3, bucket, jobs):
+    """Upload a new snapshot version of jobs and point LATEST at it; returns the pointer."""
+    from quantization import Int8Quantizer
+
+    matrix, records = build_snapshot_arrays(jobs)
+    quantizer = Int8Quantizer.fit(matrix)
+    matrix_bytes = _npy_bytes(matrix)
+    codes_bytes = _npy_bytes(quantizer.encode(matrix))
+    sidecar = json.dumps({
+        'jobs': records,
+        'quantization': {'scales': quantizer.scales.tolist(), 'margin': quantizer.margin}
+    }, separators=(',', ':')).encode('utf-8')
+
+    created_at = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    version = f"{created_at}-{hashlib.sha256(matrix_bytes + sidecar).hexdigest()[:12]}"
+    pointer = {
+        'version': version,
+        'matrix_key': f"{VERSIONS_PREFIX}{version}/embeddings.npy",
+        'jobs_key': f"{VERSIONS_PREFIX}{version}/jobs.json",
+        'codes_key': f"{VERSIONS_PREFIX}{version}/codes.npy",
+        'count': len(records),
+        'dim': int(matrix.shape[1]),
+        'created_at': created_at
+    }
+    s3.put_object(Bucket=bucket, Key=pointer['matrix_key'], Body=matrix_bytes, ContentType='application/octet-stream')
+    s3.put_object(Bucket=bucket, Key=pointer['codes_key'], Body=codes_bytes, ContentType='application/octet-stream')
+    s3.put_object(Bucket=bucket, Key=pointer['jobs_key'], Body=sidecar, ContentType='application/json')
+    s3.put_object(Bucket=bucket, Key=LATEST_KEY, Body=json.dumps(pointer).encode('utf-8'),
+                  ContentType='application/json', CacheControl='no-cache')
+    print(f"Published job snapshot {version}: {len(records)} jobs, dim {pointer['dim']}, "
+          f"{(len(matrix_bytes) + len(sidecar)) / 1e6:.1f} MB (+{len(codes_bytes) / 1e6:.1f} MB int8 codes)")
+    return pointer
+
+
+def _npy_bytes(array):
+    buffer = io.BytesIO()
+    np.save(buffer, array, allow_pickle=False)
+    return buffer.getvalue()
+
+
+def read_pointer(s3, bucket):
+    try:
+        return json.loads(s3.get_object(Bucket=bucket, Key=LATEST_KEY)['Body'].read())
+    except s3.exceptions.NoSuchKey:
+        return None
+
+
+def _download_version(s3, bucket, pointer, key_field='matrix_key', suffix='.npy'):
+    version_prefix = f"{LOCAL_PREFIX}{pointer['version']}."
+    local_path = os.path.join(LOCAL_DIR, version_prefix + suffix.lstrip('.'))
+    if not os.path.exists(local_path):
+        partial_path = local_path + '.part'
+        s3.download_file(bucket, pointer[key_field], partial_path)
+        os.replace(partial_path, local_path)
+    # Older versions are no longer needed; /tmp is shared by every warm invocation
+    for name in os.listdir(LOCAL_DIR):
+        if name.startswith(LOCAL_PREFIX) and not name.startswith(version_prefix):
+            try:
+                os.remove(os.path.join(LOCAL_DIR, name))
+            except OSError:
+                pass
+    return local_path
+
+
+# Module-global so warm invocations reuse the mapped snapshot
+_state = {'snapshot': None, 'checked_at': 0.0}
+
+
+def current_snapshot(s3, bucket=SNAPSHOT_BUCKET):
+    """Return the latest JobSnapshot, or None when no snapshot has been published."""
+    if not bucket:
+        return None
+    now = time.monotonic()
+    cached = _state['snapshot']
+    if cached is not None and now - _state['checked_at'] < CHECK_INTERVAL_SECONDS:
+        return cached
+
+    pointer = read_pointer(s3, bucket)
+    _state['checked_at'] = now
+    if pointer is None:
+        return None
+    if cached is not None and cached.version == pointer['version']:
+        return cached
+
+    started = time.perf_counter()
+    matrix = np.load(_download_version(s3, bucket, pointer), mmap_mode='r', allow_pickle=False)
+    sidecar = json.loads(s3.get_object(Bucket=bucket, Key=pointer['jobs_key'])['Body'].read())
+    jobs = sidecar['jobs']
+    if matrix.shape[0] != len(jobs):
+        raise ValueError(f"Snapshot {pointer['version']} has {matrix.shape[0]} rows but {len(jobs)} jobs")
+    codes = quantizer = None
+    if pointer.get('codes_key') and QUANTIZED_SCORING:
+        from quantization import Int8Quantizer
+        codes = np.load(_download_version(s3, bucket, pointer, 'codes_key', '.codes.npy'), mmap_mode='r',
+                        allow_pickle=False)
+        quantizer = Int8Quantizer(sidecar['quantization']['scales'], sidecar['quantization']['margin'])
+    _state['snapshot'] = JobSnapshot(pointer['version'], matrix, jobs, codes, quantizer)
+    print(f"Loaded job snapshot {pointer['version']} ({len(jobs)} jobs) in {time.perf_counter() - started:.2f}s")
+    return _state['snapshot']
@@ -1,127 +1,499 @@
-import boto3
+import hashlib
 import json
 import os
 import time
+from botocore.config import Config
+from botocore.exceptions import ClientError
 from datetime import datetime, timezone, timedelta
-import numpy as np
-from scipy.spatial import distance
 from decimal import Decimal
+from aws_clients import lazy_client, lazy_table
+from batch_writes import log_write_stats, write_items
+from data_access import batch_get_items, load_user_embeddings, query_recent_jobs, scan_all
+from embedding_codec import decode_embedding
+from job_filters import filtered_groups, preferences_from_item
+from job_snapshot import current_snapshot
+from match_shards import LambdaShardExecutor, fan_out
+from matching_engine import MATCH_THRESHOLD, normalize_embeddings, score_matches
+from notifications import log_notify_stats, send_digests
+from quantization import score_matches_two_stage
+from trigger_queue import batch_response, is_sqs_event, trigger_messages
 
 # Initialize AWS clients
-dynamodb = boto3.resource('dynamodb')
-applicant_table = dynamodb.Table(os.environ['APPLICANT_DETAILS_TABLE'])
-match_table = dynamodb.Table(os.environ['MATCH_RESULTS_TABLE'])
-job_table = dynamodb.Table(os.environ['JOB_POSTINGS_TABLE'])
-applicant_embeddings = dynamodb.Table(os.environ['APPLICANT_EMBEDDING_TABLE'])
-user_topics_table = dynamodb.Table(os.environ['USER_TOPICS_TABLE'])
-sns = boto3.client('sns')
+applicant_table = lazy_table(os.environ['APPLICANT_DETAILS_TABLE'])
+match_table = lazy_table(os.environ['MATCH_RESULTS_TABLE'])
+job_table = lazy_table(os.environ['JOB_POSTINGS_TABLE'])
+applicant_embeddings = lazy_table(os.environ['APPLICANT_EMBEDDING_TABLE'])
+user_topics_table = lazy_table(os.environ['USER_TOPICS_TABLE'])
+match_runs_table = lazy_table(os.environ['MATCH_RUNS_TABLE'])
+notification_log_table = lazy_table(os.environ['NOTIFICATION_LOG_TABLE'])
+preferences_table = lazy_table(os.environ['USER_PREFERENCES_TABLE'])
+sns = lazy_client('sns')
+s3 = lazy_client('s3')
+# Shard invocations are never retried, a retry would score the shard twice. The coordinator
+# stops waiting at the run deadline (see coordinate), well before this read timeout
+lambda_client = lazy_client('lambda', config=Config(read_timeout=900, connect_timeout=10, retries={'max_attempts': 0}))
 
-def lambda_handler(event, context):
+NOTIFICATION_TOPIC_ARN = os.environ['NOTIFICATION_TOPIC_ARN']
+RUN_MARKER_TTL_DAYS = 7  # Keep run markers long enough to cover SNS redelivery
+MATCH_SHARDS = int(os.environ.get('MATCH_SHARDS', '1'))  # Upper bound on worker invocations per run
+MIN_USERS_PER_SHARD = int(os.environ.get('MIN_USERS_PER_SHARD', '500'))
+PREFERENCE_SCAN_MIN_USERS = 1000  # Above this many users one parallel scan beats batched gets
+# A coordinator keeps this much of its own remaining time back from the workers' deadline,
+# to collect their results and record (or fail) the run
+SHARD_TIME_MARGIN_SECONDS = int(os.environ.get('SHARD_TIME_MARGIN_SECONDS', '60'))
+# A shard worker only starts scoring, and then writing, with at least this long before its deadline
+SHARD_WRITE_RESERVE_SECONDS = int(os.environ.get('SHARD_WRITE_RESERVE_SECONDS', '120'))
+
+# Run modes:
+#   delta_jobs  - messages from fetch_job.py carry the job_ids it just inserted; only
+#                 those jobs are scored against all users
+#   delta_users - messages name a user (ResumeProcessingTopic); only those users are
+#                 scored against the recent jobs
+#   reconcile   - full recompute of all users x recent jobs; used when invoked with
+#                 {"mode": "reconcile"} or when a message carries no delta
+# Triggers arrive in SQS batches (see trigger_queue.py). A batch is coalesced into at
+# most one run per mode: the union of its job_ids, the union of its users.
+# delta_jobs and reconcile runs over more than MIN_USERS_PER_SHARD users are split into
+# up to MATCH_SHARDS shards by user_id; this invocation becomes the coordinator and
+# invokes itself once per shard with {"mode": "shard", ...} (see match_shards.py).
+def reconcile_plan():
+    return {'mode': 'reconcile', 'job_ids': [], 'user_ids': [], 'trigger_id': ''}
+
+
+def plan_for_message(message, message_id=''):
+    job_ids = message.get('job_ids') or []
+    user_id = message.get('user_id') or message.get('userId')
+    if not isinstance(job_ids, list) or not all(isinstance(job_id, str) for job_id in job_ids):
+        raise ValueError('job_ids must be a list of strings')
+    if user_id is not None and not isinstance(user_id, str):
+        raise ValueError('user_id must be a string')
+    job_ids = sorted(set(job_ids))
+    if job_ids:
+        return {'mode': 'delta_jobs', 'job_ids': job_ids, 'user_ids': [], 'trigger_id': ''}
+    if user_id:
+        # A user can upload again later, so the upload's Textract job id (or the
+        # message id) is part of the run identity, not just the user id
+        trigger_id = str(message.get('jobId') or message_id)
+        return {'mode': 'delta_users', 'job_ids': [], 'user_ids': [user_id], 'trigger_id': trigger_id}
+    return reconcile_plan()
+
+
+def plan_batch(messages):
+    """Coalesce (message_id, message) pairs into ([(plan, message_ids)], invalid_message_ids).
+
+    At most one plan per mode; messages that are not a valid trigger are only listed.
+    """
+    merged = {}
+    invalid = []
+    for message_id, message in messages:
+        try:
+            plan = plan_for_message(message, message_id)
+        except ValueError as e:
+            print(f"Invalid trigger message {message_id}: {e}")
+            invalid.append(message_id)
+            continue
+        entry = merged.setdefault(plan['mode'], {'job_ids': set(), 'user_ids': set(), 'trigger_ids': set(), 'message_ids': []})
+        entry['job_ids'].update(plan['job_ids'])
+        entry['user_ids'].update(plan['user_ids'])
+        if plan['trigger_id']:
+            entry['trigger_ids'].add(plan['trigger_id'])
+        entry['message_ids'].append(message_id)
+    plans = [
+        ({'mode': mode, 'job_ids': sorted(entry['job_ids']), 'user_ids': sorted(entry['user_ids']),
+          'trigger_id': ','.join(sorted(entry['trigger_ids']))}, entry['message_ids'])
+        for mode, entry in merged.items()
+    ]
+    return plans, invalid
+
+
+def run_id_for(plan):
+    # Delta runs are keyed by their content, so a redelivered message maps to the same run
+    if plan['mode'] == 'reconcile':
+        return None
+    digest = hashlib.sha256('\n'.join(plan['job_ids'] + plan['user_ids'] + [plan['trigger_id']]).encode('utf-8')).hexdigest()
+    return f"{plan['mode']}#{digest}"
+
+
+def run_already_completed(run_id):
+    if run_id is None:
+        return False
+    item = match_runs_table.get_item(Key={'run_id': run_id}, ConsistentRead=True).get('Item')
+    return bool(item and item.get('status') == 'completed')
+
+
+def record_run(run_id, plan, match_count, watermark):
+    now = int(time.time())
+    item = {
+        'run_id': run_id or 'reconcile',
+        'mode': plan['mode'],
+        'status': 'completed',
+        'completed_at': now,
+        'match_count': match_count,
+        'job_count': len(plan['job_ids']),
+        'watermark': watermark,  # Highest posted_timestamp scored in this run
+    }
+    if run_id is not None:
+        item['expires_at'] = now + RUN_MARKER_TTL_DAYS * 86400
     try:
-        print("Starting matching process at:", time.ctime())
+        match_runs_table.put_item(Item=item)
+    except ClientError as e:
+        print(f"Failed to record match run {item['run_id']}: {e}")
+
+
+def existing_match_keys(pairs):
+    items = batch_get_items(
+        match_table,
+        [{'user_id': user_id, 'job_id': job_id} for user_id, job_id in pairs],
+        projection_expression='user_id, job_id'
+    )
+    return {(item['user_id'], item['job_id']) for item in items}
+
+
+def list_user_ids():
+    # Only keys are read here; each shard worker fetches its own users' embeddings
+    applicant_ids = {user['user_id'] for user in scan_all(applicant_table, ProjectionExpression='user_id')}
+    return sorted(
+        user['user_id'] for user in scan_all(applicant_embeddings, ProjectionExpression='user_id')
+        if user['user_id'] in applicant_ids
+    )
 
+
+def shard_count_for(plan, user_count):
+    if plan['mode'] == 'delta_users' or MATCH_SHARDS <= 1:
+        return 1
+    return max(1, min(MATCH_SHARDS, -(-user_count // MIN_USERS_PER_SHARD)))
+
+
+def load_users(user_ids=None):
+    # Fetch user embeddings with one parallel scan per table (no per-user lookups)
+    if user_ids:
+        return load_user_embeddings(applicant_embeddings, user_ids)
+    applicant_ids = {user['user_id'] for user in scan_all(applicant_table, ProjectionExpression='user_id')}
+    return {
+        user_id: embedding
+        for user_id, embedding in load_user_embeddings(applicant_embeddings).items()
+        if user_id in applicant_ids
+    }
+
+
+def load_preferences(user_ids):
+    """{user_id: preferences} for the users that stored any; unreadable preferences do not filter."""
+    if len(user_ids) >= PREFERENCE_SCAN_MIN_USERS:
+        wanted = set(user_ids)
+        items = [item for item in scan_all(preferences_table) if item['user_id'] in wanted]
+    else:
+        items = batch_get_items(preferences_table, [{'user_id': user_id} for user_id in user_ids])
+    preferences_by_user = {}
+    for item in items:
+        try:
+            preferences = preferences_from_item(item)
+        except ValueError as e:
+            print(f"Ignoring invalid preferences of {item['user_id']}: {e}")
+            continue
+        if preferences:
+            preferences_by_user[item['user_id']] = preferences
+    return preferences_by_user
+
+
+def load_jobs(job_ids=None):
+    """Return (job_matrix, jobs, quantized): normalized embeddings, the jobs they belong to
+    and, when the snapshot carries int8 codes for them, (codes, quantizer); otherwise None."""
+    if job_ids:
+        jobs = batch_get_items(job_table, [{'job_id': job_id} for job_id in job_ids])
+    else:
         # Define time window for recent jobs (last 24 hours)
         threshold_time = int((datetime.now(timezone.utc) - timedelta(hours=24)).timestamp())
+        try:
+            snapshot = current_snapshot(s3)
+        except Exception as e:
+            print(f"Error loading job snapshot, reading jobs from DynamoDB: {e}")
+            snapshot = None
+        if snapshot is not None:
+            # Already normalized and memory-mapped; no per-item decoding
+            job_matrix, jobs = snapshot.since(threshold_time)
+            codes = snapshot.codes_since(threshold_time)
+            return job_matrix, jobs, (codes, snapshot.quantizer) if codes is not None else None
+        jobs = query_recent_jobs(job_table, threshold_time)
+
+    job_vectors = [decode_embedding(job.get('embedding')) for job in jobs]
+    job_matrix, kept_jobs = normalize_embeddings(job_vectors)
+    return job_matrix, [jobs[i] for i in kept_jobs], None  # Skip jobs without valid embeddings
+
+
+def score_pairs(user_matrix, job_matrix, quantized):
+    if quantized is None:
+        return score_matches(user_matrix, job_matrix, MATCH_THRESHOLD)
+    # int8 coarse pass over the snapshot codes, exact re-rank of candidates only
+    codes, quantizer = quantized
+    stats = {}
+    pairs = list(score_matches_two_stage(user_matrix, job_matrix, codes, quantizer, MATCH_THRESHOLD, stats=stats))
+    print(f"Two-stage scoring: {stats['candidates']} of {stats['coarse_pairs']} pairs re-ranked "
+          f"(margin {quantizer.margin:.3f}), {stats['matches']} matches")
+    return pairs
+
+
+def score_filtered(user_ids, user_matrix, job_matrix, jobs, quantized, preferences_by_user, stats):
+    """Yield (user_index, job_index, similarity), scoring each user only against the jobs its preferences allow.
+
+    Users with the same preferences are scored together against the rows the
+    attribute index selects for them; users without preferences see every job.
+    stats receives pairs_scored and preference_groups.
+    """
+    stats.update(pairs_scored=0, preference_groups=0)
+    for positions, rows in filtered_groups(user_ids, jobs, preferences_by_user):
+        if rows is None:
+            group_jobs, group_quantized = job_matrix, quantized
+        else:
+            group_jobs = job_matrix[rows]
+            group_quantized = (quantized[0][rows], quantized[1]) if quantized is not None else None
+        group_users = user_matrix if len(positions) == len(user_ids) else user_matrix[positions]
+        stats['pairs_scored'] += len(positions) * group_jobs.shape[0]
+        stats['preference_groups'] += 1
+        for user_index, job_index, similarity in score_pairs(group_users, group_jobs, group_quantized):
+            yield positions[user_index], job_index if rows is None else int(rows[job_index]), similarity
+
+
+def check_deadline(deadline, phase):
+    # Raised before a phase starts, never inside one, so stored matches are always notified
+    if deadline is not None and time.time() > deadline - SHARD_WRITE_RESERVE_SECONDS:
+        raise TimeoutError(f"Less than {SHARD_WRITE_RESERVE_SECONDS}s left before the run deadline, not {phase}")
+
+
+def match_users(plan, user_embeddings, deadline=None):
+    """Score user_embeddings against the plan's jobs, store and notify; returns the run's counts.
 
-       # Fetch all user embeddings
-        users = applicant_table.scan()['Items']
-        user_embeddings = {}
-        for user in users:
-            user_id = user['user_id']
-            embedding_response = applicant_embeddings.scan(
-                FilterExpression='user_id = :user_id',
-                ExpressionAttributeValues={':user_id': user_id}
-            )
-            items = embedding_response['Items']
-            if items and 'embedding' in items[0]:
-                user_embeddings[user_id] = np.array(json.loads(items[0]['embedding']))
-
-        # print(user_embeddings)
-        # Fetch recently fetched jobs
-        jobs = job_table.scan(
-            FilterExpression='posted_timestamp >= :threshold',
-            ExpressionAttributeValues={':threshold': threshold_time}
-        )['Items']
-        # print(jobs)
-
-        matches = []
-        user_matches = {}  # Dictionary to aggregate matches by user_id
-        for job in jobs:
-            print("job:", 0)
-            job_embedding = np.array(json.loads(job['embedding'])) if job.get('embedding') else None
-            print("job_embedding:", 1)
-            if job_embedding is None or len(job_embedding) == 0:
-                continue  # Skip jobs without valid embeddings
-            print("user_embedding:", user_embeddings)
-            for user_id, user_embedding in user_embeddings.items():
-                if user_embedding is not None and len(user_embedding) > 0:  # Check for valid embedding
-                    print("user_embedding:", user_embedding)
-                    print("job_embedding:", job_embedding)
-                    similarity = 1 - distance.cosine(np.ravel(user_embedding), np.ravel(job_embedding))
-                    if similarity > 0.7:  # Threshold for match
-                        matches.append({
-                            'user_id': user_id,
-                            'job_id': job['job_id'],
-                            'similarity_score': Decimal(str(similarity)),
-                            'match_timestamp': int(time.time()),
-                            'employment_type': job['employment_type'],
-                            'job_title': job.get('job_title','N/A'),
-                            'location': job.get('location', 'N/A'),
-                            'is_remote': job.get('is_remote', False),
-                            'posted_at': job.get('posted_at','N/A')
-                        })
-                        if user_id not in user_matches:
-                            user_matches[user_id] = []
-                        user_matches[user_id].append({
-                            'job_id': job['job_id'],
-                            'job_title': job.get('job_title', 'Unknown'),
-                            'location': job.get('location', 'Unknown'),
-                            'similarity_score': Decimal(str(similarity)),  # Convert to string for email
-                            'employment_type': job['employment_type'],
-                            'is_remote': job.get('is_remote', False),
-                            'posted_at': job.get('posted_at','N/A')
-                        })
-
-        # Store matches in DynamoDB
-        for match in matches:
-            match_table.put_item(Item=match)
-            print(f"Matched {match['user_id']} with {match['job_id']} (Score: {match['similarity_score']})")
-
-        # Send email notifications for each user
-        for user_id, jobs_list in user_matches.items():
-            # Fetch the user's topic ARN
-            topic_response = user_topics_table.get_item(Key={'user_id': user_id})
-            if 'Item' in topic_response and 'topic_arn' in topic_response['Item']:
-                topic_arn = topic_response['Item']['topic_arn']
-                # Prepare email message
-                message = {
-                    'default': json.dumps({
-                        'user_id': user_id,
-                        'message': f"New job matches found:\n" + "\n".join(
-                            [f"- {job['job_title']} ({job['location']}) - Similarity: {job['similarity_score']}" for job in jobs_list]
-                        )
-                    }),
-                    'email': f"Subject: New Job Matches for {user_id}\n\nDear User,\n\nThe following job matches were found based on your resume:\n" + "\n".join(
-                        [f"- {job['job_title']} ({job['location']}) - Similarity: {job['similarity_score']}" for job in jobs_list]
-                    ) + "\n\nBest,\nResume Matcher Team"
+    With a deadline (epoch seconds), raises TimeoutError instead of starting
+    to score or write when too little time is left.
+    """
+    started = time.perf_counter()
+    job_matrix, jobs, quantized = load_jobs(plan['job_ids'])
+
+    # Normalize every embedding once and score all pairs with a blocked matrix multiply
+    user_ids = list(user_embeddings.keys())
+    user_matrix, kept_users = normalize_embeddings(user_embeddings[user_id] for user_id in user_ids)
+    user_ids = [user_ids[i] for i in kept_users]
+    preferences_by_user = load_preferences(user_ids) if user_ids and jobs else {}
+    check_deadline(deadline, 'scoring')
+    print(f"Scoring {len(user_ids)} users against {len(jobs)} jobs ({len(preferences_by_user)} users with preferences)")
+    score_started = time.perf_counter()
+    load_seconds = score_started - started
+
+    filter_stats = {}
+    scored = [
+        (user_ids[user_index], jobs[job_index], similarity)
+        for user_index, job_index, similarity in score_filtered(
+            user_ids, user_matrix, job_matrix, jobs, quantized, preferences_by_user, filter_stats)
+    ]
+    pairs_unfiltered = len(user_ids) * len(jobs)
+    if pairs_unfiltered:
+        print(f"Preference pre-filter: scored {filter_stats['pairs_scored']} of {pairs_unfiltered} pairs "
+              f"({1 - filter_stats['pairs_scored'] / pairs_unfiltered:.1%} skipped) "
+              f"in {filter_stats['preference_groups']} preference groups")
+
+    # Skip (user, job) pairs that were already scored and stored by an earlier run, so
+    # they are not rewritten or emailed again. A new resume (delta_users) rescores its user.
+    if plan['mode'] != 'delta_users' and scored:
+        already_scored = existing_match_keys([(user_id, job['job_id']) for user_id, job, _ in scored])
+        scored = [entry for entry in scored if (entry[0], entry[1]['job_id']) not in already_scored]
+        print(f"Skipping {len(already_scored)} pairs already scored in earlier runs")
+
+    score_seconds = time.perf_counter() - score_started
+
+    matches = []
+    user_matches = {}  # Dictionary to aggregate matches by user_id
+    match_timestamp = int(time.time())
+    for user_id, job, similarity in scored:
+        matches.append({
+            'user_id': user_id,
+            'job_id': job['job_id'],
+            'similarity_score': Decimal(str(similarity)),
+            'match_timestamp': match_timestamp,
+            'employment_type': job['employment_type'],
+            'job_title': job.get('job_title','N/A'),
+            'location': job.get('location', 'N/A'),
+            'is_remote': job.get('is_remote', False),
+            'posted_at': job.get('posted_at','N/A')
+        })
+        if user_id not in user_matches:
+            user_matches[user_id] = []
+        user_matches[user_id].append({
+            'job_id': job['job_id'],
+            'job_title': job.get('job_title', 'Unknown'),
+            'location': job.get('location', 'Unknown'),
+            'similarity_score': Decimal(str(similarity)),  # Convert to string for email
+            'employment_type': job['employment_type'],
+            'is_remote': job.get('is_remote', False),
+            'posted_at': job.get('posted_at','N/A')
+        })
+
+    # Store matches in DynamoDB with batched, concurrent writes
+    check_deadline(deadline, 'writing matches')
+    write_started = time.perf_counter()
+    write_stats = write_items(match_table, matches, ('user_id', 'job_id'))
+    log_write_stats("Match results", write_stats)
+    write_seconds = time.perf_counter() - write_started
+
+    # One digest per user with only the matches no earlier run has emailed
+    notify_stats = send_digests(sns, NOTIFICATION_TOPIC_ARN, user_topics_table, notification_log_table, user_matches)
+    log_notify_stats(notify_stats)
+
+    timings = {
+        'load_seconds': round(load_seconds, 3),
+        'score_seconds': round(score_seconds, 3),
+        'write_seconds': round(write_seconds, 3),
+        'notify_seconds': round(notify_stats['seconds'], 3)
+    }
+    print(f"Match run timings: {timings}")
+    return {
+        'users': len(user_ids),
+        'jobs': len(jobs),
+        'pairs_scored': filter_stats['pairs_scored'],
+        'pairs_unfiltered': pairs_unfiltered,
+        'matches': len(matches),
+        'notified_users': notify_stats['digests_sent'],
+        'watermark': max((int(job.get('posted_timestamp', 0)) for job in jobs), default=0),
+        'seconds': round(time.perf_counter() - started, 3),
+        'timings': timings
+    }
+
+
+def shard_handler(event, context):
+    # Worker invocation from a coordinator: score one shard of users, report counts
+    print(f"Match shard {event['shard'] + 1}/{event['shard_count']} of {event['run_id']}: {len(event['user_ids'])} users")
+    deadline = time.time() + context.get_remaining_time_in_millis() / 1000
+    if event.get('deadline'):
+        deadline = min(deadline, event['deadline'])
+    try:
+        result = match_users(event['plan'], load_users(event['user_ids']), deadline)
+    except TimeoutError as e:
+        # Reported to the coordinator as a failed shard; the run is retried as a whole
+        print(f"Match shard {event['shard'] + 1} stopped: {e}")
+        return {
+            'statusCode': 500,
+            'body': json.dumps(f"Error: {str(e)}")
+        }
+    result['shard'] = event['shard']
+    return {
+        'statusCode': 200,
+        'body': json.dumps(result)
+    }
+
+
+def coordinate(plan, run_id, user_ids, shard_count, context):
+    # Workers are this same function with the same timeout, so they get a deadline inside
+    # the coordinator's remaining time; it is still running when they finish or give up
+    deadline = time.time() + context.get_remaining_time_in_millis() / 1000 - SHARD_TIME_MARGIN_SECONDS
+    executor = LambdaShardExecutor(lambda_client, context.function_name, max_concurrency=shard_count)
+    totals = fan_out(executor, {'run_id': run_id or 'reconcile', 'plan': plan}, user_ids, shard_count, deadline)
+    print(f"Sharded run: {totals['matches']} matches for {totals['users']} users over {totals['shards']} shards, "
+          f"slowest shard {totals['slowest_shard_seconds']:.1f}s, {len(totals['failed_shards'])} failed")
+    return totals
+
+
+def run_plan(plan, context):
+    try:
+        run_id = run_id_for(plan)
+        print(f"Match run mode: {plan['mode']} ({len(plan['job_ids'])} new jobs, {len(plan['user_ids'])} new users)")
+        if run_already_completed(run_id):
+            print(f"Run {run_id} already completed, skipping redelivered message")
+            return {
+                'statusCode': 200,
+                'body': json.dumps({'status': 'already_processed', 'match_count': 0})
+            }
+
+        if plan['mode'] != 'delta_users' and MATCH_SHARDS > 1:
+            user_ids = list_user_ids()
+            shard_count = shard_count_for(plan, len(user_ids))
+            if shard_count > 1:
+                totals = coordinate(plan, run_id, user_ids, shard_count, context)
+                if totals['failed_shards']:
+                    # Not recorded as completed: the trigger is retried (or the next reconcile
+                    # runs), and pairs the finished shards already stored or emailed are skipped then
+                    return {
+                        'statusCode': 500,
+                        'body': json.dumps({'status': 'shards_failed', 'mode': plan['mode'], **totals})
+                    }
+                record_run(run_id, plan, totals['matches'], totals['watermark'])
+                return {
+                    'statusCode': 200,
+                    'body': json.dumps({'status': 'matching_complete', 'mode': plan['mode'],
+                                        'match_count': totals['matches'], 'notified_users': totals['notified_users'],
+                                        'shards': totals['shards'], 'slowest_shard_seconds': totals['slowest_shard_seconds']})
                 }
-                sns.publish(
-                    TopicArn=topic_arn,
-                    Message=json.dumps(message),
-                    MessageStructure='json'
-                )
-                print(f"Sent email notification to {user_id} with {len(jobs_list)} jobs")
-            else:
-                print(f"No topic found for user_id: {user_id}")
+            user_embeddings = load_users(user_ids)
+        else:
+            user_embeddings = load_users(plan['user_ids'])
+
+        # A delta_users trigger names a user whose embedding should already be stored. If it
+        # is not, the run is not recorded and those users' messages are retried: later delta_jobs
+        # and reconcile runs skip pairs already scored, so only this run emails their matches
+        missing_users = [user_id for user_id in plan['user_ids'] if user_id not in user_embeddings]
+        if missing_users:
+            print(f"No embedding yet for {len(missing_users)} of {len(plan['user_ids'])} users, retrying their triggers")
+            result = match_users(plan, user_embeddings) if user_embeddings else {'matches': 0}
+            return {
+                'statusCode': 500,
+                'body': json.dumps({'status': 'embeddings_missing', 'mode': plan['mode'],
+                                    'match_count': result['matches'], 'missing_users': missing_users})
+            }
+
+        result = match_users(plan, user_embeddings)
+        record_run(run_id, plan, result['matches'], result['watermark'])
 
         return {
             'statusCode': 200,
-            'body': json.dumps({'status': 'matching_complete', 'match_count': len(matches)})
+            'body': json.dumps({'status': 'matching_complete', 'mode': plan['mode'], 'match_count': result['matches'],
+                                'notified_users': result['notified_users'], 'timings': result['timings']})
         }
 
     except Exception as e:
-        print(f"Error in matching: {e}")
+        print(f"Error in matching ({plan['mode']}): {e}")
         return {
             'statusCode': 500,
             'body': json.dumps(f"Error: {str(e)}")
-        }
\ No newline at end of file
+        }
+
+
+def missing_users_of(response):
+    # Users of a failed delta_users run that had no embedding yet; other failures fail the whole run
+    body = json.loads(response['body'])
+    return set(body.get('missing_users', [])) if isinstance(body, dict) else set()
+
+
+def lambda_handler(event, context):
+    if event.get('mode') == 'shard':
+        return shard_handler(event, context)
+
+    print("Starting matching process at:", time.ctime())
+    if event.get('mode') == 'reconcile' or not event.get('Records'):
+        return run_plan(reconcile_plan(), context)
+
+    messages = trigger_messages(event)
+    failed = [message_id for message_id, message in messages if message is None]
+    plans, invalid = plan_batch([(message_id, message) for message_id, message in messages if message is not None])
+    failed.extend(invalid)
+    summary = ', '.join(f"{plan['mode']} from {len(message_ids)}" for plan, message_ids in plans)
+    print(f"Coalesced {len(messages)} trigger messages into {len(plans)} runs ({summary})")
+
+    users_by_message = {
+        message_id: message.get('user_id') or message.get('userId')
+        for message_id, message in messages if message is not None
+    }
+    response = None
+    for plan, message_ids in plans:
+        response = run_plan(plan, context)
+        if response['statusCode'] != 200:
+            missing_users = missing_users_of(response)
+            if missing_users:
+                # The users that were scored are done; only the others wait for their embedding
+                message_ids = [message_id for message_id in message_ids if users_by_message.get(message_id) in missing_users]
+            failed.extend(message_ids)
+
+    if is_sqs_event(event):
+        # Only the messages of failed runs go back to the queue (ReportBatchItemFailures)
+        print(f"{len(failed)} of {len(messages)} trigger messages failed")
+        return batch_response(failed)
+    return response or {
+        'statusCode': 400,
+        'body': json.dumps('Error: no readable trigger message')
+    }
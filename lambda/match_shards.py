@@ -0,0 +1,155 @@
+"""Coordinator/worker sharding for large match runs.
+
+A coordinator splits the users of a run into shards by a stable hash of
+user_id and hands every shard to a worker. Each worker scores its users
+against the run's shared job set (the job snapshot, or the run's new
+job_ids), writes and notifies, and returns its counts; the coordinator
+adds them up. Where the workers run is up to the executor:
+
+LambdaShardExecutor  invokes the match Lambda once per shard with
+                     {"mode": "shard", ...} and waits for every result.
+LocalShardExecutor   runs a worker function in a process pool, so the same
+                     partitioning and aggregation can be tested and
+                     benchmarked on one machine. Lambda has no /dev/shm,
+                     so multiprocessing is not used inside a function.
+
+A run can carry a deadline (epoch seconds) that every worker receives in
+its payload. Workers stop before it, and executors stop waiting shortly
+after it and report the missing shards as failed, so the coordinator
+always has time left to aggregate and decide the run's outcome.
+"""
+import hashlib
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+COUNT_FIELDS = ('users', 'jobs', 'pairs_scored', 'pairs_unfiltered', 'matches', 'notified_users')
+RESULT_GRACE_SECONDS = 10  # How long past the deadline a worker's response may still be in transit
+
+
+def shard_for(user_id, shard_count):
+    # hash() is salted per process; workers and retries must agree on the shard
+    digest = hashlib.sha256(user_id.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % shard_count
+
+
+def partition_users(user_ids, shard_count):
+    """Split user_ids into shard_count lists; a user always lands in the same shard."""
+    shards = [[] for _ in range(shard_count)]
+    for user_id in user_ids:
+        shards[shard_for(user_id, shard_count)].append(user_id)
+    return shards
+
+
+def shard_payloads(base_payload, user_ids, shard_count):
+    """One worker payload per non-empty shard: base_payload plus shard, shard_count and user_ids."""
+    return [
+        dict(base_payload, mode='shard', shard=shard, shard_count=shard_count, user_ids=shard_user_ids)
+        for shard, shard_user_ids in enumerate(partition_users(user_ids, shard_count))
+        if shard_user_ids
+    ]
+
+
+def _error_result(payload, error):
+    return {'shard': payload['shard'], 'error': str(error)}
+
+
+def _collect(executor, payloads, futures, timeout):
+    # Results of shards that are not done within timeout are reported as errors. The
+    # pool is shut down without waiting, so a stuck worker cannot hold up the caller
+    done, _ = wait(futures, timeout=timeout)
+    results = []
+    for payload, future in zip(payloads, futures):
+        if future not in done:
+            results.append(_error_result(payload, 'no result before the run deadline'))
+            continue
+        try:
+            results.append(future.result())
+        except Exception as e:
+            results.append(_error_result(payload, e))
+    executor.shutdown(wait=False, cancel_futures=True)
+    return results
+
+
+class LocalShardExecutor:
+    """Runs worker(payload) for every shard in a process pool; worker must be a module-level function."""
+
+    def __init__(self, worker, max_workers=None):
+        self.worker = worker
+        self.max_workers = max_workers
+
+    def run(self, payloads, timeout=None):
+        executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return _collect(executor, payloads, [executor.submit(self.worker, payload) for payload in payloads], timeout)
+
+
+class LambdaShardExecutor:
+    """Invokes function_name synchronously once per shard and collects the workers' result bodies.
+
+    The Lambda client must allow a read timeout as long as the worker's own
+    timeout and must not retry: a retried invocation would run the shard twice.
+    With a timeout, run() returns once it has passed even if invocations are
+    still outstanding.
+    """
+
+    def __init__(self, lambda_client, function_name, max_concurrency=16):
+        self.lambda_client = lambda_client
+        self.function_name = function_name
+        self.max_concurrency = max_concurrency
+
+    def _invoke(self, payload):
+        try:
+            response = self.lambda_client.invoke(
+                FunctionName=self.function_name,
+                InvocationType='RequestResponse',
+                Payload=json.dumps(payload).encode('utf-8')
+            )
+            result = json.loads(response['Payload'].read() or b'null')
+        except Exception as e:
+            return _error_result(payload, e)
+        if response.get('FunctionError'):
+            return _error_result(payload, (result or {}).get('errorMessage', response['FunctionError']))
+        if not isinstance(result, dict) or result.get('statusCode') != 200:
+            return _error_result(payload, (result or {}).get('body', 'no result'))
+        return json.loads(result['body'])
+
+    def run(self, payloads, timeout=None):
+        if not payloads:
+            return []
+        executor = ThreadPoolExecutor(max_workers=max(1, min(self.max_concurrency, len(payloads))))
+        return _collect(executor, payloads, [executor.submit(self._invoke, payload) for payload in payloads], timeout)
+
+
+def aggregate(results):
+    """Add up worker counts; failed shards are listed instead of counted."""
+    totals = {field: 0 for field in COUNT_FIELDS}
+    totals.update(shards=len(results), failed_shards=[], watermark=0, slowest_shard_seconds=0.0)
+    for result in results:
+        if 'error' in result:
+            totals['failed_shards'].append({'shard': result['shard'], 'error': result['error']})
+            continue
+        for field in COUNT_FIELDS:
+            totals[field] += result.get(field, 0)
+        totals['watermark'] = max(totals['watermark'], result.get('watermark', 0))
+        totals['slowest_shard_seconds'] = max(totals['slowest_shard_seconds'], result.get('seconds', 0.0))
+    return totals
+
+
+def fan_out(executor, base_payload, user_ids, shard_count, deadline=None):
+    """Partition user_ids, run one worker per shard on executor and return the aggregated counts.
+
+    With a deadline (epoch seconds), workers receive it in their payload and
+    shards without a result shortly after it count as failed.
+    """
+    timeout = None
+    if deadline is not None:
+        base_payload = dict(base_payload, deadline=deadline)
+        timeout = max(0.0, deadline + RESULT_GRACE_SECONDS - time.time())
+    payloads = shard_payloads(base_payload, user_ids, shard_count)
+    budget = f", {timeout:.0f}s to finish" if timeout is not None else ''
+    print(f"Fanning out {len(user_ids)} users to {len(payloads)} shards "
+          f"(largest {max((len(p['user_ids']) for p in payloads), default=0)} users){budget}")
+    totals = aggregate(executor.run(payloads, timeout))
+    for failure in totals['failed_shards']:
+        print(f"Shard {failure['shard']} failed: {failure['error']}")
+    return totals
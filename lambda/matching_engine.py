@@ -0,0 +1,85 @@
+"""Vectorized cosine-similarity scoring shared by the match Lambdas.
+
+Embeddings are L2-normalized once into contiguous float32 matrices so that
+cosine similarity becomes a plain matrix multiply. Scoring is done in row
+blocks to keep the similarity matrix for one block within a fixed memory
+budget, and top-k selection uses argpartition instead of a full sort.
+"""
+import numpy as np
+
+MATCH_THRESHOLD = 0.7  # Minimum cosine similarity for a job to count as a match
+BLOCK_ELEMENTS = 4 * 1024 * 1024  # ~16 MB of float32 similarities per block
+
+
+def normalize_embeddings(embeddings):
+    """Stack embeddings into a unit-length float32 matrix.
+
+    Returns (matrix, kept) where kept lists the positions of the input
+    embeddings that were usable. Missing, empty, zero-norm or wrongly sized
+    vectors are dropped.
+    """
+    rows = []
+    kept = []
+    dim = None
+    for position, embedding in enumerate(embeddings):
+        if embedding is None:
+            continue
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        if vector.size == 0:
+            continue
+        if dim is None:
+            dim = vector.size
+        elif vector.size != dim:
+            print(f"Skipping embedding at position {position}: dimension {vector.size} != {dim}")
+            continue
+        rows.append(vector)
+        kept.append(position)
+
+    if not rows:
+        return np.empty((0, dim or 0), dtype=np.float32), []
+
+    matrix = np.ascontiguousarray(np.vstack(rows), dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1)
+    nonzero = norms > 0
+    if not nonzero.all():
+        matrix = matrix[nonzero]
+        norms = norms[nonzero]
+        kept = [position for position, ok in zip(kept, nonzero) if ok]
+    matrix /= norms[:, None]
+    return matrix, kept
+
+
+def score_matches(user_matrix, job_matrix, threshold=MATCH_THRESHOLD, top_k=None,
+                  block_elements=BLOCK_ELEMENTS):
+    """Yield (user_index, job_index, similarity) for every pair above threshold.
+
+    Both matrices must come from normalize_embeddings. When top_k is given,
+    at most top_k jobs are returned per user (the highest scoring ones).
+    """
+    n_users, n_jobs = user_matrix.shape[0], job_matrix.shape[0]
+    if n_users == 0 or n_jobs == 0:
+        return
+    if user_matrix.shape[1] != job_matrix.shape[1]:
+        raise ValueError(
+            f"Embedding dimension mismatch: users {user_matrix.shape[1]} vs jobs {job_matrix.shape[1]}"
+        )
+
+    job_matrix_t = job_matrix.T
+    block_rows = max(1, block_elements // n_jobs)
+    use_top_k = top_k is not None and 0 < top_k < n_jobs
+
+    for start in range(0, n_users, block_rows):
+        sims = user_matrix[start:start + block_rows] @ job_matrix_t
+
+        if use_top_k:
+            candidates = np.argpartition(sims, n_jobs - top_k, axis=1)[:, n_jobs - top_k:]
+            scores = np.take_along_axis(sims, candidates, axis=1)
+            rows, cols = np.nonzero(scores > threshold)
+            job_indices = candidates[rows, cols]
+            values = scores[rows, cols]
+        else:
+            rows, job_indices = np.nonzero(sims > threshold)
+            values = sims[rows, job_indices]
+
+        for row, job_index, value in zip(rows.tolist(), job_indices.tolist(), values.tolist()):
+            yield start + row, job_index, value
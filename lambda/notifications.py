@@ -0,0 +1,223 @@
+"""Per-user match digests sent by match.py.
+
+Matching runs once per fetched page (and again on SNS redelivery), so the
+same match can come out of several overlapping runs. Before publishing, a
+run claims each (user, job) pair in the notification log with a
+conditional put; only pairs no earlier run has claimed go into the user's
+digest. Claims are written as pending and marked sent once the publish
+succeeds. Pending claims sit in the sparse pending-index; every run takes
+over (with a conditional update) pending claims older than
+CLAIM_LEASE_SECONDS and sends them, so a run that failed to publish, timed
+out or crashed after claiming does not lose the email. Delivery is
+therefore at-least-once: a digest is sent twice only if a run dies between
+publishing and marking its claims sent.
+
+Digests go to one shared topic; each email subscription carries a filter
+policy on the user_id message attribute (see cognito_post_auth.py), so a
+digest is delivered only to its user and up to PUBLISH_BATCH_SIZE digests
+share one PublishBatch call. Users still on a per-user topic from before
+the shared topic (see scripts/migrate_user_topics.py) are looked up with
+one BatchGetItem and published to individually; set
+NOTIFY_LEGACY_TOPICS=false once they are migrated to skip the lookup.
+"""
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+
+from batch_writes import put_items_if_absent, write_items
+from data_access import batch_get_items
+
+NOTIFY_WORKERS = int(os.environ.get('NOTIFY_WORKERS', '8'))
+NOTIFICATION_TTL_DAYS = int(os.environ.get('NOTIFICATION_TTL_DAYS', '30'))
+DIGEST_MAX_JOBS = 25  # Jobs listed in one email; the rest are counted
+PUBLISH_BATCH_SIZE = 10  # SNS PublishBatch limit
+LEGACY_TOPICS = os.environ.get('NOTIFY_LEGACY_TOPICS', 'true').lower() == 'true'
+CLAIM_LEASE_SECONDS = int(os.environ.get('NOTIFY_CLAIM_LEASE_SECONDS', '1200'))  # Longer than a match run can last
+PENDING_INDEX = 'pending-index'
+RECOVER_LIMIT = 500  # Stale claims taken over per run
+DIGEST_FIELDS = ('job_id', 'job_title', 'location', 'similarity_score')
+
+
+def notification_id(user_id, job_id):
+    return f"{user_id}#{job_id}"
+
+
+def legacy_topic_arns(user_topics_table, user_ids, shared_topic_arn):
+    """{user_id: topic_arn} for users whose notifications still go to a per-user topic."""
+    items = batch_get_items(user_topics_table, [{'user_id': user_id} for user_id in user_ids],
+                            projection_expression='user_id, topic_arn')
+    return {
+        item['user_id']: item['topic_arn']
+        for item in items
+        if item.get('topic_arn') and item['topic_arn'] != shared_topic_arn
+    }
+
+
+def claim_item(user_id, job, claimed_at, sent=False):
+    """Notification log item for a (user, job) pair; pending items carry the digest fields for a retry."""
+    item = {
+        'notification_id': notification_id(user_id, job['job_id']),
+        'user_id': user_id,
+        'claimed_at': claimed_at,
+        'expires_at': int(time.time()) + NOTIFICATION_TTL_DAYS * 86400
+    }
+    item.update({field: job[field] for field in DIGEST_FIELDS if field in job})
+    if sent:
+        item['status'] = 'sent'
+    else:
+        item['status'] = 'pending'
+        item['pending'] = 'pending'  # Only pending items have this key, so only they are in PENDING_INDEX
+    return item
+
+
+def claim_new_matches(log_table, user_matches):
+    """Claim every (user, job) pair not notified before; returns ({user_id: [jobs]}, stats)."""
+    now = int(time.time())
+    entries = [claim_item(user_id, job, now) for user_id, jobs_list in user_matches.items() for job in jobs_list]
+    stats = put_items_if_absent(log_table, entries, 'notification_id')
+    claimed = {(entry['user_id'], entry['job_id']) for entry in stats['inserted']}
+
+    digests = {}
+    for user_id, jobs_list in user_matches.items():
+        new_jobs = [job for job in jobs_list if (user_id, job['job_id']) in claimed]
+        if new_jobs:
+            digests[user_id] = new_jobs
+    return digests, stats
+
+
+def take_over_stale_claims(log_table):
+    """Re-claim pending claims whose lease ran out; returns {user_id: [jobs]} this run now owns."""
+    now = int(time.time())
+    response = log_table.query(
+        IndexName=PENDING_INDEX,
+        KeyConditionExpression='#pending = :pending AND claimed_at < :cutoff',
+        ExpressionAttributeNames={'#pending': 'pending'},
+        ExpressionAttributeValues={':pending': 'pending', ':cutoff': now - CLAIM_LEASE_SECONDS},
+        Limit=RECOVER_LIMIT
+    )
+    recovered = {}
+    for item in response.get('Items', []):
+        try:
+            # Another run may be taking over the same claim; only one update wins
+            log_table.update_item(
+                Key={'notification_id': item['notification_id']},
+                UpdateExpression='SET claimed_at = :now',
+                ConditionExpression='claimed_at = :seen AND attribute_exists(#pending)',
+                ExpressionAttributeNames={'#pending': 'pending'},
+                ExpressionAttributeValues={':now': now, ':seen': item['claimed_at']}
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                continue
+            raise
+        job = {field: item[field] for field in DIGEST_FIELDS if field in item}
+        job['job_id'] = item.get('job_id') or item['notification_id'].split('#', 1)[1]
+        recovered.setdefault(item['user_id'], []).append(job)
+    return recovered
+
+
+def mark_claims(log_table, user_id, jobs_list, sent):
+    # Sent claims leave PENDING_INDEX; unsent ones are reset so the next run takes them over at once
+    items = [claim_item(user_id, job, int(time.time()) if sent else 0, sent=sent) for job in jobs_list]
+    write_items(log_table, items, ('notification_id',))
+
+
+def format_digest(user_id, jobs_list):
+    jobs_list = sorted(jobs_list, key=lambda job: job['similarity_score'], reverse=True)
+    lines = [f"- {job['job_title']} ({job['location']}) - Similarity: {job['similarity_score']}"
+             for job in jobs_list[:DIGEST_MAX_JOBS]]
+    if len(jobs_list) > DIGEST_MAX_JOBS:
+        lines.append(f"...and {len(jobs_list) - DIGEST_MAX_JOBS} more on your dashboard")
+    return {
+        'default': json.dumps({
+            'user_id': user_id,
+            'message': "New job matches found:\n" + "\n".join(lines)
+        }),
+        'email': f"Subject: New Job Matches for {user_id}\n\nDear User,\n\nThe following job matches were found based on your resume:\n"
+                 + "\n".join(lines) + "\n\nBest,\nResume Matcher Team"
+    }
+
+
+def send_digests(sns, topic_arn, user_topics_table, log_table, user_matches):
+    """Email each user one digest of their not-yet-notified matches; returns a stats dict."""
+    start = time.perf_counter()
+    digests, claim_stats = claim_new_matches(log_table, user_matches)
+    recovered = take_over_stale_claims(log_table)
+    for user_id, jobs_list in recovered.items():
+        digests.setdefault(user_id, []).extend(jobs_list)
+    legacy = legacy_topic_arns(user_topics_table, list(digests), topic_arn) if LEGACY_TOPICS and digests else {}
+
+    def release(user_ids, error):
+        for user_id in user_ids:
+            print(f"Failed to notify {user_id}, leaving {len(digests[user_id])} matches pending for a later run: {error}")
+            mark_claims(log_table, user_id, digests[user_id], sent=False)
+
+    def publish_shared(user_ids):
+        entries = [
+            {
+                'Id': str(position),
+                'Message': json.dumps(format_digest(user_id, digests[user_id])),
+                'MessageStructure': 'json',
+                # Matched by the {"user_id": [...]} filter policy on the user's subscription
+                'MessageAttributes': {'user_id': {'DataType': 'String', 'StringValue': user_id}}
+            }
+            for position, user_id in enumerate(user_ids)
+        ]
+        try:
+            response = sns.publish_batch(TopicArn=topic_arn, PublishBatchRequestEntries=entries)
+        except Exception as e:
+            release(user_ids, e)
+            return []
+        failed = {int(entry['Id']): entry.get('Message', entry.get('Code')) for entry in response.get('Failed', [])}
+        for position, error in failed.items():
+            release([user_ids[position]], error)
+        return [user_id for position, user_id in enumerate(user_ids) if position not in failed]
+
+    def publish_legacy(user_ids):
+        user_id = user_ids[0]
+        try:
+            sns.publish(
+                TopicArn=legacy[user_id],
+                Message=json.dumps(format_digest(user_id, digests[user_id])),
+                MessageStructure='json'
+            )
+        except Exception as e:
+            release(user_ids, e)
+            return []
+        return user_ids
+
+    shared_users = [user_id for user_id in digests if user_id not in legacy]
+    calls = [(publish_shared, shared_users[i:i + PUBLISH_BATCH_SIZE])
+             for i in range(0, len(shared_users), PUBLISH_BATCH_SIZE)]
+    calls += [(publish_legacy, [user_id]) for user_id in digests if user_id in legacy]
+
+    sent_users = []
+    if calls:
+        with ThreadPoolExecutor(max_workers=max(1, min(NOTIFY_WORKERS, len(calls)))) as executor:
+            for sent in executor.map(lambda call: call[0](call[1]), calls):
+                sent_users.extend(sent)
+    for user_id in sent_users:
+        mark_claims(log_table, user_id, digests[user_id], sent=True)
+    return {
+        'users': len(user_matches),
+        'legacy_users': len([user_id for user_id in digests if user_id in legacy]),
+        'already_notified': claim_stats['duplicates'],
+        'recovered': sum(len(jobs_list) for jobs_list in recovered.values()),
+        'digests_sent': len(sent_users),
+        'jobs_sent': sum(len(digests[user_id]) for user_id in sent_users),
+        'publish_calls': len(calls),
+        'failed': len(digests) - len(sent_users),
+        'seconds': time.perf_counter() - start
+    }
+
+
+def log_notify_stats(stats):
+    print(
+        f"Notifications: {stats['digests_sent']} digests ({stats['jobs_sent']} jobs) for {stats['users']} matched users in "
+        f"{stats['seconds']:.2f}s with {stats['publish_calls']} publish calls ({stats['legacy_users']} legacy topics), "
+        f"{stats['already_notified']} matches already notified, {stats['recovered']} stale claims re-sent, "
+        f"{stats['failed']} failed"
+    )
@@ -0,0 +1,64 @@
+"""Cursor-based pagination over DynamoDB queries for the HTTP APIs.
+
+A cursor is the query's LastEvaluatedKey in DynamoDB JSON, together with a
+scope string naming the index and ordering it belongs to, encoded as
+URL-safe base64. Clients treat it as opaque and send it back unchanged.
+"""
+import base64
+import json
+
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+
+MAX_QUERY_PAGES = 5  # DynamoDB requests allowed to fill one filtered page
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(last_evaluated_key, scope):
+    if not last_evaluated_key:
+        return None
+    payload = {
+        'scope': scope,
+        'key': {name: _serializer.serialize(value) for name, value in last_evaluated_key.items()}
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor, scope):
+    """Return the ExclusiveStartKey for a cursor, or None for the first page."""
+    if not cursor:
+        return None
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        key = {name: _deserializer.deserialize(value) for name, value in payload['key'].items()}
+    except Exception as e:
+        raise InvalidCursor(f"Malformed cursor: {e}")
+    if payload.get('scope') != scope:
+        raise InvalidCursor('Cursor does not belong to this query')
+    return key
+
+
+def query_page(table, limit, exclusive_start_key=None, max_pages=MAX_QUERY_PAGES, **query_kwargs):
+    """Collect up to `limit` items, following pages when a FilterExpression drops items.
+
+    Each request asks for at most the number of items still missing, so the
+    returned LastEvaluatedKey resumes exactly after the last returned item.
+    Returns (items, last_evaluated_key).
+    """
+    items = []
+    last_key = exclusive_start_key
+    for _ in range(max_pages):
+        kwargs = dict(query_kwargs, Limit=limit - len(items))
+        if last_key:
+            kwargs['ExclusiveStartKey'] = last_key
+        response = table.query(**kwargs)
+        items.extend(response.get('Items', []))
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key or len(items) >= limit:
+            break
+    return items, last_key
@@ -0,0 +1,122 @@
+"""Int8 job embeddings and two-stage scoring for the match Lambdas.
+
+Int8Quantizer fits one symmetric scale per dimension over the job corpus
+and stores each job as int8 codes, a quarter of the float32 size. Scoring
+is done in two stages:
+
+1. Coarse pass over the codes. Folding the scales into the query,
+   u . (scales * codes_j) = (u * scales) . codes_j, so no dequantized
+   copy of the corpus is built. NumPy has no int8 GEMM (integer matmul
+   runs without BLAS and is many times slower), so each block of codes
+   is cast to float32 just before its matrix multiply.
+2. Exact re-rank. Only pairs whose coarse score is at least
+   threshold - margin are re-scored against the float32 matrix. With a
+   memory-mapped snapshot that touches only the candidate jobs' rows.
+
+The margin must cover the quantization error so that no true match is
+dropped in the coarse pass. fit() measures the error on sampled job
+pairs and suggests a margin. benchmarks/bench_quantization.py reports
+memory, time and how well the match set agrees with exact scoring.
+"""
+import os
+
+import numpy as np
+
+from matching_engine import BLOCK_ELEMENTS, MATCH_THRESHOLD
+
+QUANT_MARGIN = float(os.environ.get('QUANT_MARGIN', '0.02'))
+CODE_LIMIT = 127
+PAIRWISE_COST = 200  # Rough cost of one gathered pair dot product relative to one pair inside a GEMM
+
+
+class Int8Quantizer:
+    def __init__(self, scales, margin=QUANT_MARGIN):
+        self.scales = np.asarray(scales, dtype=np.float32)
+        self.margin = float(margin)
+
+    @classmethod
+    def fit(cls, matrix, sample_pairs=20000, seed=0):
+        """Fit per-dimension scales to the largest magnitude of each dimension in matrix.
+
+        The suggested margin is three times the largest coarse-score error
+        seen on sample_pairs random job pairs, and never less than QUANT_MARGIN.
+        """
+        matrix = np.asarray(matrix, dtype=np.float32)
+        peaks = np.abs(matrix).max(axis=0) if matrix.shape[0] else np.ones(matrix.shape[1], dtype=np.float32)
+        quantizer = cls(np.where(peaks > 0, peaks / CODE_LIMIT, 1.0))
+        if matrix.shape[0] > 1 and sample_pairs:
+            rng = np.random.default_rng(seed)
+            left = rng.integers(0, matrix.shape[0], size=sample_pairs)
+            right = rng.integers(0, matrix.shape[0], size=sample_pairs)
+            exact = np.einsum('ij,ij->i', matrix[left], matrix[right])
+            codes = quantizer.encode(matrix[right])
+            coarse = np.einsum('ij,ij->i', matrix[left] * quantizer.scales, codes.astype(np.float32))
+            quantizer.margin = max(QUANT_MARGIN, 3 * float(np.abs(coarse - exact).max()))
+        return quantizer
+
+    def encode(self, matrix):
+        codes = np.rint(np.asarray(matrix, dtype=np.float32) / self.scales)
+        return np.clip(codes, -CODE_LIMIT, CODE_LIMIT).astype(np.int8)
+
+    def decode(self, codes):
+        return codes.astype(np.float32) * self.scales
+
+
+def coarse_candidates(user_matrix, job_codes, scales, cutoff, block_elements=BLOCK_ELEMENTS):
+    """Yield (user_indices, job_indices) arrays of pairs whose coarse score is at least cutoff."""
+    n_users, n_jobs = user_matrix.shape[0], job_codes.shape[0]
+    if n_users == 0 or n_jobs == 0:
+        return
+    scaled_users = user_matrix * scales
+    # One float32 block of codes and one block of scores stay within block_elements each
+    job_rows = max(1, min(n_jobs, block_elements // max(1, job_codes.shape[1])))
+    for job_start in range(0, n_jobs, job_rows):
+        codes_t = job_codes[job_start:job_start + job_rows].astype(np.float32).T
+        user_rows = max(1, block_elements // codes_t.shape[1])
+        for user_start in range(0, n_users, user_rows):
+            sims = scaled_users[user_start:user_start + user_rows] @ codes_t
+            rows, cols = np.nonzero(sims >= cutoff)
+            if rows.size:
+                yield rows + user_start, cols + job_start
+
+
+def rerank(user_matrix, job_matrix, users, jobs, threshold):
+    """Exact scores for candidate pairs; returns the (users, jobs, similarities) above threshold.
+
+    Only candidate rows of job_matrix are read. Sparse candidates are scored
+    pair by pair; when they cover much of the block, one BLAS multiply of the
+    distinct candidate users and jobs is cheaper than gathering each pair.
+    """
+    unique_users, user_pos = np.unique(users, return_inverse=True)
+    unique_jobs, job_pos = np.unique(jobs, return_inverse=True)
+    if users.size * PAIRWISE_COST < unique_users.size * unique_jobs.size:
+        exact = np.einsum('ij,ij->i', user_matrix[users], np.asarray(job_matrix[jobs]))
+    else:
+        sims = user_matrix[unique_users] @ np.asarray(job_matrix[unique_jobs]).T
+        exact = sims[user_pos, job_pos]
+    keep = exact > threshold
+    return users[keep], jobs[keep], exact[keep]
+
+
+def score_matches_two_stage(user_matrix, job_matrix, job_codes, quantizer, threshold=MATCH_THRESHOLD,
+                            stats=None):
+    """Yield (user_index, job_index, similarity) like score_matches, using job_codes for the first pass.
+
+    job_matrix holds the exact normalized float32 rows (it may be memory-mapped)
+    and job_codes = quantizer.encode(job_matrix). Similarities are exact.
+    If stats is a dict, it receives the coarse pair count, the re-ranked
+    candidate count and the match count.
+    """
+    if user_matrix.shape[0] and job_codes.shape[0] and user_matrix.shape[1] != job_codes.shape[1]:
+        raise ValueError(
+            f"Embedding dimension mismatch: users {user_matrix.shape[1]} vs jobs {job_codes.shape[1]}"
+        )
+    counts = {'coarse_pairs': user_matrix.shape[0] * job_codes.shape[0], 'candidates': 0, 'matches': 0}
+    for users, jobs in coarse_candidates(user_matrix, job_codes, quantizer.scales, threshold - quantizer.margin):
+        counts['candidates'] += users.size
+        users, jobs, exact = rerank(user_matrix, job_matrix, users, jobs, threshold)
+        counts['matches'] += users.size
+        for user_index, job_index, value in zip(users.tolist(), jobs.tolist(), exact.tolist()):
+            yield user_index, job_index, value
+    if stats is not None:
+        stats.update(counts)
@@ -0,0 +1,102 @@
+"""Content-hash cache of parsed resumes.
+
+Uploads are fingerprinted by the SHA-256 of the S3 object. The cache table
+maps that hash to the applicant fields extracted from the resume, its skills
+embedding and the stored Textract blocks, so a repeat upload of the same
+PDF skips Textract, the GPT-4o parse and the embedding call entirely.
+
+A miss leaves a short-lived 'pending#<textract_job_id>' item holding the
+hash; user_details_extractor resolves it when the analysis finishes and
+stores the result under the hash. Hits and misses are counted per day on
+a 'stats#YYYY-MM-DD' item.
+"""
+import hashlib
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+RESUME_CACHE_TTL_DAYS = int(os.environ.get('RESUME_CACHE_TTL_DAYS', '180'))
+PENDING_TTL_SECONDS = 86400
+HASH_CHUNK_BYTES = 1024 * 1024
+APPLICANT_FIELDS = ('name', 'email', 'phone', 'skills', 'education')
+
+
+def hash_s3_object(s3, bucket, key, chunk_size=HASH_CHUNK_BYTES):
+    """SHA-256 of an S3 object, read in chunks."""
+    digest = hashlib.sha256()
+    body = s3.get_object(Bucket=bucket, Key=key)['Body']
+    for chunk in iter(lambda: body.read(chunk_size), b''):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def pending_key(job_id):
+    return f"pending#{job_id}"
+
+
+def get_cached_resume(table, content_hash, model):
+    """Return the cached entry for a hash, or None if absent or embedded with another model.
+
+    The embedding stays in its stored binary encoding so it can be copied to
+    the user embeddings table without decoding.
+    """
+    item = table.get_item(Key={'content_hash': content_hash}).get('Item')
+    if not item or item.get('model') != model or item.get('embedding') is None:
+        return None
+    return item
+
+
+def remember_pending(table, job_id, content_hash):
+    now = int(time.time())
+    table.put_item(Item={
+        'content_hash': pending_key(job_id),
+        'resume_hash': content_hash,
+        'expires_at': now + PENDING_TTL_SECONDS
+    })
+
+
+def pop_pending(table, job_id):
+    """Return and delete the hash recorded for a Textract job, if any."""
+    response = table.delete_item(Key={'content_hash': pending_key(job_id)}, ReturnValues='ALL_OLD')
+    return response.get('Attributes', {}).get('resume_hash')
+
+
+def store_resume(table, content_hash, applicant, resume_details, encoded_embedding, model, blocks_bucket=None, blocks_key=None):
+    now = int(time.time())
+    item = {
+        'content_hash': content_hash,
+        'applicant': {field: applicant.get(field) for field in APPLICANT_FIELDS},
+        'resume_details': json.dumps(resume_details),  # Kept as JSON: parser output may hold floats
+        'embedding': encoded_embedding,
+        'model': model,
+        'created_at': now,
+        'expires_at': now + RESUME_CACHE_TTL_DAYS * 86400
+    }
+    if blocks_key:
+        item['blocks_bucket'] = blocks_bucket
+        item['blocks_key'] = blocks_key
+    table.put_item(Item=item)
+
+
+def record_lookup(table, hit, content_hash=None):
+    """Count a hit or miss for today, and bump the entry's own hit counter on hits."""
+    day = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+    outcome = 'hits' if hit else 'misses'
+    print(f"Resume cache {'hit' if hit else 'miss'} for {content_hash}")
+    try:
+        table.update_item(
+            Key={'content_hash': f"stats#{day}"},
+            UpdateExpression='ADD #outcome :one',
+            ExpressionAttributeNames={'#outcome': outcome},
+            ExpressionAttributeValues={':one': 1}
+        )
+        if hit and content_hash:
+            table.update_item(
+                Key={'content_hash': content_hash},
+                UpdateExpression='ADD hit_count :one SET last_hit_at = :now',
+                ExpressionAttributeValues={':one': 1, ':now': int(time.time())}
+            )
+    except Exception as e:
+        # Statistics must never block an upload
+        print(f"Error recording resume cache {outcome}: {e}")
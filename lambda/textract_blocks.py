@@ -0,0 +1,85 @@
+"""Persist Textract analysis blocks once and read them back as a stream.
+
+textract_processor pages through get_document_analysis a single time and
+writes every block as one compact JSON line to a gzip object in S3
+(textract/<job_id>.jsonl.gz). user_details_extractor then reads that object
+line by line, keeping only the WORD and KEY_VALUE_SET blocks it needs, so
+memory stays bounded by the text of the resume, not by the full block set.
+"""
+import gzip
+import io
+import json
+import tempfile
+
+BLOCKS_PREFIX = 'textract/'
+ANALYSIS_PAGE_SIZE = 1000  # Largest MaxResults get_document_analysis accepts
+SPOOL_MAX_BYTES = 8 * 1024 * 1024  # Compressed bytes kept in memory before spilling to /tmp
+
+# Lines are written with compact separators, so a substring test can reject
+# unneeded blocks before paying for json.loads
+_WANTED_MARKERS = ('"BlockType":"WORD"', '"BlockType":"KEY_VALUE_SET"')
+
+
+def blocks_key(job_id):
+    return f"{BLOCKS_PREFIX}{job_id}.jsonl.gz"
+
+
+def iter_analysis_blocks(textract, job_id):
+    """Yield every block of a finished analysis job, following NextToken."""
+    kwargs = {'JobId': job_id, 'MaxResults': ANALYSIS_PAGE_SIZE}
+    while True:
+        response = textract.get_document_analysis(**kwargs)
+        yield from response.get('Blocks', [])
+        if 'NextToken' not in response:
+            return
+        kwargs['NextToken'] = response['NextToken']
+
+
+def write_blocks(s3, bucket, key, blocks):
+    """Stream blocks to s3://bucket/key as gzip JSON Lines; returns the block count."""
+    count = 0
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES) as spool:
+        with gzip.GzipFile(fileobj=spool, mode='wb', compresslevel=6) as gz:
+            for block in blocks:
+                gz.write(json.dumps(block, separators=(',', ':')).encode('utf-8'))
+                gz.write(b'\n')
+                count += 1
+        spool.seek(0)
+        s3.upload_fileobj(spool, bucket, key, ExtraArgs={'ContentType': 'application/gzip'})
+    return count
+
+
+def iter_stored_blocks(s3, bucket, key, wanted_only=True):
+    """Yield blocks from a stored artifact without loading the whole object."""
+    body = s3.get_object(Bucket=bucket, Key=key)['Body']
+    with gzip.GzipFile(fileobj=body, mode='rb') as gz:
+        for line in io.TextIOWrapper(gz, encoding='utf-8'):
+            if wanted_only and not any(marker in line for marker in _WANTED_MARKERS):
+                continue
+            yield json.loads(line)
+
+
+def collect_form_blocks(blocks):
+    """Build the maps the extractor needs in one pass over the blocks.
+
+    Returns (key_map, value_map, block_map, words): KEY/VALUE blocks by id,
+    a slim WORD map by id, and all WORD texts in document order.
+    """
+    key_map = {}
+    value_map = {}
+    block_map = {}
+    words = []
+    for block in blocks:
+        block_type = block.get('BlockType')
+        if block_type == 'WORD':
+            text = block.get('Text')
+            block_map[block['Id']] = {'BlockType': 'WORD', 'Text': text or ''}
+            if text:
+                words.append(text)
+        elif block_type == 'KEY_VALUE_SET':
+            slim = {'BlockType': block_type, 'Relationships': block.get('Relationships', [])}
+            if 'KEY' in block.get('EntityTypes', []):
+                key_map[block['Id']] = slim
+            else:
+                value_map[block['Id']] = slim
+    return key_map, value_map, block_map, words
@@ -1,45 +1,71 @@
-import boto3
 import json
 import os
 import time
-from botocore.exceptions import ClientError
+from aws_clients import lazy_client
+from textract_blocks import blocks_key, iter_analysis_blocks, write_blocks
 
-s3 = boto3.client('s3')
-textract = boto3.client('textract')
-sns = boto3.client('sns')
+s3 = lazy_client('s3')
+textract = lazy_client('textract')
+sns = lazy_client('sns')
 
-def lambda_handler(event, context):
-    print(event)
-    message = json.loads(event['Records'][0]['Sns']['Message'])
-    job_id = message['jobId']
-    user_id = message.get('userId', 'unknown')  # Extract user_id from message
-    
-    max_attempts = 10
-    print(job_id)
-    for attempt in range(max_attempts):
-        response = textract.get_document_analysis(JobId=job_id)
+# Fallback polling (only used for messages from upload_handler's legacy topic, e.g. a
+# local Textract stand-in without SNS notifications): exponential backoff between polls
+POLL_INITIAL_DELAY = float(os.environ.get('TEXTRACT_POLL_INITIAL_DELAY', '1'))
+POLL_MAX_DELAY = float(os.environ.get('TEXTRACT_POLL_MAX_DELAY', '8'))
+POLL_SAFETY_MARGIN_MS = 10000  # Stop polling this long before the Lambda timeout
+
+def parse_message(record):
+    message = json.loads(record['Sns']['Message'])
+    if 'JobId' in message and 'Status' in message:
+        # Textract completion notification (NotificationChannel); user_id travels in JobTag
+        return message['JobId'], message.get('JobTag') or 'unknown', message['Status']
+    return message['jobId'], message.get('userId', 'unknown'), None
+
+def poll_until_done(job_id, context):
+    delay = POLL_INITIAL_DELAY
+    while True:
+        response = textract.get_document_analysis(JobId=job_id, MaxResults=1)
         status = response['JobStatus']
         print(f"Job {job_id} status: {status}")
-        
-        if status in ['SUCCEEDED', 'FAILED']:
-            break
-        time.sleep(5)  # Poll every 5 seconds
-        
-    if status == 'SUCCEEDED':
-        blocks = response['Blocks']
-        while 'NextToken' in response:
-            response = textract.get_document_analysis(JobId=job_id, NextToken=response['NextToken'])
-            blocks.extend(response['Blocks'])
-        
-        sns.publish(
-            TopicArn=os.environ['SNS_TOPIC_ARN'],
-            Message=json.dumps({'jobId': job_id, 'userId': user_id})
-        )
-        print("Published to ResumeProcessingTopic")
-    else:
-        print(f"Job {job_id} failed")
-        
+        if status != 'IN_PROGRESS':
+            return status
+        remaining_ms = context.get_remaining_time_in_millis() if context else float('inf')
+        if remaining_ms - delay * 1000 < POLL_SAFETY_MARGIN_MS:
+            print(f"Job {job_id} still running near the Lambda timeout")
+            return status
+        time.sleep(delay)
+        delay = min(delay * 2, POLL_MAX_DELAY)
+
+def lambda_handler(event, context):
+    print(event)
+    for record in event['Records']:
+        job_id, user_id, status = parse_message(record)
+        print(job_id)
+
+        if status is None:
+            status = poll_until_done(job_id, context)
+
+        if status == 'SUCCEEDED':
+            # Fetch the blocks once and persist them; the extractor reads this artifact
+            # instead of calling get_document_analysis again
+            bucket = os.environ['OUTPUT_BUCKET']
+            key = blocks_key(job_id)
+            block_count = write_blocks(s3, bucket, key, iter_analysis_blocks(textract, job_id))
+            print(f"Stored {block_count} blocks at s3://{bucket}/{key}")
+
+            sns.publish(
+                TopicArn=os.environ['SNS_TOPIC_ARN'],
+                Message=json.dumps({'jobId': job_id, 'userId': user_id,
+                                    'blocksBucket': bucket, 'blocksKey': key})
+            )
+            print("Published to ResumeProcessingTopic")
+        elif status == 'IN_PROGRESS':
+            # Let SNS retry the invocation later instead of silently dropping the resume
+            raise RuntimeError(f"Textract job {job_id} did not finish in time")
+        else:
+            print(f"Job {job_id} failed with status {status}")
+
     return {
         'statusCode': 200,
         'body': json.dumps({'status': 'triggered'})
-    }
\ No newline at end of file
+    }
@@ -0,0 +1,78 @@
+"""Read trigger messages from SQS batches and report partial batch failures.
+
+The match and immediate-match Lambdas are fed by SQS queues subscribed to
+their SNS topics, with a batching window, so a burst of page fetches or
+uploads arrives as one batch instead of one invocation per message. Both
+handlers still accept direct SNS events (manual tests, rollout) and plain
+JSON invocations. Bodies may be raw SNS messages (RawMessageDelivery) or
+the SNS envelope.
+
+Handlers return batch_response() with the ids of the messages they could
+not process; with ReportBatchItemFailures on the event source mapping only
+those return to the queue, and after maxReceiveCount tries they move to
+the dead-letter queue.
+
+A new resume's delta_users trigger is published with publish_match_trigger
+once the user's embedding is stored; the match queue only subscribes to
+ResumeProcessingTopic messages carrying its trigger attribute.
+"""
+import json
+
+MATCH_TRIGGER_ATTRIBUTES = {'trigger': {'DataType': 'String', 'StringValue': 'match'}}
+
+
+def publish_match_trigger(sns, topic_arn, job_id, user_id):
+    """Publish the delta_users match trigger for user_id to ResumeProcessingTopic.
+
+    job_id identifies the upload, so a redelivered trigger maps to the same run.
+    """
+    sns.publish(
+        TopicArn=topic_arn,
+        Message=json.dumps({'jobId': job_id, 'userId': user_id}),
+        MessageAttributes=MATCH_TRIGGER_ATTRIBUTES
+    )
+
+
+def is_sqs_event(event):
+    records = event.get('Records') or []
+    return bool(records) and records[0].get('eventSource') == 'aws:sqs'
+
+
+def _unwrap(body):
+    message = json.loads(body) if body else {}
+    # Without RawMessageDelivery the SQS body is the SNS envelope
+    if isinstance(message, dict) and message.get('Type') == 'Notification' and 'Message' in message:
+        message = json.loads(message['Message'])
+    if not isinstance(message, dict):
+        raise ValueError(f"expected a JSON object, got {type(message).__name__}")
+    return message
+
+
+def _read(message_id, body):
+    try:
+        return _unwrap(body)
+    except (TypeError, ValueError) as e:
+        print(f"Unreadable trigger message {message_id} ({e}): {body!r:.200}")
+        return None
+
+
+def trigger_messages(event):
+    """[(message_id, message_dict)] for every record of an SQS or SNS event.
+
+    message_id is the SQS messageId (what batchItemFailures refers to) for
+    SQS records and the SNS MessageId otherwise. Records whose body is not
+    a JSON object are returned with message None so the caller can count
+    them as failed instead of failing the whole batch.
+    """
+    messages = []
+    for record in event.get('Records') or []:
+        if record.get('eventSource') == 'aws:sqs':
+            messages.append((record['messageId'], _read(record['messageId'], record.get('body'))))
+        elif 'Sns' in record:
+            message_id = record['Sns'].get('MessageId', '')
+            messages.append((message_id, _read(message_id, record['Sns'].get('Message'))))
+    return messages
+
+
+def batch_response(failed_message_ids):
+    return {'batchItemFailures': [{'itemIdentifier': message_id} for message_id in sorted(set(failed_message_ids))]}
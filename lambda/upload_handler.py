@@ -1,10 +1,86 @@
-import boto3
+import hashlib
 import json
 import os
+import re
+import time
+import uuid
+from datetime import datetime, timezone
+from aws_clients import lazy_client, lazy_table
+from embedding_client import EMBEDDING_MODEL
+from resume_cache import get_cached_resume, hash_s3_object, record_lookup, remember_pending
+from textract_blocks import blocks_key, write_blocks
+from trigger_queue import publish_match_trigger
 
-s3 = boto3.client('s3')
-textract = boto3.client('textract')
-sns = boto3.client('sns')
+s3 = lazy_client('s3')
+textract = lazy_client('textract')
+sns = lazy_client('sns')
+resume_cache_table = lazy_table(os.environ['RESUME_CACHE_TABLE']) if os.environ.get('RESUME_CACHE_TABLE') else None
+
+# Single-page documents up to this size are analyzed with analyze_document in this
+# invocation and parsed in-process (0 disables). Textract's synchronous limit is 10 MB.
+SYNC_MAX_BYTES = int(os.environ.get('TEXTRACT_SYNC_MAX_BYTES', str(5 * 1024 * 1024)))
+SINGLE_PAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+def job_tag_for(user_id):
+    # JobTag allows [a-zA-Z0-9_.\-:]{1,64}; Cognito subs already fit
+    return re.sub(r'[^a-zA-Z0-9_.\-:]', '_', user_id)[:64] or 'unknown'
+
+def reuse_cached_resume(user_id, cached):
+    # Same document parsed before: store its details for this user and go straight to matching
+    applicant_item = dict(cached['applicant'])
+    applicant_item['user_id'] = user_id
+    applicant_item['upload_timestamp'] = datetime.now(timezone.utc).isoformat()
+    lazy_table(os.environ['APPLICANT_DETAILS_TABLE']).put_item(Item=applicant_item)
+    lazy_table(os.environ['USER_EMBEDDINGS_TABLE']).put_item(Item={
+        'user_id': user_id,
+        'embedding': cached['embedding']
+    })
+    sns.publish(
+        TopicArn=os.environ['USER_MATCH_TOPIC_ARN'],
+        Message=json.dumps({'user_id': user_id})
+    )
+    # The delta_users run is the only one that emails a new resume's matches; process_resume
+    # sends it on the other paths. A new id per upload, so a repeat upload of the same file
+    # is not taken for a redelivery.
+    publish_match_trigger(sns, os.environ['RESUME_PROCESSING_TOPIC_ARN'], f"cache-{uuid.uuid4().hex}", user_id)
+    print(f"Reused cached resume {cached['content_hash']} for user_id: {user_id}")
+
+def page_count(key, data):
+    # Images are one page. For a PDF, count its page objects; 0 means unknown (for example
+    # page objects inside compressed object streams), which keeps the document on the async path
+    if key.lower().endswith(SINGLE_PAGE_EXTENSIONS):
+        return 1
+    if data.startswith(b'%PDF'):
+        return len(re.findall(rb'/Type\s*/Page(?![a-zA-Z])', data))
+    return 0
+
+def analyze_synchronously(bucket, key, user_id, content_hash):
+    # Textract answers in this call: no job, no completion topic, no processor hop
+    started = time.perf_counter()
+    try:
+        response = textract.analyze_document(
+            Document={'S3Object': {'Bucket': bucket, 'Name': key}},
+            FeatureTypes=['FORMS']
+        )
+    except Exception as e:
+        # e.g. a PDF with more pages than the scan found, or a throttled request
+        print(f"Synchronous analysis failed, starting an async job instead: {e}")
+        return None
+    job_id = f"sync-{uuid.uuid4().hex}"
+    print(f"Analyzed {key} synchronously in {time.perf_counter() - started:.2f}s as {job_id}")
+
+    # Keep the same blocks artifact the async path stores, for the resume cache
+    output_bucket = os.environ['OUTPUT_BUCKET']
+    output_key = blocks_key(job_id)
+    write_blocks(s3, output_bucket, output_key, response['Blocks'])
+
+    # Imported on first use: it needs the NumPy and OpenAI layers, the async path does not
+    import user_details_extractor
+    # Publishes the delta_users match trigger once the embedding is stored
+    result = user_details_extractor.process_resume(job_id, user_id, response['Blocks'], output_bucket, output_key,
+                                                   content_hash)
+    print(f"Synchronous resume path finished in {time.perf_counter() - started:.2f}s")
+    return job_id, result
 
 def lambda_handler(event, context):
     print(event)
@@ -16,19 +92,76 @@ def lambda_handler(event, context):
 
     print(bucket)
     print(key)
-    response = textract.start_document_analysis(
-        DocumentLocation={'S3Object': {'Bucket': bucket, 'Name': key}},
-        FeatureTypes=['FORMS']
-    )
-    job_id = response['JobId']
-    print(response)
 
-    sns.publish(
-        TopicArn=os.environ['TEXTRACT_JOB_TOPIC_ARN'],
-        Message=json.dumps({'jobId': job_id, 'userId': user_id})
-    )
+    # Small documents are read once: the bytes give the page count and the cache hash
+    data = None
+    if response['ContentLength'] <= SYNC_MAX_BYTES:
+        data = s3.get_object(Bucket=bucket, Key=key)['Body'].read()
+
+    content_hash = None
+    if resume_cache_table is not None:
+        try:
+            content_hash = hashlib.sha256(data).hexdigest() if data is not None else hash_s3_object(s3, bucket, key)
+            cached = get_cached_resume(resume_cache_table, content_hash, EMBEDDING_MODEL)
+            record_lookup(resume_cache_table, cached is not None, content_hash)
+            if cached:
+                reuse_cached_resume(user_id, cached)
+                return {
+                    'statusCode': 200,
+                    'body': json.dumps({'userId': user_id, 'contentHash': content_hash, 'cached': True})
+                }
+        except Exception as e:
+            # Fall through to a normal analysis if the cache is unavailable
+            print(f"Error checking resume cache: {e}")
+
+    if data is not None and page_count(key, data) == 1:
+        analyzed = analyze_synchronously(bucket, key, user_id, content_hash)
+        if analyzed is not None:
+            job_id, result = analyzed
+            if result['statusCode'] != 200:
+                return result
+            return {
+                'statusCode': 200,
+                'body': json.dumps({'jobId': job_id, 'userId': user_id, 'sync': True})
+            }
+
+    completion_topic_arn = os.environ.get('TEXTRACT_COMPLETION_TOPIC_ARN')
+    if completion_topic_arn:
+        # Textract notifies the completion topic itself, which invokes textract_processor
+        # once the analysis is done (no polling, no billed time spent sleeping)
+        response = textract.start_document_analysis(
+            DocumentLocation={'S3Object': {'Bucket': bucket, 'Name': key}},
+            FeatureTypes=['FORMS'],
+            JobTag=job_tag_for(user_id),
+            NotificationChannel={
+                'SNSTopicArn': completion_topic_arn,
+                'RoleArn': os.environ['TEXTRACT_ROLE_ARN']
+            }
+        )
+        job_id = response['JobId']
+        print(response)
+    else:
+        # Fallback for a local Textract stand-in: textract_processor polls with backoff
+        response = textract.start_document_analysis(
+            DocumentLocation={'S3Object': {'Bucket': bucket, 'Name': key}},
+            FeatureTypes=['FORMS']
+        )
+        job_id = response['JobId']
+        print(response)
+
+        sns.publish(
+            TopicArn=os.environ['TEXTRACT_JOB_TOPIC_ARN'],
+            Message=json.dumps({'jobId': job_id, 'userId': user_id})
+        )
+
+    if content_hash:
+        try:
+            # user_details_extractor stores the parsed result under this hash
+            remember_pending(resume_cache_table, job_id, content_hash)
+        except Exception as e:
+            print(f"Error recording pending resume hash: {e}")
 
     return {
         'statusCode': 200,
         'body': json.dumps({'jobId': response['JobId'], 'userId': user_id})
-    }
\ No newline at end of file
+    }
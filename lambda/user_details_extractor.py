@@ -1,21 +1,27 @@
-import boto3
 import json
 import os
 from datetime import datetime, timezone
-import openai
 import re
+from aws_clients import lazy_client, lazy_table
+from embedding_client import EmbeddingClient, openai_module
+from embedding_codec import encode_embedding
+from resume_cache import pop_pending, store_resume
+from textract_blocks import collect_form_blocks, iter_analysis_blocks, iter_stored_blocks
+from trigger_queue import publish_match_trigger
 
 
 # Initialize AWS clients
-textract = boto3.client('textract')
-dynamodb = boto3.resource('dynamodb')
-sns = boto3.client('sns')  # Added for SNS publishing
+textract = lazy_client('textract')
+s3 = lazy_client('s3')
+sns = lazy_client('sns')  # Added for SNS publishing
 
-# Retrieve API key and table names from environment variables
-openai.api_key = os.environ['OPENAI_API_KEY']
+# Retrieve table names from environment variables; openai is imported on first use
 applicant_details_table = os.environ['APPLICANT_DETAILS_TABLE']
 user_embeddings_table = os.environ['USER_EMBEDDINGS_TABLE']
 user_match_topic_arn = os.environ['USER_MATCH_TOPIC_ARN']  # Added for triggering immediate match
+resume_processing_topic_arn = os.environ.get('RESUME_PROCESSING_TOPIC_ARN')  # delta_users trigger for match.py
+resume_cache_table = os.environ.get('RESUME_CACHE_TABLE')
+embedding_client = EmbeddingClient()
 
 # Helper function to extract text from a block
 def get_text(block, block_map):
@@ -46,16 +52,19 @@ def extract_key_value_pairs(key_map, value_map, block_map):
     return kvs
 
 def get_openai_embedding(text):
-    try:
-        response = openai.Embedding.create(model="text-embedding-ada-002", input=text)
-        return response['data'][0]['embedding']
-    except Exception as e:
-        print(f"Error in OpenAI embedding: {e}")
-        return None
+    # Skills may come back from the parser as a list, an object or a number; embed them as one text
+    if isinstance(text, list):
+        text = ', '.join(str(part) for part in text)
+    elif isinstance(text, dict):
+        text = json.dumps(text)
+    elif text is not None and not isinstance(text, str):
+        text = str(text)
+    # Retried with backoff and truncated to the model's input limit by the shared client
+    return embedding_client.embed([text])[0]
 
 def extract_resume_details(text):
     try:
-        response = openai.ChatCompletion.create(
+        response = openai_module().ChatCompletion.create(
             model="gpt-4o",
             messages=[
                 {"role": "system", "content": "You are a resume parser. Extract name, email, phone, skills, and education. Return a JSON object."},
@@ -75,35 +84,15 @@ def extract_resume_details(text):
         print(f"Error in OpenAI chat completion: {e}")
         return {"name": "Unknown", "email": "No email", "phone": "No phone", "skills": "Unknown", "education": "Not mentioned"}
 
-def lambda_handler(event, context):
-    message = json.loads(event['Records'][0]['Sns']['Message'])
-    job_id = message['jobId']
-    user_id = message.get('userId', 'unknown')
-    print(f"Processing job {job_id}")
-    print(f"User ID: {user_id}")   
-    # Fetch Textract results
-    response = textract.get_document_analysis(JobId=job_id)
-    print(f"Textract results fetched {response}")
-    blocks = response['Blocks']
-
-    # Map blocks for key-value extraction
-    key_map = {}
-    value_map = {}
-    block_map = {}
-
-    for block in blocks:
-        block_id = block['Id']
-        block_map[block_id] = block
-        if block['BlockType'] == 'KEY_VALUE_SET':
-            if 'KEY' in block['EntityTypes']:
-                key_map[block_id] = block
-            else:
-                value_map[block_id] = block
+# Shared by the SNS path below and upload_handler's synchronous path for single-page resumes
+def process_resume(job_id, user_id, blocks, blocks_bucket=None, blocks_key=None, content_hash=None):
+    # Map blocks for key-value extraction in a single pass
+    key_map, value_map, block_map, words = collect_form_blocks(blocks)
 
     kvs = extract_key_value_pairs(key_map, value_map, block_map)
     print(f"Key-value pairs extracted {kvs}")
     # Prepare text for OpenAI processing
-    all_text = ' '.join(block['Text'] for block in blocks if block['BlockType'] == 'WORD' and 'Text' in block)
+    all_text = ' '.join(words)
 
     print(f"All text: {all_text}")
 
@@ -130,7 +119,7 @@ def lambda_handler(event, context):
     }
     
     # Save to DynamoDB applicant details table
-    applicant_table = dynamodb.Table(applicant_details_table)
+    applicant_table = lazy_table(applicant_details_table)
     try:
         applicant_table.put_item(Item=applicant_item)
     except Exception as e:
@@ -141,16 +130,41 @@ def lambda_handler(event, context):
 
     # Save embedding to user embeddings table if available
     if skills_embedding:
+        encoded_embedding = encode_embedding(skills_embedding)
         embedding_item = {
             'user_id': user_id,
-            'embedding': str(skills_embedding)
+            'embedding': encoded_embedding
         }
-        embeddings_table = dynamodb.Table(user_embeddings_table)
+        embeddings_table = lazy_table(user_embeddings_table)
         try:
             embeddings_table.put_item(Item=embedding_item)
+            embedding_stored = True
         except Exception as e:
             # Continue even if embedding save fails, as it's secondary
-            pass
+            print(f"Error saving embedding: {e}")
+            embedding_stored = False
+
+        # match.py's delta_users run reads the embedding, so it is only triggered once the
+        # embedding is stored; that run is the one that emails the new resume's matches
+        if embedding_stored and resume_processing_topic_arn:
+            try:
+                publish_match_trigger(sns, resume_processing_topic_arn, job_id, user_id)
+                print(f"Triggered delta_users match for user_id: {user_id}")
+            except Exception as e:
+                print(f"Error triggering delta_users match: {e}")
+
+        # Cache the parse under the upload's content hash so re-uploads skip this path
+        if resume_cache_table:
+            try:
+                cache_table = lazy_table(resume_cache_table)
+                # upload_handler's synchronous path passes the hash; async jobs left a pending item
+                content_hash = content_hash or pop_pending(cache_table, job_id)
+                if content_hash:
+                    store_resume(cache_table, content_hash, applicant_item, resume_details, encoded_embedding,
+                                 embedding_client.model, blocks_bucket, blocks_key)
+                    print(f"Cached resume {content_hash}")
+            except Exception as e:
+                print(f"Error caching resume: {e}")
     
     # Trigger immediate user match after successful embedding save
     try:
@@ -166,4 +180,28 @@ def lambda_handler(event, context):
     return {
         'statusCode': 200,
         'body': json.dumps({'status': 'stored', 'resume_details': resume_details})
-    }
\ No newline at end of file
+    }
+
+def lambda_handler(event, context):
+    record = event['Records'][0]['Sns']
+    if record.get('MessageAttributes', {}).get('trigger', {}).get('Value') == 'match':
+        # Match-only trigger (see trigger_queue.publish_match_trigger); the subscription filter normally drops these
+        return {
+            'statusCode': 200,
+            'body': json.dumps({'status': 'skipped'})
+        }
+    message = json.loads(record['Message'])
+    job_id = message['jobId']
+    user_id = message.get('userId', 'unknown')
+    print(f"Processing job {job_id}")
+    print(f"User ID: {user_id}")   
+    # Stream the blocks textract_processor stored; older messages without an
+    # artifact fall back to paging through the Textract results directly
+    if message.get('blocksKey'):
+        blocks = iter_stored_blocks(s3, message['blocksBucket'], message['blocksKey'])
+        print(f"Reading Textract blocks from s3://{message['blocksBucket']}/{message['blocksKey']}")
+    else:
+        blocks = iter_analysis_blocks(textract, job_id)
+        print("Reading Textract blocks from get_document_analysis")
+
+    return process_resume(job_id, user_id, blocks, message.get('blocksBucket'), message.get('blocksKey'))
@@ -0,0 +1,66 @@
+import json
+import os
+import time
+from decimal import Decimal
+from botocore.exceptions import ClientError
+from aws_clients import lazy_table
+from job_filters import normalize_preferences, preferences_from_item
+
+# Initialize AWS client
+preferences_table = lazy_table(os.environ['USER_PREFERENCES_TABLE'])
+
+# POST /user-preferences
+#   {}                                  -> {"preferences": {...}} currently stored
+#   {"preferences": {...}}              -> validates, stores and returns them
+#   {"preferences": {}}                 -> clears them (every job is matched again)
+# Preferences only narrow the jobs match.py scores a user against (see job_filters.py);
+# they apply from the next match run.
+
+def parse_body(event):
+    body = event.get('body') or {}
+    if isinstance(body, str):
+        body = json.loads(body) if body.strip() else {}
+    return body
+
+def to_item(user_id, preferences):
+    item = {'user_id': user_id, 'updated_at': int(time.time())}
+    for name, value in preferences.items():
+        item[name] = Decimal(str(value)) if isinstance(value, float) else value
+    return item
+
+def lambda_handler(event, context):
+    try:
+        # Extract user_id from Cognito claims
+        user_id = event['claims']['sub']
+        body = parse_body(event)
+
+        if 'preferences' in body:
+            preferences = normalize_preferences(body['preferences'])
+            preferences_table.put_item(Item=to_item(user_id, preferences))
+            print(f"Stored preferences for {user_id}: {preferences}")
+        else:
+            preferences = preferences_from_item(preferences_table.get_item(Key={'user_id': user_id}).get('Item'))
+
+        return {
+            'statusCode': 200,
+            'body': json.dumps({'preferences': preferences})
+        }
+
+    except ClientError as e:
+        print(f"AWS Client Error: {e}")
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'error': 'Internal server error', 'details': str(e)})
+        }
+    except ValueError as e:
+        print(f"Invalid request: {e}")
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'error': 'Invalid request', 'details': str(e)})
+        }
+    except Exception as e:
+        print(f"Error: {e}")
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'error': 'Invalid request', 'details': str(e)})
+        }
@@ -6,6 +6,8 @@ import JobMatches from "./JobMatches"
 import JobFilter from "./JobFilter"
 import axios from "axios"
 
+const COUNTS_STORAGE_KEY = "matchCounts"
+
 const Dashboard = () => {
   const { state } = useLocation()
   const navigate = useNavigate()
@@ -16,11 +18,50 @@ const Dashboard = () => {
   const [searchTerm, setSearchTerm] = useState("")
   const [filterType, setFilterType] = useState("All")
   const [currentPage, setCurrentPage] = useState(1)
+  // pageCursors[i] is the cursor that loads page i + 1; the API pages by opaque cursor
+  const [pageCursors, setPageCursors] = useState([null])
+  const [nextCursor, setNextCursor] = useState(null)
+  // The totals cost the API a pass over all of the user's matches, so they are fetched once per
+  // session (and on an explicit refresh) rather than with every filter change
+  const cachedCounts = sessionStorage.getItem(COUNTS_STORAGE_KEY)
+  const [counts, setCounts] = useState(cachedCounts ? JSON.parse(cachedCounts) : { total: 0, high_match: 0, remote: 0 })
+  const [countsLoaded, setCountsLoaded] = useState(cachedCounts !== null)
   const [showUploadModal, setShowUploadModal] = useState(false)
   const itemsPerPage = 6
   const [refreshing, setRefreshing] = useState(false)
   const [uploadSuccess, setUploadSuccess] = useState(false)
 
+  const fetchMatchesPage = async (cursor, includeCounts) => {
+    const session = await fetchAuthSession()
+    const idToken = session.tokens?.idToken?.toString()
+    const response = await axios.post(
+      `${import.meta.env.VITE_GATEWAY_URL}/user-matches`,
+      {
+        limit: itemsPerPage,
+        sort: "score",
+        cursor,
+        employment_type: filterType === "All" ? undefined : filterType,
+        include_counts: includeCounts,
+      },
+      {
+        headers: { Authorization: `Bearer ${idToken}` },
+      },
+    )
+    setMatches(response.data.matches || [])
+    setNextCursor(response.data.next_cursor || null)
+    if (response.data.counts) {
+      setCounts(response.data.counts)
+      setCountsLoaded(true)
+      sessionStorage.setItem(COUNTS_STORAGE_KEY, JSON.stringify(response.data.counts))
+    }
+  }
+
+  const loadFirstPage = async (includeCounts) => {
+    setCurrentPage(1)
+    setPageCursors([null])
+    await fetchMatchesPage(null, includeCounts)
+  }
+
   useEffect(() => {
     const loadUserData = async () => {
       try {
@@ -31,20 +72,16 @@ const Dashboard = () => {
       }
     }
 
+    loadUserData()
+  }, [])
+
+  useEffect(() => {
     const loadJobMatches = async () => {
       setLoadingMatches(true)
       setError("")
       try {
-        const session = await fetchAuthSession()
-        const idToken = session.tokens?.idToken?.toString()
-        const response = await axios.post(
-          `${import.meta.env.VITE_GATEWAY_URL}/user-matches`,
-          {},
-          {
-            headers: { Authorization: `Bearer ${idToken}` },
-          },
-        )
-        setMatches(response.data.matches || [])
+        // Employment type is filtered by the API, so a new filter starts again from page 1
+        await loadFirstPage(!countsLoaded)
       } catch (err) {
         setError("Failed to fetch job matches: " + (err.response?.data?.message || err.message))
         setMatches([])
@@ -53,30 +90,45 @@ const Dashboard = () => {
       }
     }
 
-    loadUserData()
     loadJobMatches()
-  }, [])
+  }, [filterType])
+
+  const goToPage = async (pageNum) => {
+    const cursor = pageNum > pageCursors.length ? nextCursor : pageCursors[pageNum - 1]
+    setLoadingMatches(true)
+    setError("")
+    try {
+      await fetchMatchesPage(cursor, false)
+      if (pageNum > pageCursors.length) {
+        setPageCursors((prev) => [...prev, cursor])
+      }
+      setCurrentPage(pageNum)
+    } catch (err) {
+      setError("Failed to fetch job matches: " + (err.response?.data?.message || err.message))
+    } finally {
+      setLoadingMatches(false)
+    }
+  }
 
   const handleLogout = async () => {
     try {
       await signOut()
+      sessionStorage.removeItem(COUNTS_STORAGE_KEY)
       navigate("/register")
     } catch (err) {
       setError("Logout failed: " + err.message)
     }
   }
 
+  // Search narrows the page already loaded; employment type is filtered by the API
   const filteredMatches = matches.filter((job) => {
     const titleMatch = job.job_title?.toLowerCase().includes(searchTerm.toLowerCase()) || false
     const locationMatch = job.location?.toLowerCase().includes(searchTerm.toLowerCase()) || false
-    const typeMatch = filterType === "All" || job.employment_type === filterType
-    return (titleMatch || locationMatch) && typeMatch
+    return titleMatch || locationMatch
   })
 
-  const indexOfLastItem = currentPage * itemsPerPage
-  const indexOfFirstItem = indexOfLastItem - itemsPerPage
-  const currentMatches = filteredMatches.slice(indexOfFirstItem, indexOfLastItem)
-  const totalPages = Math.ceil(filteredMatches.length / itemsPerPage)
+  const indexOfFirstItem = (currentPage - 1) * itemsPerPage
+  const hasNextPage = nextCursor !== null
 
   const getInitials = (email) => {
     return email.split("@")[0].substring(0, 2).toUpperCase()
@@ -86,16 +138,7 @@ const Dashboard = () => {
     setRefreshing(true)
     setError("")
     try {
-      const session = await fetchAuthSession()
-      const idToken = session.tokens?.idToken?.toString()
-      const response = await axios.post(
-        `${import.meta.env.VITE_GATEWAY_URL}/user-matches`,
-        {},
-        {
-          headers: { Authorization: `Bearer ${idToken}` },
-        },
-      )
-      setMatches(response.data.matches || [])
+      await loadFirstPage(true)
     } catch (err) {
       setError("Failed to refresh job matches: " + (err.response?.data?.message || err.message))
     } finally {
@@ -231,7 +274,7 @@ const Dashboard = () => {
               </div>
               <div className="ml-4">
                 <p className="text-sm font-medium text-gray-600">Total Matches</p>
-                <p className="text-2xl font-bold text-gray-900">{matches.length}</p>
+                <p className="text-2xl font-bold text-gray-900">{counts.total}</p>
               </div>
             </div>
           </div>
@@ -250,9 +293,7 @@ const Dashboard = () => {
               </div>
               <div className="ml-4">
                 <p className="text-sm font-medium text-gray-600">High Match</p>
-                <p className="text-2xl font-bold text-gray-900">
-                  {matches.filter((job) => (job.similarity_score*100 || 0) >= 80).length}
-                </p>
+                <p className="text-2xl font-bold text-gray-900">{counts.high_match}</p>
               </div>
             </div>
           </div>
@@ -277,7 +318,7 @@ const Dashboard = () => {
               </div>
               <div className="ml-4">
                 <p className="text-sm font-medium text-gray-600">Remote Jobs</p>
-                <p className="text-2xl font-bold text-gray-900">{matches.filter((job) => job.is_remote).length}</p>
+                <p className="text-2xl font-bold text-gray-900">{counts.remote}</p>
               </div>
             </div>
           </div>
@@ -353,68 +394,37 @@ const Dashboard = () => {
               </div>
               {filteredMatches.length > 0 && (
                 <p className="text-sm text-gray-500">
-                  Showing {indexOfFirstItem + 1}-{Math.min(indexOfLastItem, filteredMatches.length)} of{" "}
-                  {filteredMatches.length} jobs
+                  Showing {indexOfFirstItem + 1}-{indexOfFirstItem + matches.length}
+                  {filterType === "All" && <> of {counts.total} jobs</>}
                 </p>
               )}
             </div>
           </div>
 
           <div className="p-6">
-            <JobMatches matches={currentMatches} loading={loadingMatches} error={error} />
+            <JobMatches matches={filteredMatches} loading={loadingMatches} error={error} />
 
             {/* Pagination */}
-            {filteredMatches.length > itemsPerPage && (
+            {(currentPage > 1 || hasNextPage) && (
               <div className="flex items-center justify-between border-t border-gray-200 pt-6">
                 <div className="flex items-center">
                   <p className="text-sm text-gray-700">
-                    Page <span className="font-medium">{currentPage}</span> of{" "}
-                    <span className="font-medium">{totalPages}</span>
+                    Page <span className="font-medium">{currentPage}</span>
                   </p>
                 </div>
                 <div className="flex items-center space-x-2">
                   <button
-                    onClick={() => setCurrentPage((prev) => Math.max(prev - 1, 1))}
+                    onClick={() => goToPage(currentPage - 1)}
                     className="px-3 py-2 text-sm font-medium text-gray-500 bg-white border border-gray-300 rounded-md hover:bg-gray-50 disabled:opacity-50 disabled:cursor-not-allowed"
-                    disabled={currentPage === 1}
+                    disabled={currentPage === 1 || loadingMatches}
                   >
                     Previous
                   </button>
 
-                  {/* Page Numbers */}
-                  <div className="hidden md:flex space-x-1">
-                    {Array.from({ length: Math.min(totalPages, 5) }, (_, i) => {
-                      let pageNum
-                      if (totalPages <= 5) {
-                        pageNum = i + 1
-                      } else if (currentPage <= 3) {
-                        pageNum = i + 1
-                      } else if (currentPage >= totalPages - 2) {
-                        pageNum = totalPages - 4 + i
-                      } else {
-                        pageNum = currentPage - 2 + i
-                      }
-
-                      return (
-                        <button
-                          key={pageNum}
-                          onClick={() => setCurrentPage(pageNum)}
-                          className={`px-3 py-2 text-sm font-medium rounded-md ${
-                            currentPage === pageNum
-                              ? "bg-blue-600 text-white"
-                              : "text-gray-500 bg-white border border-gray-300 hover:bg-gray-50"
-                          }`}
-                        >
-                          {pageNum}
-                        </button>
-                      )
-                    })}
-                  </div>
-
                   <button
-                    onClick={() => setCurrentPage((prev) => Math.min(prev + 1, totalPages))}
+                    onClick={() => goToPage(currentPage + 1)}
                     className="px-3 py-2 text-sm font-medium text-gray-500 bg-white border border-gray-300 rounded-md hover:bg-gray-50 disabled:opacity-50 disabled:cursor-not-allowed"
-                    disabled={currentPage === totalPages}
+                    disabled={!hasNextPage || loadingMatches}
                   >
                     Next
                   </button>
@@ -17,15 +17,11 @@ const JobDetail = () => {
       try {
         const session = await fetchAuthSession()
         const idToken = session.tokens?.idToken?.toString()
-        const response = await axios.post(
-          `${import.meta.env.VITE_GATEWAY_URL}/job-details`,
-          {
-            job_id: jobId,
-          },
-          {
-            headers: { Authorization: `Bearer ${idToken}` },
-          },
-        )
+        // GET so the browser (and the API cache, when enabled) can reuse the immutable job payload
+        const response = await axios.get(`${import.meta.env.VITE_GATEWAY_URL}/job-details`, {
+          params: { job_id: jobId },
+          headers: { Authorization: `Bearer ${idToken}` },
+        })
         setJob(response.data.job || {})
       } catch (err) {
         setError("Failed to fetch job details: " + (err.response?.data?.message || err.message))
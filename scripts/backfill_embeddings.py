@@ -0,0 +1,86 @@
+"""Embed job postings that were stored without an embedding.
+
+Usage:
+    python scripts/backfill_embeddings.py --table job-postings-dev
+    python scripts/backfill_embeddings.py --table job-postings-dev --match-topic-arn <MatchUpdateTopic ARN>
+
+Jobs whose embedding call failed during ingestion are skipped by the matcher.
+This scans for rows with no `embedding`, embeds their descriptions with
+lambda/embedding_client.py and writes the binary embedding back. With
+--match-topic-arn, the re-embedded job_ids are published in the same format
+fetch_job.py uses, so match.py scores just those jobs.
+"""
+import argparse
+import json
+import os
+import sys
+
+import boto3
+from botocore.exceptions import ClientError
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda'))
+
+from data_access import scan_all  # noqa: E402
+from embedding_client import EmbeddingClient  # noqa: E402
+from embedding_codec import encode_embedding  # noqa: E402
+
+PUBLISH_CHUNK = 200  # job_ids per MatchUpdateTopic message
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backfill missing job embeddings')
+    parser.add_argument('--table', required=True, help='job-postings table name')
+    parser.add_argument('--batch', type=int, default=500, help='Descriptions embedded per round')
+    parser.add_argument('--match-topic-arn', help='Publish re-embedded job_ids to this MatchUpdateTopic')
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+
+    import openai
+    openai.api_key = os.environ['OPENAI_API_KEY']
+
+    table = boto3.resource('dynamodb').Table(args.table)
+    items = scan_all(
+        table,
+        ProjectionExpression='job_id, description',
+        FilterExpression='attribute_not_exists(embedding)'
+    )
+    print(f"Found {len(items)} job postings without an embedding")
+    if args.dry_run or not items:
+        return
+
+    client = EmbeddingClient()
+    backfilled = []
+    for start in range(0, len(items), args.batch):
+        chunk = items[start:start + args.batch]
+        embeddings = client.embed([item.get('description') or '' for item in chunk])
+        for item, embedding in zip(chunk, embeddings):
+            if embedding is None:
+                continue
+            try:
+                table.update_item(
+                    Key={'job_id': item['job_id']},
+                    UpdateExpression='SET embedding = :embedding',
+                    ConditionExpression='attribute_exists(job_id) AND attribute_not_exists(embedding)',
+                    ExpressionAttributeValues={':embedding': encode_embedding(embedding)}
+                )
+                backfilled.append(item['job_id'])
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    raise
+        print(f"Processed {min(start + args.batch, len(items))}/{len(items)}")
+
+    client.report()
+    print(f"Backfilled {len(backfilled)} embeddings, {len(items) - len(backfilled)} still missing")
+
+    if args.match_topic_arn and backfilled:
+        sns = boto3.client('sns')
+        for start in range(0, len(backfilled), PUBLISH_CHUNK):
+            sns.publish(
+                TopicArn=args.match_topic_arn,
+                Message=json.dumps({'status': 'jobs_backfilled', 'job_ids': backfilled[start:start + PUBLISH_CHUNK]})
+            )
+        print(f"Published {len(backfilled)} job_ids for matching")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Add the posted_date bucket and TTL attributes to existing job postings.
+
+Usage:
+    python scripts/backfill_job_buckets.py --table job-postings-dev [--ttl-days 30]
+
+Rows written before the posted_date-index GSI existed have no posted_date,
+so they are invisible to the "recent jobs" query path and never expire.
+This sets posted_date from posted_timestamp and expires_at from now + ttl.
+"""
+import argparse
+import os
+import sys
+import time
+
+import boto3
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda'))
+
+from data_access import posted_date_bucket, scan_all  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backfill posted_date / expires_at on job postings')
+    parser.add_argument('--table', required=True, help='job-postings table name')
+    parser.add_argument('--ttl-days', type=int, default=30)
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+
+    table = boto3.resource('dynamodb').Table(args.table)
+    items = scan_all(
+        table,
+        ProjectionExpression='job_id, posted_timestamp',
+        FilterExpression='attribute_not_exists(posted_date)'
+    )
+    expires_at = int(time.time()) + args.ttl_days * 86400
+    updated = 0
+    for item in items:
+        posted_timestamp = int(item.get('posted_timestamp') or time.time())
+        if not args.dry_run:
+            table.update_item(
+                Key={'job_id': item['job_id']},
+                UpdateExpression='SET posted_date = :bucket, posted_timestamp = :ts, expires_at = if_not_exists(expires_at, :exp)',
+                ExpressionAttributeValues={
+                    ':bucket': posted_date_bucket(posted_timestamp),
+                    ':ts': posted_timestamp,
+                    ':exp': expires_at
+                }
+            )
+        updated += 1
+    print(f"{'Would backfill' if args.dry_run else 'Backfilled'} {updated} job postings")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""Rebuild the job ANN index from every unexpired posting in the job table.
+
+Usage:
+    python scripts/build_job_index.py --table job-postings-dev --bucket <output bucket>
+
+fetch_job.py builds the index on its first run and then only writes the
+delta of new jobs, compacting it into a new base (and retraining the
+centroids) as it grows. Run this to force a full rebuild, e.g. after
+backfilling or migrating embeddings. --key is the index pointer; the
+base is stored under versions/ next to it.
+"""
+import argparse
+import os
+import sys
+import time
+
+import boto3
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda'))
+
+from ann_index import JOB_INDEX_KEY, build_index_from_table, save_index  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild the job ANN index')
+    parser.add_argument('--table', required=True)
+    parser.add_argument('--bucket', required=True)
+    parser.add_argument('--key', default=JOB_INDEX_KEY)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    index = build_index_from_table(boto3.resource('dynamodb').Table(args.table))
+    size = save_index(boto3.client('s3'), args.bucket, args.key, index)
+    print(f"Indexed {len(index)} jobs in {index.n_lists} lists ({size / 1e6:.1f} MB) "
+          f"to s3://{args.bucket}/{args.key} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""Build the slimmed Lambda layer ZIPs referenced by IAC/lambdas.yaml.
+
+Usage:
+    python scripts/build_layers.py                   # both layers into layers/
+    python scripts/build_layers.py --layers numpy --out /tmp/layers
+
+Wheels are downloaded for the Lambda platform (manylinux x86_64, CPython
+3.9), so this works from any machine with pip. Test suites, type stubs and
+other files never imported at runtime are pruned. boto3 is left out
+because the Lambda runtime provides it. Run this with a Python 3.9
+interpreter to also ship precompiled .pyc files: /opt is read-only, so
+without them every cold start compiles the layer's sources again.
+Upload the ZIPs as described in the README (lambdas/<name>.zip).
+"""
+import argparse
+import compileall
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import zipfile
+
+LAYERS = {
+    # ZIP name -> pinned requirements
+    'numpy': ('numpy_layer.zip', ['numpy==1.26.4']),
+    'openai': ('openai-aws-lambda-layer-3.9.zip', ['openai==0.27.4']),
+}
+PRUNE_DIRS = {'tests', 'testing', '__pycache__', '_pyinstaller', 'doc', 'benchmarks'}
+PRUNE_SUFFIXES = ('.pyi', '.pxd', '.c', '.h')
+LAYERS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'layers')
+
+
+def install(requirements, target):
+    subprocess.run([
+        sys.executable, '-m', 'pip', 'install', '--quiet', '--target', target,
+        '--platform', 'manylinux2014_x86_64', '--implementation', 'cp', '--python-version', '3.9',
+        '--only-binary=:all:', '--upgrade', *requirements
+    ], check=True)
+
+
+def prune(root):
+    removed = 0
+    for directory, subdirectories, files in os.walk(root, topdown=True):
+        for name in list(subdirectories):
+            # numpy.testing is imported by numpy itself; only its test suites go
+            if name in PRUNE_DIRS and not (name == 'testing' and os.path.basename(directory) == 'numpy'):
+                path = os.path.join(directory, name)
+                removed += directory_size(path)
+                shutil.rmtree(path)
+                subdirectories.remove(name)
+        for name in files:
+            if name.endswith(PRUNE_SUFFIXES):
+                path = os.path.join(directory, name)
+                removed += os.path.getsize(path)
+                os.remove(path)
+    return removed
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(directory, name))
+               for directory, _, files in os.walk(path) for name in files)
+
+
+def write_zip(source, destination):
+    with zipfile.ZipFile(destination, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for directory, _, files in os.walk(source):
+            for name in sorted(files):
+                path = os.path.join(directory, name)
+                archive.write(path, os.path.relpath(path, os.path.dirname(source)))
+
+
+def build(name, out_dir):
+    zip_name, requirements = LAYERS[name]
+    with tempfile.TemporaryDirectory() as work:
+        site = os.path.join(work, 'python')  # Lambda adds /opt/python to sys.path
+        install(requirements, site)
+        installed = directory_size(site)
+        removed = prune(site)
+        if sys.version_info[:2] == (3, 9):
+            compileall.compile_dir(site, quiet=1, optimize=0)
+        else:
+            print(f"Not precompiling {name}: .pyc files must come from Python 3.9, this is "
+                  f"{sys.version_info[0]}.{sys.version_info[1]}")
+        destination = os.path.join(out_dir, zip_name)
+        write_zip(site, destination)
+    print(f"{name}: {installed / 1e6:.1f} MB installed, {removed / 1e6:.1f} MB pruned, "
+          f"{os.path.getsize(destination) / 1e6:.1f} MB zipped -> {destination}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the Lambda layer ZIPs')
+    parser.add_argument('--layers', nargs='+', choices=sorted(LAYERS), default=sorted(LAYERS))
+    parser.add_argument('--out', default=LAYERS_DIR)
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    for name in args.layers:
+        build(name, args.out)
+
+
+if __name__ == '__main__':
+    main()
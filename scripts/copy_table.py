@@ -0,0 +1,41 @@
+"""Copy every item from one DynamoDB table into another with the same key schema.
+
+Usage:
+    python scripts/copy_table.py --source match-results-dev --dest match-results-v2-dev
+
+Adding local secondary indexes (as for match-results) forces CloudFormation
+to create a new table. The old one is retained on replacement; run this
+once after the stack update to carry the existing rows over, then delete
+the old table.
+"""
+import argparse
+import os
+import sys
+
+import boto3
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda'))
+
+from batch_writes import log_write_stats, write_items  # noqa: E402
+from data_access import scan_all  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Copy all items between DynamoDB tables')
+    parser.add_argument('--source', required=True)
+    parser.add_argument('--dest', required=True)
+    parser.add_argument('--segments', type=int, default=8, help='Parallel scan segments')
+    args = parser.parse_args()
+
+    dynamodb = boto3.resource('dynamodb')
+    source = dynamodb.Table(args.source)
+    dest = dynamodb.Table(args.dest)
+    key_names = tuple(element['AttributeName'] for element in dest.key_schema)
+
+    items = scan_all(source, total_segments=args.segments)
+    print(f"Read {len(items)} items from {args.source}")
+    log_write_stats(f"Copy to {args.dest}", write_items(dest, items, key_names))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Rewrite legacy str(list) embeddings as compact binary embeddings.
+
+Usage:
+    python scripts/migrate_embeddings.py --table job-postings-dev --key job_id
+    python scripts/migrate_embeddings.py --table user-embeddings-dev --key user_id --dtype float16
+
+Rows whose `embedding` is still a String attribute are re-encoded with
+lambda/embedding_codec.py and written back as a Binary attribute. The update
+is conditional on the attribute still being a String, so the tool is safe to
+re-run and to run while the Lambdas are writing new rows.
+"""
+import argparse
+import os
+import sys
+
+import boto3
+from botocore.exceptions import ClientError
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda'))
+
+from embedding_codec import decode_embedding, encode_embedding, is_legacy_embedding  # noqa: E402
+
+
+def iter_items(table, key):
+    scan_kwargs = {
+        'ProjectionExpression': '#k, embedding',
+        'ExpressionAttributeNames': {'#k': key},
+    }
+    while True:
+        response = table.scan(**scan_kwargs)
+        yield from response.get('Items', [])
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def migrate(table, key, dtype, dry_run):
+    stats = {'scanned': 0, 'migrated': 0, 'already_binary': 0, 'skipped': 0, 'bytes_before': 0, 'bytes_after': 0}
+    for item in iter_items(table, key):
+        stats['scanned'] += 1
+        value = item.get('embedding')
+        if value is None:
+            stats['skipped'] += 1
+            continue
+        if not is_legacy_embedding(value):
+            stats['already_binary'] += 1
+            continue
+
+        encoded = encode_embedding(decode_embedding(value), dtype=dtype)
+        stats['bytes_before'] += len(value)
+        stats['bytes_after'] += len(encoded)
+        if dry_run:
+            stats['migrated'] += 1
+            continue
+        try:
+            table.update_item(
+                Key={key: item[key]},
+                UpdateExpression='SET embedding = :embedding',
+                ConditionExpression='attribute_type(embedding, :string_type)',
+                ExpressionAttributeValues={':embedding': encoded, ':string_type': 'S'}
+            )
+            stats['migrated'] += 1
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            stats['already_binary'] += 1  # Rewritten concurrently by a Lambda
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Migrate legacy text embeddings to the binary format')
+    parser.add_argument('--table', required=True, help='DynamoDB table name')
+    parser.add_argument('--key', required=True, help='Partition key attribute (job_id or user_id)')
+    parser.add_argument('--dtype', default='float32', choices=['float32', 'float16'])
+    parser.add_argument('--dry-run', action='store_true', help='Report what would change without writing')
+    args = parser.parse_args()
+
+    table = boto3.resource('dynamodb').Table(args.table)
+    stats = migrate(table, args.key, args.dtype, args.dry_run)
+    print(f"Scanned {stats['scanned']} items: migrated {stats['migrated']}, "
+          f"already binary {stats['already_binary']}, without embedding {stats['skipped']}")
+    if stats['bytes_before']:
+        print(f"Embedding bytes {stats['bytes_before']:,} -> {stats['bytes_after']:,} "
+              f"({stats['bytes_before'] / stats['bytes_after']:.1f}x smaller)")
+
+
+if __name__ == '__main__':
+    main()
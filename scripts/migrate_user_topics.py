@@ -0,0 +1,97 @@
+"""Move users from per-user SNS topics to the shared, filtered notification topic.
+
+Usage:
+    python scripts/migrate_user_topics.py --table user-topics-dev --topic-arn <UserNotificationTopic ARN>
+    python scripts/migrate_user_topics.py --table user-topics-dev --topic-arn <...> --delete-legacy
+
+Run it repeatedly. The first pass subscribes each legacy user's email to
+the shared topic with a user_id filter policy; SNS sends the user a new
+confirmation email. Until that subscription is confirmed, match.py keeps
+publishing to the user's old topic. Once it is confirmed, a later pass
+points the user's row at the shared topic, and with --delete-legacy also
+deletes the old per-user topic. Set NOTIFY_LEGACY_TOPICS=false on the
+match Lambda when no legacy rows are left.
+"""
+import argparse
+import json
+import os
+import sys
+
+import boto3
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda'))
+
+from data_access import scan_all  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Migrate per-user SNS topics to the shared notification topic')
+    parser.add_argument('--table', required=True)
+    parser.add_argument('--topic-arn', required=True, help='Shared notification topic ARN')
+    parser.add_argument('--delete-legacy', action='store_true', help='Delete old topics of migrated users')
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+
+    sns = boto3.client('sns')
+    table = boto3.resource('dynamodb').Table(args.table)
+    counts = {'subscribed': 0, 'pending': 0, 'switched': 0, 'deleted': 0, 'no_email': 0, 'done': 0}
+
+    for item in scan_all(table):
+        user_id = item['user_id']
+        legacy_arn = item.get('topic_arn') if item.get('topic_arn') != args.topic_arn else None
+
+        if legacy_arn is None:
+            if args.delete_legacy and item.get('legacy_topic_arn'):
+                if not args.dry_run:
+                    sns.delete_topic(TopicArn=item['legacy_topic_arn'])
+                    table.update_item(Key={'user_id': user_id}, UpdateExpression='REMOVE legacy_topic_arn')
+                counts['deleted'] += 1
+            else:
+                counts['done'] += 1
+            continue
+
+        pending_arn = item.get('shared_subscription_arn')
+        if pending_arn is None:
+            if not item.get('email'):
+                print(f"No email stored for {user_id}, cannot subscribe")
+                counts['no_email'] += 1
+                continue
+            if not args.dry_run:
+                response = sns.subscribe(
+                    TopicArn=args.topic_arn,
+                    Protocol='email',
+                    Endpoint=item['email'],
+                    Attributes={'FilterPolicy': json.dumps({'user_id': [user_id]})},
+                    ReturnSubscriptionArn=True
+                )
+                table.update_item(
+                    Key={'user_id': user_id},
+                    UpdateExpression='SET shared_subscription_arn = :arn',
+                    ExpressionAttributeValues={':arn': response['SubscriptionArn']}
+                )
+            counts['subscribed'] += 1
+            continue
+
+        attributes = sns.get_subscription_attributes(SubscriptionArn=pending_arn)['Attributes']
+        if attributes.get('PendingConfirmation') == 'true':
+            counts['pending'] += 1
+            continue
+
+        if not args.dry_run:
+            table.update_item(
+                Key={'user_id': user_id},
+                UpdateExpression='SET topic_arn = :shared, subscription_arn = :arn, legacy_topic_arn = :legacy '
+                                 'REMOVE shared_subscription_arn',
+                ExpressionAttributeValues={':shared': args.topic_arn, ':arn': pending_arn, ':legacy': legacy_arn}
+            )
+            if args.delete_legacy:
+                sns.delete_topic(TopicArn=legacy_arn)
+                table.update_item(Key={'user_id': user_id}, UpdateExpression='REMOVE legacy_topic_arn')
+                counts['deleted'] += 1
+        counts['switched'] += 1
+
+    print(f"{'Dry run: ' if args.dry_run else ''}{json.dumps(counts)}")
+
+
+if __name__ == '__main__':
+    main()